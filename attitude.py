@@ -0,0 +1,157 @@
+import time
+from collections import deque
+
+# ==========================================
+# ATTITUDE ESTIMATOR (TIME-BASED, LATENCY-COMPENSATED)
+# ==========================================
+# Вместо `r += (tr - r) * 0.15` на каждом кадре (отклик зависит от FPS,
+# картинка всегда отстаёт): каждый сэмпл получает метку времени приёма,
+# а кадр берёт значение на момент now - latency по часам, а не по кадрам.
+#
+#   est = AttitudeEstimator(latency=0.01)
+#   est.feed(reader.get())        # новый кадр узнаётся по d["t"] (время приёма)
+#   r, p = est.get()              # на момент показа
+#
+# Время сэмпла на плате = время приёма (сглаженное от рывков чтения порта)
+# минус link_latency. link_latency — число или функция, которая возвращает
+# измеренную задержку (latency.uart_delay: по micros() платы) или None —
+# тогда LINK_LATENCY. Если момент показа внутри истории — линейная
+# интерполяция между соседними сэмплами; если позже последнего сэмпла —
+# экстраполяция по наклону МНК последних fit сэмплов, не дальше horizon
+# секунд (дальше — держим). latency = 0 — показывать «сейчас» (чистый
+# прогноз), latency >= link_latency + период — только интерполяция.
+# Отставание картинки одинаково при 60 и 120 FPS.
+
+DISPLAY_LATENCY = 0.010   # целевая задержка «датчик -> экран», с
+LINK_LATENCY = 0.002      # плата -> приём на хосте (UART + USB), с — пока нет замера
+
+
+class AttitudeEstimator:
+    def __init__(self, latency=DISPLAY_LATENCY, link_latency=LINK_LATENCY,
+                 fields=("r", "p"), wrap=("r",), horizon=0.1, fit=4, history=64):
+        self.latency = latency
+        self.link_latency = link_latency
+        self.fields = tuple(fields)
+        self.wrap = [f in wrap for f in self.fields]   # углы ±180: без скачка через 180
+        self.horizon = horizon
+        self.fit = fit
+        self.samples = deque(maxlen=history)           # (t платы, [значения])
+        self.last_rx = None
+        self.last_ts = None                            # сглаженное время приёма
+        self.period = None                             # средний интервал сэмплов
+        self.pushed = 0
+        self.extrapolated = 0
+        self.held = 0
+        self.frames = 0
+
+    # ------------------------------------------
+    # INPUT
+    # ------------------------------------------
+    def push(self, values, t=None):
+        rx = time.monotonic() if t is None else t
+        # Сглаживание метки: чтение порта пачками даёт рывки в несколько мс
+        if self.last_rx is None or not 0 < rx - self.last_rx < 0.25:
+            ts = rx
+            self.period = None
+        else:
+            dt = rx - self.last_rx
+            self.period = dt if self.period is None else self.period + 0.05 * (dt - self.period)
+            ts = self.last_ts + self.period
+            ts = min(ts + 0.1 * (rx - ts), rx)
+        self.last_rx = rx
+        self.last_ts = ts
+
+        values = [float(v) for v in values]
+        if self.samples:
+            prev = self.samples[-1][1]
+            for i, w in enumerate(self.wrap):
+                if w:
+                    values[i] = prev[i] + (values[i] - prev[i] + 180.0) % 360.0 - 180.0
+        t_dev = ts - self._link()
+        if self.samples and t_dev <= self.samples[-1][0]:
+            t_dev = self.samples[-1][0] + 1e-6       # замер задержки сдвинулся: порядок важнее
+        self.samples.append((t_dev, values))
+        self.pushed += 1
+
+    def _link(self):
+        link = self.link_latency() if callable(self.link_latency) else self.link_latency
+        return LINK_LATENCY if link is None else link
+
+    def feed(self, d, t=None):
+        # Сэмпл из dict ридера; True, если он новый
+        if t is None:
+            t = d.get("t")
+        if t is not None:
+            if t == self.last_rx:
+                return False
+        elif self.samples:
+            # Ридер без меток: новый кадр — это изменившиеся значения
+            last = self.samples[-1][1]
+            cur = [d.get(f, 0) for f in self.fields]
+            if all(abs(a - ((b + 180) % 360 - 180 if w else b)) < 1e-9
+                   for a, b, w in zip(cur, last, self.wrap)):
+                return False
+        self.push([d.get(f, 0) for f in self.fields], t)
+        return True
+
+    # ------------------------------------------
+    # OUTPUT
+    # ------------------------------------------
+    def get(self, now=None):
+        self.frames += 1
+        if not self.samples:
+            return tuple(0.0 for _ in self.fields)
+        now = time.monotonic() if now is None else now
+        t = now - self.latency
+        s = self.samples
+        t_last, v_last = s[-1]
+
+        if t >= t_last:
+            dt = t - t_last
+            if dt > self.horizon:
+                dt = self.horizon
+                self.held += 1
+            slope = self._slope()
+            if slope is None:
+                out = v_last
+            else:
+                self.extrapolated += 1
+                out = [v + k * dt for v, k in zip(v_last, slope)]
+        elif t <= s[0][0]:
+            out = s[0][1]
+        else:
+            # Обычно момент показа у самого конца истории — ищем с конца
+            i = len(s) - 1
+            while s[i - 1][0] > t:
+                i -= 1
+            (t0, v0), (t1, v1) = s[i - 1], s[i]
+            a = (t - t0) / (t1 - t0) if t1 > t0 else 1.0
+            out = [x0 + (x1 - x0) * a for x0, x1 in zip(v0, v1)]
+        return tuple((v + 180.0) % 360.0 - 180.0 if w else v for v, w in zip(out, self.wrap))
+
+    def _slope(self):
+        # Наклон МНК по последним fit сэмплам (шум акселерометра не разгоняет прогноз)
+        n = min(self.fit, len(self.samples))
+        if n < 2:
+            return None
+        pts = [self.samples[-k] for k in range(n, 0, -1)]
+        tm = sum(p[0] for p in pts) / n
+        den = sum((p[0] - tm) ** 2 for p in pts)
+        if den <= 0:
+            return None
+        slope = []
+        for i in range(len(self.fields)):
+            vm = sum(p[1][i] for p in pts) / n
+            slope.append(sum((p[0] - tm) * (p[1][i] - vm) for p in pts) / den)
+        return slope
+
+    def reset(self):
+        self.samples.clear()
+        self.last_rx = None
+        self.last_ts = None
+        self.period = None
+
+    def stats(self):
+        return {"samples": self.pushed, "rate_hz": 1.0 / self.period if self.period else 0.0,
+                "latency_ms": self.latency * 1000, "link_ms": self._link() * 1000,
+                "extrapolated": self.extrapolated, "held": self.held, "frames": self.frames}
@@ -0,0 +1,157 @@
+import os
+import json
+import math
+import time
+import argparse
+import numpy as np
+
+# ==========================================
+# HEADLESS HIL RENDER BENCHMARK
+# ==========================================
+# Старый путь hil_sim (glBegin/glVertex3f каждый кадр + glRotatef) против
+# HilRenderer (VBO + одна матрица за кадр) на одной и той же сцене, без
+# окна: EGL pbuffer (по умолчанию, EGL_PLATFORM=surfaceless без X) или
+# OSMesa. Каждый кадр заканчивается glFinish(), vsync нет — меряем
+# стоимость кадра. Перед замером оба пути рисуют простой крест, и кадры
+# сверяются попиксельно. Результат — JSON.
+#
+#   python bench_gl.py
+#   python bench_gl.py --segments 64 --trail 50000 --frames 600 --platform osmesa
+
+W, H = 800, 600
+
+
+class ImmediateRenderer:
+    # То, что делал hil_sim: вершины из Python каждый кадр, фиксированный конвейер
+    def __init__(self, w, h, drone, grid, trail):
+        from OpenGL.GL import glMatrixMode, glLoadIdentity, glTranslatef, glEnable, GL_PROJECTION, GL_MODELVIEW, GL_DEPTH_TEST
+        from OpenGL.GLU import gluPerspective
+        glMatrixMode(GL_PROJECTION)
+        glLoadIdentity()
+        gluPerspective(45, w / h, 0.1, 100.0)
+        glMatrixMode(GL_MODELVIEW)
+        glLoadIdentity()
+        glTranslatef(0.0, 0.0, -10)
+        glEnable(GL_DEPTH_TEST)
+        self.drone = [(tuple(v['pos']), tuple(v['color'])) for v in drone]
+        self.grid = [(tuple(v['pos']), tuple(v['color'])) for v in grid] if grid is not None else []
+        self.trail = []
+        self.capacity = trail
+
+    def trail_push(self, point):
+        if self.capacity:
+            self.trail.append(tuple(point))
+            if len(self.trail) > self.capacity:
+                del self.trail[0]
+
+    def _lines(self, verts, mode):
+        from OpenGL.GL import glBegin, glEnd, glColor3f, glVertex3f
+        glBegin(mode)
+        for (x, y, z), (r, g, b) in verts:
+            glColor3f(r, g, b)
+            glVertex3f(x, y, z)
+        glEnd()
+
+    def draw(self, r, p):
+        from OpenGL.GL import (glClear, glPushMatrix, glPopMatrix, glRotatef, glBegin, glEnd,
+                               glColor3f, glVertex3f, GL_LINES, GL_LINE_STRIP,
+                               GL_COLOR_BUFFER_BIT, GL_DEPTH_BUFFER_BIT)
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        if self.grid:
+            self._lines(self.grid, GL_LINES)
+        if len(self.trail) > 1:
+            glBegin(GL_LINE_STRIP)
+            glColor3f(0.0, 0.8, 1.0)
+            for x, y, z in self.trail:
+                glVertex3f(x, y, z)
+            glEnd()
+        glPushMatrix()
+        glRotatef(p, 1, 0, 0)
+        glRotatef(r, 0, 0, 1)
+        self._lines(self.drone, GL_LINES)
+        glPopMatrix()
+
+
+def attitude_at(i):
+    t = i / 60.0
+    return 35 * math.sin(t * 1.3), 20 * math.sin(t * 0.7)
+
+
+def run_one(renderer, frames, warmup, prefill):
+    from OpenGL.GL import glFinish
+    from hil_renderer import attitude, NOSE
+    nose = np.array(NOSE + (1.0,), dtype=np.float32)
+    for i in range(prefill):                       # длинная трасса уже накоплена
+        renderer.trail_push((attitude(*attitude_at(i - prefill)) @ nose)[:3])
+    times = []
+    for i in range(warmup + frames):
+        r, p = attitude_at(i)
+        t0 = time.perf_counter()
+        renderer.trail_push((attitude(r, p) @ nose)[:3])
+        renderer.draw(r, p)
+        glFinish()
+        if i >= warmup:
+            times.append(time.perf_counter() - t0)
+    ms = np.array(times) * 1000
+    return {"frames": frames, "mean_ms": float(ms.mean()), "p50_ms": float(np.percentile(ms, 50)),
+            "p99_ms": float(np.percentile(ms, 99)), "fps": float(1000 / ms.mean())}
+
+
+def compare_pixels(w, h, r=25.0, p=-15.0):
+    # Один и тот же крест (segments=0, без сетки и трассы) обоими путями
+    from OpenGL.GL import glUseProgram
+    from hil_renderer import HilRenderer, drone_mesh, read_pixels
+    new = HilRenderer(w, h, segments=0, trail=0, grid=False)
+    new.draw(r, p)
+    a = read_pixels(w, h).copy()
+    glUseProgram(0)
+    old = ImmediateRenderer(w, h, drone_mesh(0), None, 0)
+    old.draw(r, p)
+    b = read_pixels(w, h)
+    new.delete()
+    lit_a, lit_b = a.any(axis=2), b.any(axis=2)
+    return {"lit_new": int(lit_a.sum()), "lit_old": int(lit_b.sum()),
+            "differ": int((a != b).any(axis=2).sum())}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Headless HIL renderer benchmark")
+    ap.add_argument("--frames", type=int, default=300)
+    ap.add_argument("--warmup", type=int, default=30)
+    ap.add_argument("--segments", type=int, default=32, help="отрезков на кольцо винта")
+    ap.add_argument("--trail", type=int, default=20000, help="точек в трассе")
+    ap.add_argument("--platform", choices=("egl", "osmesa"), default="egl")
+    ap.add_argument("--out", help="файл для JSON (иначе stdout)")
+    args = ap.parse_args()
+
+    # Платформа PyOpenGL выбирается при первом импорте OpenGL
+    os.environ["PYOPENGL_PLATFORM"] = args.platform
+    if args.platform == "egl" and not os.environ.get("DISPLAY"):
+        os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+    from OpenGL.GL import glGetString, glUseProgram, GL_RENDERER, GL_VERSION
+    from hil_renderer import HilRenderer, drone_mesh, grid_mesh, headless_context
+
+    headless_context(W, H)
+    res = {"platform": args.platform, "renderer": glGetString(GL_RENDERER).decode(),
+           "gl": glGetString(GL_VERSION).decode(), "size": f"{W}x{H}",
+           "check": compare_pixels(W, H)}
+
+    new = HilRenderer(W, H, segments=args.segments, trail=args.trail)
+    res["scene"] = new.stats()
+    res["scene"]["trail_points"] = args.trail
+    res["retained"] = run_one(new, args.frames, args.warmup, args.trail)
+    new.delete()
+    glUseProgram(0)
+    old = ImmediateRenderer(W, H, drone_mesh(args.segments), grid_mesh(), args.trail)
+    res["immediate"] = run_one(old, args.frames, args.warmup, args.trail)
+
+    text = json.dumps({"hil_gl": res}, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,439 @@
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import io
+import sys
+import json
+import math
+import time
+import shutil
+import argparse
+import tempfile
+import importlib
+import subprocess
+import numpy as np
+
+# ==========================================
+# HEADLESS HUD BENCHMARK
+# ==========================================
+# Каждый HUD запускается в отдельном процессе с SDL dummy-драйвером.
+# Телеметрию даёт ScriptedSerial (подменяет open_port), карты — фейковый
+# тайл вместо сети, clock.tick() не спит. Меряем время между flip()
+# и стоимость каждой draw-функции. Результат — JSON. Размер окна задаётся
+# до импорта HUD (set_mode подменён); если окно всё же другого размера —
+# прогон падает с ошибкой, а не пишет цифры не того разрешения.
+#
+#   python bench_hud.py                         # все HUD, 1400x800 и 1680x1050
+#   python bench_hud.py mark_2 --frames 1000 --size 1680x1050 --out bench.json
+#   python bench_hud.py --horizon               # flight_deck: старый vs новый горизонт
+
+HUDS = {
+    "mark_2": {
+        "entry": lambda m: m.HUD().run(),
+        "probes": ["HUD.draw_ladder", "HUD.draw_tape", "HUD.draw_compass_strip",
+                   "HUD.draw_ai_monitor", "TerrainMap.update", "TerrainMap.draw"],
+    },
+    "jarvis_hud": {
+        "entry": lambda m: m.main(),
+        "probes": ["StarField.update_and_draw", "DroneMesh.draw",
+                   "HUD.draw_overlay", "HUD.draw_graph"],
+    },
+    "garmin_g1000": {
+        "entry": lambda m: m.main(),
+        "probes": ["draw_pfd", "draw_diagnostics", "AsyncMap.update", "AsyncMap.draw"],
+    },
+    "garmin_neural_nxi": {
+        "entry": lambda m: m.main(),
+        "probes": ["draw_pfd", "draw_ai_brain", "AsyncMap.update", "AsyncMap.draw"],
+    },
+    "mission_control_v2": {
+        "entry": lambda m: m.main(),
+        "probes": ["draw_bar", "draw_sats", "text_widget", "DirtyScreen.present"],
+    },
+    "flight_deck": {
+        "entry": lambda m: m.main(),
+        "probes": ["Horizon.draw", "FastDrone.draw"],
+    },
+}
+
+SIZE_NAMES = (("WIDTH", "HEIGHT"), ("W", "H"), ("WINDOW_WIDTH", "WINDOW_HEIGHT"))
+DEFAULT_SIZES = ("1400x800", "1680x1050")
+
+
+# ==========================================
+# SCRIPTED TELEMETRY
+# ==========================================
+def scripted_sample(t):
+    # Плавный полёт по кругу + периодическая турбулентность и CRASH
+    phase = int(t / 3) % 4
+    st = 2 if phase == 3 else (1 if phase == 2 else 0)
+    jitter = 8 * math.sin(t * 37) if st else 0
+    return {
+        "r": round(35 * math.sin(t * 0.7) + jitter, 1),
+        "p": round(15 * math.sin(t * 0.45) + jitter / 2, 1),
+        "lat": round(42.87 + 0.01 * math.sin(t * 0.05), 6),
+        "lon": round(74.56 + 0.01 * math.cos(t * 0.05), 6),
+        "alt": round(300 + 50 * math.sin(t * 0.1)),
+        "as": 20 if st == 2 else (70 if st == 1 else 98),
+        "st": st,
+        "arm": int(t / 5) % 2,
+        "sd": 0,
+        "noise": round(40 + 20 * math.sin(t * 3)),
+        "us": int(t * 1e6) & 0xFFFFFFFF,          # micros() платы на момент сэмпла
+        # Поля, которые ждут gps_dashboard / mission_control_v2: тоже меняются,
+        # иначе DirtyScreen пропускает виджеты и мерить нечего
+        "sats": int(t) % 13,
+        "temp": round(21.5 + 3 * math.sin(t * 0.8), 2),
+        "press": round(1012.3 + 2 * math.sin(t * 0.3), 2),
+        "alt_baro": round(305 + 50 * math.sin(t * 0.1), 1),
+        "roll": round(35 * math.sin(t * 0.7), 2),
+        "pitch": round(15 * math.sin(t * 0.45), 2),
+        "bat": round(12.6 - 0.01 * t, 1),
+        "time": time.strftime("%H:%M:%S", time.gmtime(43200 + t)),
+    }
+
+
+class ScriptedSerial:
+    # Ведёт себя как порт, в который прошивка шлёт кадры с частотой rate
+    def __init__(self, port=None, baud=921600, timeout=None, rate=100):
+        self.port, self.baudrate, self.timeout = port, baud, timeout
+        self.rate = rate
+        self.t0 = time.perf_counter()
+        self.sent = 0
+        self.buf = bytearray()
+        self.binary = False
+        self.is_open = True
+
+    def _pump(self):
+        due = int((time.perf_counter() - self.t0) * self.rate)
+        from telemetry_proto import encode_frame
+        while self.sent < due:
+            d = scripted_sample(self.sent / self.rate)
+            if self.binary:
+                self.buf += encode_frame(d, self.sent)
+            else:
+                self.buf += (json.dumps(d, separators=(",", ":")) + "\n").encode()
+            self.sent += 1
+
+    @property
+    def in_waiting(self):
+        self._pump()
+        return len(self.buf)
+
+    def read(self, size=1):
+        deadline = time.perf_counter() + (self.timeout or 0)
+        while len(self.buf) < size and time.perf_counter() < deadline:
+            time.sleep(0.0005)
+            self._pump()
+        self._pump()
+        out = bytes(self.buf[:size])
+        del self.buf[:size]
+        return out
+
+    def readline(self, size=-1):
+        deadline = time.perf_counter() + (self.timeout or 0)
+        while True:
+            self._pump()
+            i = self.buf.find(b"\n")
+            if i >= 0 or time.perf_counter() >= deadline:
+                break
+            time.sleep(0.0005)
+        n = i + 1 if i >= 0 else len(self.buf)
+        out = bytes(self.buf[:n])
+        del self.buf[:n]
+        return out
+
+    def write(self, data):
+        if b"PROTO:BIN" in data: self.binary = True
+        if b"PROTO:JSON" in data: self.binary = False
+        return len(data)
+
+    def reset_input_buffer(self):
+        self.buf.clear()
+
+    def close(self):
+        self.is_open = False
+
+
+# ==========================================
+# OFFLINE MAP TILES
+# ==========================================
+class _FakeResponse:
+    status_code = 200
+
+    def __init__(self, content):
+        self.content = content
+
+
+def _fake_tile():
+    from PIL import Image
+    x = np.linspace(0, 255, 256, dtype=np.uint8)
+    img = np.dstack([np.tile(x, (256, 1)), np.tile(x[:, None], (1, 256)), np.full((256, 256), 90, np.uint8)])
+    out = io.BytesIO()
+    Image.fromarray(img, "RGB").save(out, "JPEG")
+    return out.getvalue()
+
+
+# ==========================================
+# INSTRUMENTATION (CHILD PROCESS)
+# ==========================================
+class BenchDone(Exception):
+    pass
+
+
+def _percentiles(samples_s):
+    a = np.asarray(samples_s) * 1000.0
+    if not len(a):
+        return {"n": 0}
+    p50, p95, p99 = np.percentile(a, (50, 95, 99))
+    return {"n": int(len(a)), "mean": float(a.mean()), "p50": float(p50),
+            "p95": float(p95), "p99": float(p99), "max": float(a.max())}
+
+
+def _wrap(fn, name, stats):
+    def probe(*args, **kwargs):
+        t = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            stats[name].append(time.perf_counter() - t)
+    probe.__wrapped__ = fn
+    return probe
+
+
+def _install_probes(namespace, names, stats):
+    for name in names:
+        owner, _, attr = name.rpartition(".")
+        target = namespace.get(owner) if owner else None
+        if owner and target is None:
+            continue
+        if owner:
+            setattr(target, attr, _wrap(getattr(target, attr), name, stats))
+        elif attr in namespace:
+            namespace[attr] = _wrap(namespace[attr], name, stats)
+        stats.setdefault(name, [])
+
+
+def run_one(name, frames, warmup, size, rate, fps_target):
+    # Фейковые тайлы не должны попасть в настоящий дисковый кэш карт
+    tiles_dir = os.environ["ESP32_TILE_CACHE"] = tempfile.mkdtemp(prefix="bench_tiles_")
+
+    import pygame
+    import requests
+    import serial_capture
+    import ingest_daemon
+
+    spec = HUDS[name]
+    stats = {n: [] for n in spec["probes"]}
+    flips = []
+    state = {"probed": False}
+
+    # Телеметрия и сеть без железа
+    serial_capture.open_port = lambda port, baud, timeout=None: ScriptedSerial(port, baud, timeout, rate)
+    ingest_daemon.ShmReader.attach = classmethod(lambda cls, *a, **k: None)
+    tile = _fake_tile()
+    requests.get = lambda *a, **k: _FakeResponse(tile)
+    requests.Session.get = lambda self, *a, **k: _FakeResponse(tile)
+
+    # Без ограничения FPS: меряем стоимость кадра, а не сон в tick()
+    class FreeClock:
+        def __init__(self): self.last = time.perf_counter(); self.dt = 0.0
+        def tick(self, *a):
+            now = time.perf_counter(); self.dt = now - self.last; self.last = now
+            return int(self.dt * 1000)
+        tick_busy_loop = tick
+        def get_fps(self): return 1.0 / self.dt if self.dt else 0.0
+        def get_time(self): return int(self.dt * 1000)
+    pygame.time.Clock = FreeClock
+
+    real_flip = pygame.display.flip
+    real_update = pygame.display.update
+    real_set_mode = pygame.display.set_mode
+
+    # Размер окна — до импорта: часть HUD открывает окно прямо при импорте
+    w, h = size
+    def set_mode(mode_size=(0, 0), *args, **kwargs):
+        return real_set_mode((w, h), *args, **kwargs)
+    pygame.display.set_mode = set_mode
+
+    def timed(real):
+        def flip(*args):
+            real(*args)
+            flips.append(time.perf_counter())
+            if not state["probed"]:
+                # Первый кадр: классы и функции HUD уже определены. Пробы ставим
+                # в модуль HUD, а не в того, кто позвал flip (DirtyScreen.present)
+                _install_probes(vars(sys.modules[name]), spec["probes"], stats)
+                state["probed"] = True
+            if len(flips) == warmup + 1:
+                for v in stats.values(): v.clear()
+            if len(flips) > warmup + frames:
+                raise BenchDone()
+        return flip
+    pygame.display.flip = timed(real_flip)
+    pygame.display.update = timed(real_update)
+
+    try:
+        module = importlib.import_module(name)
+        for wn, hn in SIZE_NAMES:
+            if hasattr(module, wn) and hasattr(module, hn):
+                setattr(module, wn, w)
+                setattr(module, hn, h)
+        spec["entry"](module)
+    except BenchDone:
+        pass
+    finally:
+        shutil.rmtree(tiles_dir, ignore_errors=True)
+
+    real_size = pygame.display.get_surface().get_size() if pygame.display.get_surface() else (w, h)
+    if tuple(real_size) != (w, h):
+        raise RuntimeError(f"{name}: asked for {w}x{h}, window is {real_size[0]}x{real_size[1]}")
+    frame_s = np.diff(np.asarray(flips[warmup:]))
+    frame = _percentiles(frame_s)
+    budget = 1000.0 / fps_target
+    return {
+        "hud": name,
+        "size": list(real_size),
+        "frames": int(len(frame_s)),
+        "frame_ms": frame,
+        "fps_p50": 1000.0 / frame["p50"] if frame.get("p50") else 0.0,
+        "target_fps": fps_target,
+        "budget_ms": budget,
+        "holds_target_p99": bool(frame.get("p99", math.inf) <= budget),
+        "draw_ms": {k: _percentiles(v) for k, v in stats.items()},
+    }
+
+
+# ==========================================
+# FLIGHT_DECK HORIZON: LEGACY VS ANALYTIC
+# ==========================================
+def legacy_horizon_draw(pygame, surf, r, p, w, h, sky, gnd):
+    # Исходный Horizon.draw: каждый кадр Surface 2000x2000 + rotate
+    cx, cy = w // 2, h // 2
+    dy = p * 8
+    angle = math.radians(r)
+    cos_a, sin_a = math.cos(angle), math.sin(angle)
+    x1, y1, x2, y2 = -2000, dy, 2000, dy
+    rx1 = x1 * cos_a - y1 * sin_a + cx
+    ry1 = x1 * sin_a + y1 * cos_a + cy
+    rx2 = x2 * cos_a - y2 * sin_a + cx
+    ry2 = x2 * sin_a + y2 * cos_a + cy
+    surf.fill(sky if p > 0 else gnd)
+    earth_surf = pygame.Surface((2000, 2000))
+    earth_surf.fill(gnd)
+    rotated_earth = pygame.transform.rotate(earth_surf, -r)
+    surf.blit(rotated_earth, rotated_earth.get_rect(center=(cx, cy + dy + 1000)))
+    pygame.draw.line(surf, (255, 255, 255), (rx1, ry1), (rx2, ry2), 2)
+
+
+def compare_horizon(frames, fps_target):
+    # Полный кадр flight_deck (горизонт + дрон + flip) со старым и новым горизонтом
+    import pygame
+    import flight_deck as fd
+    pygame.init()
+    screen = pygame.display.set_mode((fd.WINDOW_WIDTH, fd.WINDOW_HEIGHT))
+    w, h = screen.get_size()
+    drone, horizon = fd.FastDrone(), fd.Horizon()
+    variants = {
+        "legacy": lambda r, p: (screen.fill(fd.C_SKY), legacy_horizon_draw(pygame, screen, r, p, w, h, fd.C_SKY, fd.C_GND)),
+        "analytic": lambda r, p: horizon.draw(screen, r, p),
+    }
+    out = {"size": [w, h], "target_fps": fps_target, "budget_ms": 1000.0 / fps_target}
+    for name, draw in variants.items():
+        frame_s, horizon_s = [], []
+        last = time.perf_counter()
+        for i in range(frames):
+            t = i / fps_target
+            d = scripted_sample(t)
+            r, p = d["r"], d["p"]
+            t0 = time.perf_counter()
+            draw(r, p)
+            horizon_s.append(time.perf_counter() - t0)
+            drone.draw(screen, r, p)
+            pygame.display.flip()
+            now = time.perf_counter()
+            frame_s.append(now - last)
+            last = now
+        frame = _percentiles(frame_s[1:])
+        out[name] = {"frame_ms": frame, "horizon_ms": _percentiles(horizon_s),
+                     "holds_target_p99": bool(frame["p99"] <= out["budget_ms"])}
+        print(f"{name:9s} frame p50 {frame['p50']:6.2f}  p99 {frame['p99']:6.2f} ms  "
+              f"horizon p50 {out[name]['horizon_ms']['p50']:6.2f} ms", file=sys.stderr)
+    return out
+
+
+# ==========================================
+# DRIVER
+# ==========================================
+def bench(names, sizes, frames, warmup, rate, fps_target):
+    results = []
+    for name in names:
+        for size in sizes:
+            cmd = [sys.executable, os.path.abspath(__file__), "--child", name,
+                   "--size", size, "--frames", str(frames), "--warmup", str(warmup),
+                   "--rate", str(rate), "--fps", str(fps_target)]
+            proc = subprocess.run(cmd, capture_output=True, text=True,
+                                  cwd=os.path.dirname(os.path.abspath(__file__)))
+            res = None
+            for line in proc.stdout.splitlines():
+                if line.startswith("BENCH_RESULT "):
+                    res = json.loads(line[len("BENCH_RESULT "):])
+            if res is None:
+                res = {"hud": name, "size": size, "error": (proc.stderr or proc.stdout)[-2000:]}
+            else:
+                f = res["frame_ms"]
+                print(f"{name:20s} {res['size'][0]}x{res['size'][1]}  "
+                      f"p50 {f['p50']:6.2f}  p95 {f['p95']:6.2f}  p99 {f['p99']:6.2f} ms  "
+                      f"{'OK' if res['holds_target_p99'] else 'SLOW'} @ {fps_target} FPS", file=sys.stderr)
+            results.append(res)
+    return results
+
+
+def parse_size(text):
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Headless per-HUD frame-time benchmark")
+    ap.add_argument("huds", nargs="*", default=list(HUDS))
+    ap.add_argument("--size", action="append", help="WxH, можно несколько раз")
+    ap.add_argument("--frames", type=int, default=600)
+    ap.add_argument("--warmup", type=int, default=30)
+    ap.add_argument("--rate", type=int, default=100, help="Гц телеметрии")
+    ap.add_argument("--fps", type=int, default=120, help="целевой FPS")
+    ap.add_argument("--out", help="файл для JSON (иначе stdout)")
+    ap.add_argument("--horizon", action="store_true", help="сравнить горизонт flight_deck со старым")
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        res = run_one(args.child, args.frames, args.warmup, parse_size(args.size[0]), args.rate, args.fps)
+        print("BENCH_RESULT " + json.dumps(res), flush=True)
+        os._exit(0)   # потоки HUD (serial/map) не ждём
+
+    if args.horizon:
+        results = compare_horizon(args.frames, args.fps)
+        text = json.dumps({"horizon": results}, indent=2)
+        if args.out:
+            with open(args.out, "w") as f:
+                f.write(text)
+        else:
+            print(text)
+        return
+
+    unknown = [n for n in args.huds if n not in HUDS]
+    if unknown:
+        ap.error(f"unknown HUD: {', '.join(unknown)} (есть: {', '.join(HUDS)})")
+    results = bench(args.huds, args.size or list(DEFAULT_SIZES), args.frames, args.warmup, args.rate, args.fps)
+    text = json.dumps({"results": results}, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import numpy as np
+import serial
+from telemetry_proto import TelemetryParser, encode_frame
+from serial_ingest import SerialIngest
+
+# ==========================================
+# SERIAL INGEST BENCHMARK (PTY)
+# ==========================================
+# Настоящий порт заменяет псевдотерминал: pyserial открывает slave-сторону
+# как обычный /dev/tty*, а «прошивка» пишет бинарные кадры в master с
+# заданной частотой. Сравниваются два приёмника:
+#
+#   poll    — старый _worker: in_waiting / read / sleep(0.001)
+#   select  — SerialIngest (serial_ingest.py)
+#
+# Фазы: idle (порт молчит) — CPU и пробуждения в секунду; traffic — задержка
+# «write() в master -> on_frame()» (p50/p99) и CPU. Результат — JSON.
+#
+#   python bench_ingest.py
+#   python bench_ingest.py --rate 1000 --seconds 5 --idle 3 --out ingest.json
+
+BAUD_RATE = 921600
+
+
+class PollIngest:
+    # Цикл, который стоял в SerialReader._worker / DataLink._worker
+    def __init__(self, ser, on_frame, parser=None):
+        self.ser = ser
+        self.on_frame = on_frame
+        self.parser = parser or TelemetryParser()
+        self.running = False
+        self.wakeups = 0
+        self.frames = 0
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+        return self
+
+    def _worker(self):
+        while self.running:
+            self.wakeups += 1
+            if self.ser and self.ser.in_waiting:
+                try:
+                    chunk = self.ser.read(self.ser.in_waiting)
+                    t_rx = time.monotonic()
+                    d = self.parser.feed(chunk)
+                    if d:
+                        d["t"] = t_rx
+                        d["t_dec"] = time.monotonic()
+                        self.frames += 1
+                        self.on_frame(d)
+                except: pass
+            else:
+                time.sleep(0.001)
+
+    def stop(self):
+        self.running = False
+        self.thread.join(0.5)
+
+    def stats(self):
+        return {"wakeups": self.wakeups, "frames": self.frames, "mode": "poll"}
+
+
+ENGINES = {"poll": PollIngest, "select": SerialIngest}
+
+
+def sample(i, rate):
+    t = i / rate
+    return {"r": 30 * np.sin(t), "p": 10 * np.cos(t), "lat": 42.87, "lon": 74.56,
+            "alt": 100, "as": 100, "st": 0, "arm": 1, "sd": 1, "noise": 5,
+            "us": int(t * 1e6) & 0xFFFFFFFF}
+
+
+def open_pty(baud=BAUD_RATE):
+    master, slave = os.openpty()
+    ser = serial.Serial(os.ttyname(slave), baud, timeout=0.01)
+    os.close(slave)
+    return master, ser
+
+
+def run_one(mode, rate, seconds, idle):
+    master, ser = open_pty()
+    sent = {}
+    lat = []
+
+    def on_frame(d):
+        t0 = sent.get(d["seq"])
+        if t0 is not None:
+            lat.append(time.monotonic() - t0)
+
+    engine = ENGINES[mode](ser, on_frame).start()
+    time.sleep(0.1)
+
+    # --- idle ---
+    w0, c0, t0 = engine.wakeups, time.process_time(), time.monotonic()
+    time.sleep(idle)
+    dt = time.monotonic() - t0
+    idle_res = {"cpu_pct": (time.process_time() - c0) / dt * 100,
+                "wakeups_per_s": (engine.wakeups - w0) / dt}
+
+    # --- traffic ---
+    n = int(rate * seconds)
+    frames = [encode_frame(sample(i, rate), i & 0xFFFF) for i in range(n)]
+    w0, c0, t0 = engine.wakeups, time.process_time(), time.monotonic()
+    for i, frame in enumerate(frames):
+        due = t0 + i / rate
+        wait = due - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        sent[i & 0xFFFF] = time.monotonic()
+        os.write(master, frame)
+    time.sleep(0.05)
+    dt = time.monotonic() - t0
+    lat_ms = np.array(lat) * 1000 if lat else np.zeros(1)
+    traffic = {"rate_hz": rate, "frames_sent": n, "frames_seen": len(lat),
+               "cpu_pct": (time.process_time() - c0) / dt * 100,
+               "wakeups_per_s": (engine.wakeups - w0) / dt,
+               "latency_ms": {"p50": float(np.percentile(lat_ms, 50)),
+                              "p99": float(np.percentile(lat_ms, 99)),
+                              "max": float(lat_ms.max())}}
+
+    engine.stop()
+    ser.close()
+    os.close(master)
+    return {"mode": mode, "idle": idle_res, "traffic": traffic}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Serial ingest: polling loop vs select() over a pty")
+    ap.add_argument("modes", nargs="*", default=list(ENGINES))
+    ap.add_argument("--rate", type=int, default=100, help="Гц телеметрии")
+    ap.add_argument("--seconds", type=float, default=5.0, help="длительность traffic")
+    ap.add_argument("--idle", type=float, default=3.0, help="длительность idle")
+    ap.add_argument("--out", help="файл для JSON (иначе stdout)")
+    args = ap.parse_args()
+
+    if not hasattr(os, "openpty"):
+        sys.exit("pty недоступен на этой платформе")
+    results = [run_one(m, args.rate, args.seconds, args.idle) for m in args.modes]
+    text = json.dumps({"ingest": results}, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
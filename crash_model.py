@@ -0,0 +1,340 @@
+import os
+import re
+import sys
+import json
+import struct
+import numpy as np
+
+# ==========================================
+# CRASH PREDICTOR ON THE HOST (TFLITE -> NUMPY)
+# ==========================================
+# Та же сеть, что крутит TaskAI в src/main.cpp, но на ПК и пачками:
+# массив model_tflite берётся прямо из src/model_data.h, flatbuffer
+# разбирается здесь (без tensorflow/flatbuffers), операторы считаются
+# NumPy над всеми строками (r, p, acc) сразу.
+#
+#   model = CrashModel.from_header()
+#   out = model.predict(np.column_stack([r, p, acc]))   # (N, 3) softmax
+#   score, st = firmware_status(out)                    # как ai_safe / ai_stat
+#
+# Арифметика повторяет ядра TFLM для float32: FULLY_CONNECTED копит сумму
+# по входам по порядку в float32, потом bias и активация; SOFTMAX —
+# exp(x - max) / sum. Расхождение с платой — не больше пары ulp
+# (expf из newlib, возможный FMA в компиляторе), на as/st это не влияет.
+#
+#   python crash_model.py info
+#   python crash_model.py score flight.cap [acc]
+#   python crash_model.py sweep flight.cap [acc]
+#
+# В телеметрии нет acc (перегрузки), поэтому для записанных полётов она
+# задаётся числом (по умолчанию 1.0 g — горизонтальный полёт).
+
+HEADER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src', 'model_data.h')
+
+# Пороги TaskAI
+WARN_THRESHOLD = 0.6    # output[1] > 0.6 -> st = 1
+CRIT_THRESHOLD = 0.7    # output[2] > 0.7 -> st = 2
+
+# TensorType
+FLOAT32, INT32, UINT8, INT64, INT16, INT8 = 0, 2, 3, 4, 7, 9
+NP_TYPES = {FLOAT32: np.float32, INT32: np.int32, UINT8: np.uint8, INT64: np.int64,
+            INT16: np.int16, INT8: np.int8}
+
+# BuiltinOperator
+DEQUANTIZE, FULLY_CONNECTED, LOGISTIC, RELU, RELU6, RESHAPE, SOFTMAX, TANH = 6, 9, 14, 19, 21, 22, 25, 28
+
+# ActivationFunctionType
+ACT_NONE, ACT_RELU, ACT_RELU_N1_TO_1, ACT_RELU6, ACT_TANH = 0, 1, 2, 3, 4
+
+
+def load_header(path=HEADER_PATH, name='model_tflite'):
+    # Байты C-массива `name[] = { 0x.., ... }` из заголовка
+    src = open(path).read()
+    m = re.search(r'\b%s\s*\[\s*\]\s*=\s*\{([^}]*)\}' % re.escape(name), src)
+    if not m:
+        raise ValueError(f"{path}: no {name}[] array")
+    return bytes(int(x, 16) for x in re.findall(r'0x([0-9a-fA-F]{1,2})', m.group(1)))
+
+
+# ==========================================
+# FLATBUFFER (только чтение)
+# ==========================================
+class Table:
+    def __init__(self, buf, pos):
+        self.buf = buf
+        self.pos = pos
+        self.vtable = pos - struct.unpack_from('<i', buf, pos)[0]
+        self.vsize = struct.unpack_from('<H', buf, self.vtable)[0]
+
+    def _field(self, i):
+        o = 4 + 2 * i
+        if o >= self.vsize:
+            return 0
+        return struct.unpack_from('<H', self.buf, self.vtable + o)[0]
+
+    def scalar(self, i, fmt, default=0):
+        o = self._field(i)
+        return struct.unpack_from('<' + fmt, self.buf, self.pos + o)[0] if o else default
+
+    def _ref(self, i):
+        o = self._field(i)
+        if not o:
+            return None
+        p = self.pos + o
+        return p + struct.unpack_from('<I', self.buf, p)[0]
+
+    def table(self, i):
+        p = self._ref(i)
+        return Table(self.buf, p) if p is not None else None
+
+    def tables(self, i):
+        p = self._ref(i)
+        if p is None:
+            return []
+        n = struct.unpack_from('<I', self.buf, p)[0]
+        return [Table(self.buf, q + struct.unpack_from('<I', self.buf, q)[0])
+                for q in range(p + 4, p + 4 + 4 * n, 4)]
+
+    def vector(self, i, dtype):
+        p = self._ref(i)
+        if p is None:
+            return np.empty(0, dtype=dtype)
+        n = struct.unpack_from('<I', self.buf, p)[0]
+        return np.frombuffer(self.buf, dtype=dtype, count=n, offset=p + 4)
+
+    def string(self, i):
+        p = self._ref(i)
+        if p is None:
+            return ""
+        n = struct.unpack_from('<I', self.buf, p)[0]
+        return self.buf[p + 4:p + 4 + n].decode('utf-8', 'replace')
+
+
+# ==========================================
+# MODEL
+# ==========================================
+class CrashModel:
+    def __init__(self, buf):
+        if buf[4:8] != b'TFL3':
+            raise ValueError("not a TFLite flatbuffer")
+        model = Table(buf, struct.unpack_from('<I', buf, 0)[0])
+        codes = []
+        for oc in model.tables(1):
+            # builtin_code (int32) появился позже deprecated_builtin_code (int8)
+            codes.append(max(oc.scalar(0, 'b'), oc.scalar(3, 'i')))
+        buffers = [b.vector(0, np.uint8) for b in model.tables(4)]
+        graph = model.tables(2)[0]
+
+        self.names, self.shapes, self.types, self.consts = [], [], [], {}
+        for k, t in enumerate(graph.tables(0)):
+            ttype = t.scalar(1, 'b')
+            shape = tuple(int(d) for d in t.vector(0, '<i4'))
+            data = buffers[t.scalar(2, 'I')]
+            self.names.append(t.string(3))
+            self.shapes.append(shape)
+            self.types.append(ttype)
+            if len(data):
+                value = data.view(NP_TYPES[ttype]).reshape(shape)
+                q = t.table(4)
+                scale = q.vector(2, '<f4') if q else ()
+                if len(scale):
+                    # Квантованные константы (веса) — обратно во float32
+                    zero = q.vector(3, '<i8').astype(np.float32)
+                    if len(scale) > 1:             # по каналам (quantized_dimension)
+                        bshape = [1] * len(shape)
+                        bshape[q.scalar(6, 'i')] = len(scale)
+                        scale, zero = scale.reshape(bshape), zero.reshape(bshape)
+                    value = (value.astype(np.float32) - zero) * scale
+                self.consts[k] = np.asarray(value, dtype=np.float32)
+
+        self.inputs = [int(i) for i in graph.vector(1, '<i4')]
+        self.outputs = [int(i) for i in graph.vector(2, '<i4')]
+        self.ops = []
+        for op in graph.tables(3):
+            code = codes[op.scalar(0, 'I')]
+            opts = op.table(4)
+            self.ops.append((code, [int(i) for i in op.vector(1, '<i4')],
+                             [int(i) for i in op.vector(2, '<i4')], opts))
+            if code not in OPS:
+                raise NotImplementedError(f"TFLite op {code} is not supported")
+        for k in self.inputs:
+            if self.types[k] != FLOAT32:
+                raise NotImplementedError("only float32 model inputs are supported")
+
+    @classmethod
+    def from_header(cls, path=HEADER_PATH):
+        return cls(load_header(path))
+
+    def predict(self, x):
+        # x: (N, n_inputs) или (n_inputs,) -> (N, n_outputs) float32
+        x = np.asarray(x, dtype=np.float32)
+        single = x.ndim == 1
+        values = dict(self.consts)
+        values[self.inputs[0]] = x.reshape(-1, self.shapes[self.inputs[0]][-1])
+        for code, ins, outs, opts in self.ops:
+            values[outs[0]] = OPS[code](values, ins, opts)
+        out = values[self.outputs[0]]
+        return out[0] if single else out
+
+    def describe(self):
+        lines = []
+        for k, name in enumerate(self.names):
+            kind = "const" if k in self.consts else "io" if k in self.inputs + self.outputs else ""
+            lines.append(f"  t{k:<3} {str(self.shapes[k]):<10} {kind:<6} {name}")
+        for code, ins, outs, opts in self.ops:
+            lines.append(f"  {OP_NAMES.get(code, code):<16} {ins} -> {outs}")
+        return "\n".join(lines)
+
+
+# ==========================================
+# OPS (float32, как reference-ядра TFLM)
+# ==========================================
+def _activation(x, act):
+    if act == ACT_RELU:
+        return np.maximum(x, np.float32(0))
+    if act == ACT_RELU6:
+        return np.clip(x, np.float32(0), np.float32(6))
+    if act == ACT_RELU_N1_TO_1:
+        return np.clip(x, np.float32(-1), np.float32(1))
+    if act == ACT_TANH:
+        return np.tanh(x)
+    return x
+
+
+def _fully_connected(values, ins, opts):
+    x = values[ins[0]]
+    w = values[ins[1]]                         # (out, in)
+    x = x.reshape(-1, w.shape[1])
+    # Сумма по входам в том же порядке, что в цикле ядра: total += x[d] * w[o][d]
+    total = np.zeros((len(x), w.shape[0]), dtype=np.float32)
+    for d in range(w.shape[1]):
+        total += x[:, d:d + 1] * w[:, d]
+    if len(ins) > 2 and ins[2] >= 0:
+        total += values[ins[2]]
+    return _activation(total, opts.scalar(0, 'b') if opts else ACT_NONE)
+
+
+def _softmax(values, ins, opts):
+    x = values[ins[0]]
+    beta = np.float32(opts.scalar(0, 'f', 1.0) if opts else 1.0)
+    e = np.exp((x - x.max(axis=-1, keepdims=True)) * beta)
+    return e / e.sum(axis=-1, keepdims=True, dtype=np.float32)
+
+
+OPS = {
+    FULLY_CONNECTED: _fully_connected,
+    SOFTMAX: _softmax,
+    RELU: lambda v, ins, o: _activation(v[ins[0]], ACT_RELU),
+    RELU6: lambda v, ins, o: _activation(v[ins[0]], ACT_RELU6),
+    TANH: lambda v, ins, o: np.tanh(v[ins[0]]),
+    LOGISTIC: lambda v, ins, o: (np.float32(1) / (np.float32(1) + np.exp(-v[ins[0]]))).astype(np.float32),
+    RESHAPE: lambda v, ins, o: v[ins[0]],
+    DEQUANTIZE: lambda v, ins, o: v[ins[0]],   # константы уже во float32
+}
+OP_NAMES = {DEQUANTIZE: "DEQUANTIZE", FULLY_CONNECTED: "FULLY_CONNECTED", LOGISTIC: "LOGISTIC",
+            RELU: "RELU", RELU6: "RELU6", RESHAPE: "RESHAPE", SOFTMAX: "SOFTMAX", TANH: "TANH"}
+
+
+# ==========================================
+# AS / ST (как TaskAI и loop() в прошивке)
+# ==========================================
+def firmware_status(out, warn=WARN_THRESHOLD, crit=CRIT_THRESHOLD):
+    # status: 0, затем output[1] > warn -> 1, затем output[2] > crit -> 2
+    # score = (1.0 - output[2]) * 100.0 в double, хранится как float (ai_safe)
+    out = np.asarray(out, dtype=np.float32)
+    o1 = out[..., 1].astype(np.float64)
+    o2 = out[..., 2].astype(np.float64)
+    st = np.where(o2 > crit, 2, np.where(o1 > warn, 1, 0)).astype(np.int64)
+    score = ((1.0 - o2) * 100.0).astype(np.float32)
+    return score, st
+
+
+def as_json(score):
+    # "%.0f": float -> double, округление половины к чётному
+    return np.rint(np.asarray(score, dtype=np.float64)).astype(np.int64)
+
+
+def as_binary(score):
+    # (uint8_t)lroundf(sc): половина — от нуля
+    s = np.asarray(score, dtype=np.float32)
+    return (np.sign(s) * np.floor(np.abs(s) + np.float32(0.5))).astype(np.int64) & 0xFF
+
+
+# ==========================================
+# RECORDED FLIGHTS
+# ==========================================
+def capture_columns(path):
+    # r, p, as, st всех кадров записи serial_capture (JSON или бинарный поток)
+    from serial_capture import ReplaySerial
+    from telemetry_proto import decode_buffer, records_to_columns
+    cap = ReplaySerial(path, speed=0)
+    try:
+        # Полезная нагрузка записей подряд, без их заголовков
+        data = b"".join(cap.mm[o:o + n] for o, n in zip(cap.offsets.tolist(), np.diff(cap.cum).tolist()))
+    finally:
+        cap.close()
+    if b'\x00' in data:
+        recs, _, _ = decode_buffer(data)
+        cols = records_to_columns(recs)
+        return {k: cols[k] for k in ("r", "p", "as", "st")}, "bin"
+    rows = {"r": [], "p": [], "as": [], "st": []}
+    for line in data.split(b'\n'):
+        line = line.strip()
+        if not (line.startswith(b'{') and line.endswith(b'}')):
+            continue
+        try:
+            d = json.loads(line)
+        except:
+            continue
+        for k in rows:
+            rows[k].append(d.get(k, 0))
+    return {k: np.array(v, dtype=np.float64) for k, v in rows.items()}, "json"
+
+
+def score(path, acc=1.0, model=None):
+    model = model or CrashModel.from_header()
+    cols, mode = capture_columns(path)
+    x = np.column_stack([cols["r"], cols["p"], np.full(len(cols["r"]), acc)])
+    sc, st = firmware_status(model.predict(x))
+    got_as = as_binary(sc) if mode == "bin" else as_json(sc)
+    n = len(st)
+    print(f"{path}: {n} frames ({mode}), acc={acc}")
+    if not n:
+        return
+    print(f"  st match  {np.mean(st == cols['st']) * 100:6.2f}%   "
+          f"as match {np.mean(got_as == cols['as']) * 100:6.2f}%   "
+          f"|as diff| max {np.abs(got_as - cols['as']).max():.0f}")
+    for level in (0, 1, 2):
+        print(f"  st={level}: host {np.mean(st == level) * 100:6.2f}%   "
+              f"board {np.mean(cols['st'] == level) * 100:6.2f}%")
+
+
+def sweep(path, acc=1.0, model=None):
+    # Доля кадров с st=1 / st=2 при других порогах — без перепрошивки
+    model = model or CrashModel.from_header()
+    cols, _ = capture_columns(path)
+    x = np.column_stack([cols["r"], cols["p"], np.full(len(cols["r"]), acc)])
+    out = model.predict(x)
+    print(f"{path}: {len(out)} frames, acc={acc}")
+    print("   warn  crit    st=1%   st=2%")
+    for warn in np.arange(0.4, 0.95, 0.1):
+        for crit in np.arange(0.5, 0.95, 0.1):
+            _, st = firmware_status(out, warn, crit)
+            print(f"   {warn:.1f}   {crit:.1f}   {np.mean(st == 1) * 100:6.2f}  {np.mean(st == 2) * 100:6.2f}")
+
+
+def info(path=HEADER_PATH):
+    buf = load_header(path)
+    model = CrashModel(buf)
+    print(f"{path}: {len(buf)} bytes, inputs {model.inputs}, outputs {model.outputs}")
+    print(model.describe())
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == 'info':
+        info()
+    elif len(sys.argv) >= 3 and sys.argv[1] in ('score', 'sweep'):
+        acc = float(sys.argv[3]) if len(sys.argv) >= 4 else 1.0
+        (score if sys.argv[1] == 'score' else sweep)(sys.argv[2], acc)
+    else:
+        print("usage: crash_model.py info | score FILE.cap [acc] | sweep FILE.cap [acc]")
@@ -0,0 +1,107 @@
+import pygame
+
+# ==========================================
+# DIRTY-RECT SCREEN (PARTIAL REDRAW)
+# ==========================================
+# Для дашбордов, где почти весь экран статичен: панели, кольца радара,
+# подписи рисуются один раз в background. Каждый кадр виджет сообщает своё
+# значение; если оно не изменилось — ничего не рисуется. Если изменилось —
+# под старым местом виджета восстанавливается фон, виджет рисуется заново,
+# а в present() уходит только объединение старого и нового Rect:
+#
+#   screen = DirtyScreen(surf, build_background)
+#   screen.widget("temp", txt, lambda s: text_cache.text(s, font, txt, col, (350, 150)))
+#   screen.present()   # display.update(rects) или flip() после invalidate()
+#
+# draw(surface) обязан вернуть Rect всего, что нарисовал. Если старый или
+# новый Rect задевает соседний виджет (крупный шрифт вылез на соседа), фон
+# восстанавливается под всеми задетыми, и они перерисовываются в порядке
+# регистрации — сосед не остаётся стёртым.
+# Полный flip — только на первом кадре, после resize/expose окна или
+# invalidate() (например, при смене палитры).
+
+_MISSING = object()
+
+
+class DirtyScreen:
+    def __init__(self, surf, build_background):
+        self.surf = surf
+        self.build_background = build_background
+        self.values = {}      # key -> последнее нарисованное значение
+        self.rects = {}       # key -> Rect, который виджет занял (порядок = порядок рисования)
+        self.draws = {}       # key -> последний draw(), для перерисовки соседей
+        self.dirty = []
+        self.full = True
+        self.flips = 0
+        self.updates = 0
+        self.skipped = 0
+        self.repaired = 0
+        self.invalidate()
+
+    def invalidate(self):
+        # Перестроить фон и перерисовать все виджеты на следующем кадре
+        self.surf = pygame.display.get_surface() or self.surf
+        self.background = pygame.Surface(self.surf.get_size()).convert()
+        self.build_background(self.background)
+        self.surf.blit(self.background, (0, 0))
+        self.values.clear()
+        self.rects.clear()
+        self.draws.clear()
+        self.dirty = []
+        self.full = True
+
+    def handle(self, event):
+        if event.type in (pygame.VIDEORESIZE, pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+            self.invalidate()
+
+    def widget(self, key, value, draw):
+        if self.values.get(key, _MISSING) == value:
+            self.skipped += 1
+            return
+        old = self.rects.get(key)
+        if old is not None:
+            self.surf.blit(self.background, old, old)
+        rect = pygame.Rect(draw(self.surf))
+        self.values[key] = value
+        self.rects[key] = rect
+        self.draws[key] = draw
+        touched = [rect] if old is None else [rect, old]
+        if any(k != key and r.collidelist(touched) >= 0 for k, r in self.rects.items()):
+            touched = self._repair(touched)
+        elif old is not None:
+            touched = [rect.union(old)]
+        if not self.full:
+            self.dirty.extend(touched)
+
+    def _repair(self, touched):
+        # Все виджеты, задетые областью (и задетые ими), — заново на чистом фоне
+        keys, stack = set(), list(touched)
+        while stack:
+            r = stack.pop()
+            for k, kr in self.rects.items():
+                if k not in keys and kr.colliderect(r):
+                    keys.add(k)
+                    stack.append(kr)
+        area = list(touched) + [self.rects[k] for k in keys]
+        for r in area:
+            self.surf.blit(self.background, r, r)
+        for k in self.rects:
+            if k in keys:
+                self.rects[k] = pygame.Rect(self.draws[k](self.surf))
+                area.append(self.rects[k])
+        self.repaired += len(keys)
+        return area
+
+    def present(self):
+        if self.full:
+            pygame.display.flip()
+            self.full = False
+            self.flips += 1
+        elif self.dirty:
+            pygame.display.update(self.dirty)
+            self.updates += 1
+        self.dirty = []
+
+    def stats(self):
+        return {"flips": self.flips, "updates": self.updates, "skipped": self.skipped,
+                "repaired": self.repaired, "widgets": len(self.values)}
@@ -0,0 +1,296 @@
+import os
+import sys
+import tty
+import math
+import time
+import random
+import argparse
+import selectors
+from telemetry_proto import encode_frame
+
+# ==========================================
+# ESP32 SIMULATOR (PTY)
+# ==========================================
+# Плата без платы: процесс открывает псевдотерминал и шлёт в него ровно то,
+# что шлёт src/main.cpp — строку Serial.printf (JSON) или, после PROTO:BIN,
+# бинарный кадр v2. Любой HUD / ingest_daemon открывает slave-сторону как
+# обычный порт (путь печатается, --link делает стабильный симлинк).
+#
+#   python esp32_sim.py                                  # 100 Гц, спокойный полёт
+#   python esp32_sim.py --rate 5000 --link /tmp/esp32    # нагрузка
+#   python esp32_sim.py --script soak --loop             # длинный прогон
+#   python esp32_sim.py --script "calm:3,arm,turbulence:5,crash:2,disarm,gps_loss:4"
+#
+# Сценарий — шаги через запятую: режим:секунды (calm, turbulence, crash,
+# gps_loss) или мгновенное событие (arm, disarm). Команды с хоста
+# разбираются как в handleCommand(): ARM, DISARM, PROTO:BIN, PROTO:JSON.
+#
+# Темп 10 Гц–5 кГц. Если поток не успевает, кадры за пропущенное время
+# уходят одной записью (как из буфера UART); никто не читает — лишнее
+# выбрасывается и считается в dropped. В очереди остаётся не больше
+# PENDING_MAX байт: настоящий UART не хранит секунды истории, и HUD,
+# открывший порт позже, после reset_input_buffer() видит свежие кадры.
+
+# Формат строки 1:1 с Serial.printf в loop()
+PRINTF = ('{"r":%.1f,"p":%.1f,"lat":%.6f,"lon":%.6f,"alt":%.0f,"as":%.0f,'
+          '"st":%d,"arm":%d,"sd":%d,"noise":%.0f,"us":%d}\n')
+
+MIN_RATE, MAX_RATE = 10, 5000
+BAUD_RATE = 921600
+HOME = (42.87, 74.56, 760.0)      # lat, lon, alt — там, где карты HUD по умолчанию
+PENDING_MAX = 256                  # байт, которые ждут читателя: порядка FIFO UART
+CMD_MAX = 31                       # char cmd_buf[32] в main.cpp
+REPORT_S = 5.0
+
+SCENARIOS = {
+    "calm": "calm:60",
+    "demo": "calm:3,arm,turbulence:5,calm:2,gps_loss:4,calm:2,crash:2,disarm,calm:3",
+    "soak": "calm:20,arm,turbulence:10,calm:10,gps_loss:10,turbulence:5,crash:3,disarm,calm:10",
+}
+MODES = ("calm", "turbulence", "crash", "gps_loss")
+EVENTS = ("arm", "disarm")
+
+
+# ==========================================
+# BOARD MODEL
+# ==========================================
+class Board:
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.t0 = time.monotonic()          # «включение» платы: ноль micros()
+        self.mode = "calm"
+        self.mode_t = 0.0                   # когда включился режим
+        self.armed = False
+        self.binary = False
+        self.seq = 0
+        self.commands = 0
+        self.cmd_buf = b''
+        self.roll = self.pitch = 0.0
+
+    def set_mode(self, mode, t):
+        self.mode = mode
+        self.mode_t = t
+
+    def sample(self, t):
+        # Сэмпл на момент t (monotonic), как его считает loop() платы
+        up = t - self.t0
+        rng = self.rng
+        r = 8 * math.sin(up * 0.5) + rng.gauss(0, 0.3)
+        p = 4 * math.sin(up * 0.3) + rng.gauss(0, 0.3)
+        safe, st, noise = 97 + rng.uniform(-2, 2), 0, rng.uniform(5, 15)
+        if self.mode == "turbulence":
+            r += rng.gauss(0, 12)
+            p += rng.gauss(0, 8)
+            safe, st, noise = rng.uniform(55, 70), 1, rng.uniform(40, 80)
+        elif self.mode == "crash":
+            k = min(1.0, (t - self.mode_t) / 1.5)    # сваливание за полторы секунды
+            r += k * 150 + rng.gauss(0, 20 * k)
+            p += -k * 60 + rng.gauss(0, 10 * k)
+            r = (r + 180) % 360 - 180
+            safe, st, noise = rng.uniform(3, 20), 2, rng.uniform(85, 100)
+        # Сглаживание как у акселерометра с ФНЧ: без скачков от кадра к кадру
+        a = 0.3 if self.mode != "crash" else 0.6
+        self.roll += (r - self.roll) * a
+        self.pitch += (p - self.pitch) * a
+
+        if self.mode == "gps_loss":
+            lat = lon = alt = 0.0                    # TinyGPS++ без фикса
+        else:
+            lat = HOME[0] + 0.002 * math.sin(up * 0.02)
+            lon = HOME[1] + 0.002 * math.cos(up * 0.02)
+            alt = HOME[2] + 15 * math.sin(up * 0.05)
+        return {"r": self.roll, "p": self.pitch, "lat": lat, "lon": lon, "alt": alt,
+                "as": safe, "st": st, "arm": int(self.armed), "sd": 0, "noise": noise,
+                "us": int(up * 1e6) & 0xFFFFFFFF}
+
+    def frame(self, t):
+        d = self.sample(t)
+        if self.binary:
+            out = encode_frame(d, self.seq)
+            self.seq = (self.seq + 1) & 0xFFFF
+            return out
+        return (PRINTF % (d["r"], d["p"], d["lat"], d["lon"], d["alt"], d["as"],
+                          d["st"], d["arm"], d["sd"], d["noise"], d["us"])).encode()
+
+    # ------------------------------------------
+    # COMMANDS (как handleCommand / pollCommands в main.cpp)
+    # ------------------------------------------
+    def feed(self, data):
+        self.cmd_buf += data
+        *lines, self.cmd_buf = self.cmd_buf.replace(b'\r', b'\n').split(b'\n')
+        self.cmd_buf = self.cmd_buf[:CMD_MAX]          # хвост длинной строки отбрасывается
+        for line in lines:
+            if line:
+                self.command(line[:CMD_MAX].decode(errors='replace'))
+
+    def command(self, c):
+        self.commands += 1
+        if c == "ARM": self.armed = True
+        elif c == "DISARM": self.armed = False
+        elif c == "PROTO:BIN": self.binary = True
+        elif c == "PROTO:JSON": self.binary = False
+
+
+# ==========================================
+# SCENARIO
+# ==========================================
+def parse_script(text):
+    text = SCENARIOS.get(text, text)
+    steps = []
+    for item in filter(None, (s.strip() for s in text.split(","))):
+        name, _, dur = item.partition(":")
+        if name in EVENTS:
+            steps.append((name, 0.0))
+        elif name in MODES:
+            steps.append((name, float(dur or 5)))
+        else:
+            raise ValueError(f"unknown step '{name}' (modes: {', '.join(MODES)}; events: {', '.join(EVENTS)})")
+    return steps
+
+
+class Script:
+    def __init__(self, steps, loop=False):
+        self.steps = steps
+        self.loop = loop
+        self.i = -1
+        self.until = 0.0
+        self.done = not steps
+
+    def advance(self, board, now):
+        # Шаги, чьё время пришло (события срабатывают сразу)
+        while not self.done and now >= self.until:
+            self.i += 1
+            if self.i >= len(self.steps):
+                if not self.loop:
+                    self.done = True
+                    return
+                self.i = 0
+            name, dur = self.steps[self.i]
+            if name == "arm":
+                board.armed = True
+            elif name == "disarm":
+                board.armed = False
+            else:
+                board.set_mode(name, now)
+            self.until = now + dur
+
+    def current(self):
+        return self.steps[self.i][0] if 0 <= self.i < len(self.steps) else "-"
+
+
+# ==========================================
+# PTY LOOP
+# ==========================================
+class PtySimulator:
+    def __init__(self, board, script, rate=100, link=None):
+        self.board = board
+        self.script = script
+        self.rate = max(MIN_RATE, min(MAX_RATE, rate))
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)              # без эха и построчной буферизации
+        os.set_blocking(self.master, False)
+        self.path = os.ttyname(self.slave)  # slave держим открытым: pty живёт между HUD
+        self.link = link
+        if link:
+            if os.path.islink(link):
+                os.unlink(link)
+            os.symlink(self.path, link)
+        self.pending = b''
+        self.frames = 0
+        self.bytes = 0
+        self.dropped = 0
+        self.writes = 0
+
+    def _write(self, data):
+        data = self.pending + data
+        try:
+            n = os.write(self.master, data)
+        except BlockingIOError:
+            n = 0
+        self.bytes += n
+        self.writes += 1
+        self.pending = data[n:]
+        if len(self.pending) > PENDING_MAX:
+            self.dropped += len(self.pending)  # никто не читает порт
+            self.pending = b''
+
+    def run(self, duration=None):
+        period = 1.0 / self.rate
+        sel = selectors.DefaultSelector()
+        sel.register(self.master, selectors.EVENT_READ)
+        start = next_t = last_report = time.monotonic()
+        frames0 = 0
+        try:
+            while duration is None or time.monotonic() - start < duration:
+                now = time.monotonic()
+                self.script.advance(self.board, now)
+                if now >= next_t:
+                    # Все кадры, чьё время пришло; после долгой паузы не догоняем больше 0.1 с
+                    n = int((now - next_t) / period) + 1
+                    if n > self.rate // 10 + 1:
+                        next_t = now - (self.rate // 10) * period
+                        n = self.rate // 10 + 1
+                    self._write(b''.join(self.board.frame(next_t + k * period) for k in range(n)))
+                    self.frames += n
+                    next_t += n * period
+                for _ in sel.select(max(0.0, next_t - time.monotonic())):
+                    try:
+                        self.board.feed(os.read(self.master, 4096))
+                    except (BlockingIOError, OSError):
+                        pass
+                if now - last_report >= REPORT_S:
+                    hz = (self.frames - frames0) / (now - last_report)
+                    frames0, last_report = self.frames, now
+                    print(self.status(hz), flush=True)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sel.close()
+            self.close()
+        return time.monotonic() - start
+
+    def status(self, hz):
+        b = self.board
+        return (f"{self.path} {'BIN' if b.binary else 'JSON'} {hz:.0f} Hz, frames {self.frames}, "
+                f"dropped {self.dropped} B, cmds {b.commands}, {'ARMED' if b.armed else 'SAFE'}, "
+                f"step {self.script.current()}")
+
+    def close(self):
+        if self.link and os.path.islink(self.link):
+            os.unlink(self.link)
+        os.close(self.master)
+        os.close(self.slave)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="ESP32 telemetry simulator on a pseudo-terminal")
+    ap.add_argument("--rate", type=int, default=100, help=f"Гц, {MIN_RATE}..{MAX_RATE}")
+    ap.add_argument("--script", default="calm", help=f"шаги или пресет: {', '.join(SCENARIOS)}")
+    ap.add_argument("--loop", action="store_true", help="повторять сценарий")
+    ap.add_argument("--link", help="симлинк на slave, например /tmp/esp32")
+    ap.add_argument("--duration", type=float, help="секунд, потом выход")
+    ap.add_argument("--binary", action="store_true", help="сразу бинарные кадры (как после PROTO:BIN)")
+    ap.add_argument("--seed", type=int)
+    args = ap.parse_args()
+
+    if not hasattr(os, "openpty"):
+        sys.exit("pty недоступен на этой платформе")
+    try:
+        script = Script(parse_script(args.script), args.loop)
+    except ValueError as e:
+        sys.exit(str(e))
+    board = Board(args.seed)
+    board.binary = args.binary
+    sim = PtySimulator(board, script, args.rate, args.link)
+    # Размер кадра — на отдельной плате: board не тратит RNG, ФНЧ и seq
+    sizer = Board(args.seed)
+    sizer.binary = args.binary
+    frame_bytes = len(sizer.frame(time.monotonic()))
+    print(f"ESP32 SIM: {sim.path}" + (f" -> {args.link}" if args.link else "") + f" @ {sim.rate} Hz")
+    if sim.rate * frame_bytes * 10 > BAUD_RATE:
+        print(f"NOTE: {sim.rate} Hz x {frame_bytes} B не пролезет в UART {BAUD_RATE} бод (pty не ограничивает)")
+    sim.run(args.duration)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
 import pygame
-import serial
-import json
 import math
 import random
 from collections import deque
+from serial_link import SerialLink
+from pfd_renderer import ground_polygon
+from hud_text import get_font, text_cache
+from attitude import AttitudeEstimator
+from latency import latency
 
 # ==============================================================================
 # КОНФИГУРАЦИЯ "TURBO MODE"
@@ -23,9 +26,8 @@ C_OK        = (0, 255, 0)
 C_SKY       = (0, 40, 70)
 C_GND       = (40, 25, 5)
 
-# СГЛАЖИВАНИЕ (1.0 = Мгновенно, 0.1 = Очень плавно)
-# Поставил 0.4 - это баланс между резкостью и отсутствием шума
-SMOOTHING = 0.4 
+# ЗАДЕРЖКА ПОКАЗА (attitude.py): 0 = прогноз на «сейчас», больше = плавнее
+DISPLAY_LATENCY = 0.005
 
 # ==============================================================================
 # МАТЕМАТИКА
@@ -71,113 +73,87 @@ class FastDrone:
 
 class Horizon:
     def draw(self, surf, r, p):
-        # Оптимизированный горизонт (просто линия и полигоны)
+        # Аналитический горизонт: без временных Surface и без rotate.
+        # Земля — один полигон (экран, обрезанный повёрнутой линией горизонта)
         cx, cy = WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2
         dy = p * 8 # Сдвиг пикселей на градус
+        view = surf.get_rect()
         
-        # Вращение линии горизонта
+        surf.fill(C_SKY)
+        ground = ground_polygon(view, cx, cy, r, dy)
+        if len(ground) >= 3:
+            pygame.draw.polygon(surf, C_GND, ground)
+        
+        # Линия горизонта, обрезанная по окну
         angle = math.radians(r)
         cos_a, sin_a = math.cos(angle), math.sin(angle)
-        
-        # Строим линию горизонта (очень широкую)
-        width = 2000
-        # Левая и правая точки линии до вращения
-        x1, y1 = -width, dy
-        x2, y2 = width, dy
-        
-        # Вращаем точки
-        rx1 = x1 * cos_a - y1 * sin_a + cx
-        ry1 = x1 * sin_a + y1 * cos_a + cy
-        rx2 = x2 * cos_a - y2 * sin_a + cx
-        ry2 = x2 * sin_a + y2 * cos_a + cy
-        
-        # Рисуем небо (полигон: верх экрана и линия горизонта)
-        # Для простоты просто рисуем линию горизонта и фоны
-        surf.fill(C_SKY if p > 0 else C_GND) # Базовый цвет зависит от наклона
-        
-        # Рисуем гигантский прямоугольник "Земли", который вращается
-        earth_surf = pygame.Surface((2000, 2000))
-        earth_surf.fill(C_GND)
-        rotated_earth = pygame.transform.rotate(earth_surf, -r)
-        
-        # Смещаем землю по тангажу
-        rect = rotated_earth.get_rect(center=(cx, cy + dy + 1000)) # +1000 т.к. центр земли ниже
-        surf.blit(rotated_earth, rect)
-        
-        pygame.draw.line(surf, (255,255,255), (rx1, ry1), (rx2, ry2), 2)
+        hx, hy = cx - dy * sin_a, cy + dy * cos_a # Точка горизонта под центром
+        reach = view.width + view.height
+        seg = view.clipline(hx - reach * cos_a, hy - reach * sin_a, hx + reach * cos_a, hy + reach * sin_a)
+        if seg:
+            pygame.draw.line(surf, (255,255,255), seg[0], seg[1], 2)
 
 # ==============================================================================
 # MAIN
 # ==============================================================================
-pygame.init()
-screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-clock = pygame.time.Clock()
-font = pygame.font.SysFont("consolas", 24, bold=True)
-
-drone = FastDrone()
-horizon = Horizon()
-
-try:
-    ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=0.01) # Low timeout
-except:
-    print("NO SERIAL")
-
-target_r, target_p = 0.0, 0.0
-curr_r, curr_p = 0.0, 0.0
-
-running = True
-while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT: running = False
-
-    # --- ВАЖНО: ЧИТАЕМ ВСЁ ДО ПОСЛЕДНЕЙ КАПЛИ ---
-    # Этот цикл сбрасывает лаг. Мы читаем пока есть данные,
-    # и запоминаем только ПОСЛЕДНЮЮ строчку.
-    if 'ser' in locals():
-        last_valid_line = None
-        while ser.in_waiting > 0:
-            try:
-                line = ser.readline().decode('utf-8', errors='ignore').strip()
-                if line.startswith('{') and '}' in line:
-                    last_valid_line = line
-            except: pass
-        
-        # Если нашли свежие данные - обновляем цель
-        if last_valid_line:
-            try:
-                data = json.loads(last_valid_line)
-                target_r = data.get("r", 0)
-                target_p = data.get("p", 0)
-            except: pass
-
-    # Быстрая интерполяция
-    curr_r += (target_r - curr_r) * SMOOTHING
-    curr_p += (target_p - curr_p) * SMOOTHING
-
-    # Рендер
-    screen.fill(C_SKY) # Сброс
+def main():
+    pygame.init()
+    screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+    clock = pygame.time.Clock()
+    font = get_font("consolas", 24, bold=True)
+
+    drone = FastDrone()
+    horizon = Horizon()
+
+    # Порт, скорость и протокол ищутся сами; после обрыва — переподключение
+    link = SerialLink(SERIAL_PORT, BAUD_RATE,
+                      on_connect=lambda link: latency.set_link(link.baud)).start()
+
+    # Положение по времени приёма сэмплов (одинаково при любом FPS)
+    attitude = AttitudeEstimator(latency=DISPLAY_LATENCY, link_latency=latency.uart_delay)
+
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT: running = False
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_l: latency.toggle()
+
+        # --- Только ПОСЛЕДНИЙ кадр: лаг не копится ---
+        # Поток приёма держит свежий кадр с временем приёма, новый кадр
+        # оценщик узнаёт по d["t"]
+        data = link.get()
+        if attitude.feed(data): latency.consume(data)
+
+        # Интерполяция по времени
+        curr_r, curr_p = attitude.get()
+
+        # Рендер (горизонт сам заливает весь экран)
+        # 1. Горизонт
+        horizon.draw(screen, curr_r, curr_p)
     
-    # 1. Горизонт
-    horizon.draw(screen, curr_r, curr_p)
+        # 2. Дрон
+        drone.draw(screen, curr_r, curr_p)
     
-    # 2. Дрон
-    drone.draw(screen, curr_r, curr_p)
+        # 3. HUD
+        # Центральный маркер
+        cx, cy = WINDOW_WIDTH//2, WINDOW_HEIGHT//2
+        pygame.draw.line(screen, C_ALERT, (cx-30, cy), (cx-10, cy), 2)
+        pygame.draw.line(screen, C_ALERT, (cx+10, cy), (cx+30, cy), 2)
+        pygame.draw.circle(screen, C_ALERT, (cx, cy), 3)
+
+        # Данные
+        text_cache.number(screen, font, f"R: {curr_r:.1f}", C_HUD_MAIN, (20, 20))
+        text_cache.number(screen, font, f"P: {curr_p:.1f}", C_HUD_MAIN, (20, 50))
     
-    # 3. HUD
-    # Центральный маркер
-    cx, cy = WINDOW_WIDTH//2, WINDOW_HEIGHT//2
-    pygame.draw.line(screen, C_ALERT, (cx-30, cy), (cx-10, cy), 2)
-    pygame.draw.line(screen, C_ALERT, (cx+10, cy), (cx+30, cy), 2)
-    pygame.draw.circle(screen, C_ALERT, (cx, cy), 3)
-
-    # Данные
-    screen.blit(font.render(f"R: {curr_r:.1f}", True, C_HUD_MAIN), (20, 20))
-    screen.blit(font.render(f"P: {curr_p:.1f}", True, C_HUD_MAIN), (20, 50))
-    
-    # FPS Counter (для проверки тормозов)
-    screen.blit(font.render(f"FPS: {int(clock.get_fps())}", True, (255,255,0)), (WINDOW_WIDTH-120, 20))
+        # FPS Counter (для проверки тормозов)
+        text_cache.number(screen, font, f"FPS: {int(clock.get_fps())}", (255,255,0), (WINDOW_WIDTH-120, 20))
+        latency.draw(screen, get_font("consolas", 16), (20, 90))
+
+        pygame.display.flip()
+        latency.flipped()
+        clock.tick(FPS)
 
-    pygame.display.flip()
-    clock.tick(FPS)
+    pygame.quit()
 
-pygame.quit()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
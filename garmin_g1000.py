@@ -1,12 +1,13 @@
 import pygame
-import serial
-import json
-import math
-import requests
-import io
-import threading
 import time
-from PIL import Image
+from ingest_daemon import ShmReader
+from serial_link import SerialLink
+from pfd_renderer import PFDRenderer
+from telemetry_store import TelemetryStore
+from hud_text import get_font, text_cache
+from attitude import AttitudeEstimator
+from latency import latency
+from tile_mosaic import TileMosaic
 
 # --- КОНФИГУРАЦИЯ ---
 SERIAL_PORT = '/dev/cu.wchusbserial1440' 
@@ -33,75 +34,53 @@ class SerialReader:
     def __init__(self, port, baud):
         self.data = {} 
         self.running = True
-        try:
-            self.ser = serial.Serial(port, baud, timeout=0.01)
-            print(f"CONNECTED @ {baud}")
-            threading.Thread(target=self._worker, daemon=True).start()
-        except:
-            print("SIMULATION MODE")
-            self.ser = None
-
-    def _worker(self):
-        while self.running:
-            if self.ser and self.ser.in_waiting:
-                try:
-                    # Читаем сразу пачку байт, берем последнюю строку
-                    raw = self.ser.read(self.ser.in_waiting).decode(errors='ignore')
-                    lines = raw.split('\n')
-                    for line in lines:
-                        if line.startswith('{') and line.endswith('}'):
-                            try: self.data = json.loads(line)
-                            except: pass
-                except: pass
-            else:
-                time.sleep(0.001)
+        self.history = TelemetryStore() # Все поля телеметрии с метками времени
+        # Поиск порта, скорость и протокол по первым кадрам, переподключение
+        # (serial_link.py); поток спит на дескрипторе порта, парсер отдаёт
+        # только последний целый кадр (JSON или бинарный)
+        self.link = SerialLink(port, baud, on_frame=self._on_frame,
+                               on_connect=lambda link: latency.set_link(link.baud)).start()
+
+    def _on_frame(self, d):
+        self.data = d
+        self.history.append(d)
 
     def get(self):
         return self.data
 
     def stop(self):
         self.running = False
-        if self.ser: self.ser.close()
+        self.link.stop()
 
 # ==========================================
 # MAP ENGINE (ASYNC)
 # ==========================================
 class AsyncMap:
+    # Мозаика тайлов вокруг точной позиции (tile_mosaic.py): панорама каждый
+    # кадр без сети, соседние тайлы качаются в фоне
     def __init__(self, w, h):
         self.w, self.h = w, h
-        self.surf = pygame.Surface((w, h))
-        self.surf.fill((20, 20, 25))
-        self.loading = False
-        self.last = (0,0)
+        self.mosaic = TileMosaic(w, h, "imagery", zoom=16, bg=(20, 20, 25))
 
     def update(self, lat, lon):
         if lat == 0: lat, lon = 42.87, 74.56 # Бишкек дефолт
-        if not self.loading and (abs(lat-self.last[0])>0.002 or abs(lon-self.last[1])>0.002):
-            self.last = (lat, lon)
-            self.loading = True
-            threading.Thread(target=self._fetch, args=(lat, lon)).start()
-
-    def _fetch(self, lat, lon):
-        try:
-            zoom = 15
-            n = 2.0 ** zoom
-            xtile = int((lon + 180.0) / 360.0 * n)
-            ytile = int((1.0 - math.log(math.tan(math.radians(lat)) + (1 / math.cos(math.radians(lat)))) / math.pi) / 2.0 * n)
-            url = f"https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{zoom}/{ytile}/{xtile}"
-            resp = requests.get(url, headers={'User-Agent': 'Flight/1.0'})
-            if resp.status_code == 200:
-                img_bytes = io.BytesIO(resp.content)
-                pil_img = Image.open(img_bytes).resize((self.w, self.h))
-                self.surf = pygame.image.fromstring(pil_img.tobytes(), pil_img.size, pil_img.mode)
-        except: pass
-        finally: self.loading = False
+        self.mosaic.update(lat, lon)
+
+    def zoom(self, step):
+        self.mosaic.set_zoom(self.mosaic.target_zoom + step)
+
+    def project(self, lat, lon):
+        if lat == 0: lat, lon = 42.87, 74.56
+        return self.mosaic.project(lat, lon)
 
     def draw(self, surf, x, y):
-        surf.blit(self.surf, (x, y))
+        self.mosaic.draw(surf, x, y)
 
 # ==========================================
 # GRAPHICS COMPONENTS
 # ==========================================
+pfd_renderer = PFDRenderer(px_per_deg=12, line_half=40, horizon_width=3, line_color=C_WHITE)
+
 def draw_pfd(surf, x, y, w, h, r, p, ai_status):
     rect = pygame.Rect(x, y, w, h)
     surf.set_clip(rect)
@@ -114,22 +93,8 @@ def draw_pfd(surf, x, y, w, h, r, p, ai_status):
         sky_col = (100, 0, 0)
 
     cx, cy = x+w//2, y+h//2
-    size = max(w, h) * 1.5
-    big = pygame.Surface((size, size))
-    big.fill(bg_col)
-    
-    shift = p * 12
-    pygame.draw.rect(big, sky_col, (0, 0, size, size//2 + shift))
-    pygame.draw.line(big, C_WHITE, (0, size//2 + shift), (size, size//2 + shift), 3)
-    
-    # Pitch lines
-    for i in range(-90, 91, 10):
-        if i == 0: continue
-        dy = size//2 + shift - (i * 12)
-        pygame.draw.line(big, C_WHITE, (size//2-40, dy), (size//2+40, dy), 1)
-    
-    rot = pygame.transform.rotate(big, -r)
-    surf.blit(rot, rot.get_rect(center=(cx, cy)))
+    # Небо/земля/лестница из кэша повёрнутых текстур: один blit за кадр
+    pfd_renderer.draw(surf, rect, r, p, sky_col, bg_col)
     
     # HUD Plane
     pygame.draw.line(surf, C_YELLOW, (cx-50, cy), (cx-20, cy), 5)
@@ -144,7 +109,7 @@ def draw_diagnostics(surf, x, y, score, status, armed, sd_ok, noise):
     pygame.draw.rect(surf, (20, 25, 30), (x, y, 220, 160))
     pygame.draw.rect(surf, C_HUD, (x, y, 220, 160), 2)
     
-    font = pygame.font.SysFont("consolas", 18, bold=True)
+    font = get_font("consolas", 18, bold=True)
     
     # 1. AI STATUS
     col_ai = C_GREEN
@@ -152,7 +117,7 @@ def draw_diagnostics(surf, x, y, score, status, armed, sd_ok, noise):
     if status == 1: col_ai, txt_ai = C_YELLOW, "TURBULENCE"
     if status == 2: col_ai, txt_ai = C_RED, "CRASH ALERT"
     
-    surf.blit(font.render(f"AI: {txt_ai}", True, col_ai), (x+10, y+10))
+    text_cache.text(surf, font, f"AI: {txt_ai}", col_ai, (x+10, y+10))
     # Safety Bar
     pygame.draw.rect(surf, (50,50,50), (x+10, y+35, 200, 10))
     pygame.draw.rect(surf, col_ai, (x+10, y+35, int(score)*2, 10))
@@ -160,7 +125,7 @@ def draw_diagnostics(surf, x, y, score, status, armed, sd_ok, noise):
     # 2. SD STATUS
     col_sd = C_GREEN if sd_ok else C_RED
     txt_sd = "REC [ON]" if sd_ok else "REC [OFF]"
-    surf.blit(font.render(txt_sd, True, col_sd), (x+10, y+60))
+    text_cache.text(surf, font, txt_sd, col_sd, (x+10, y+60))
     
     # 3. ENGINE ACOUSTICS
     eng_stat = "IDLE"
@@ -169,7 +134,7 @@ def draw_diagnostics(surf, x, y, score, status, armed, sd_ok, noise):
         if noise > 10: eng_stat, eng_col = "NOMINAL", C_GREEN
         else: eng_stat, eng_col = "FAILURE!", C_RED
         
-    surf.blit(font.render(f"ENG: {eng_stat}", True, eng_col), (x+10, y+90))
+    text_cache.text(surf, font, f"ENG: {eng_stat}", eng_col, (x+10, y+90))
     # Noise Bar
     pygame.draw.rect(surf, (50,50,50), (x+10, y+115, 200, 10))
     pygame.draw.rect(surf, C_HUD, (x+10, y+115, min(int(noise)*2, 200), 10))
@@ -183,11 +148,12 @@ def main():
     pygame.display.set_caption("GARMIN G1000 NXi // AI CORE")
     clock = pygame.time.Clock()
     
-    io_engine = SerialReader(SERIAL_PORT, BAUD_RATE)
+    # Если порт уже держит ingest_daemon.py — читаем из shared memory
+    io_engine = ShmReader.attach() or SerialReader(SERIAL_PORT, BAUD_RATE)
     map_engine = AsyncMap(600, 760)
     
-    # Smooth Physics
-    r, p = 0, 0
+    # Положение по времени приёма сэмплов, а не по кадрам (attitude.py)
+    attitude = AttitudeEstimator(link_latency=latency.uart_delay)
     
     running = True
     while running:
@@ -195,13 +161,14 @@ def main():
             if e.type == pygame.QUIT:
                 io_engine.stop()
                 running = False
+            if e.type == pygame.KEYDOWN and e.key in (pygame.K_EQUALS, pygame.K_PLUS): map_engine.zoom(+1)
+            if e.type == pygame.KEYDOWN and e.key == pygame.K_MINUS: map_engine.zoom(-1)
+            if e.type == pygame.KEYDOWN and e.key == pygame.K_l: latency.toggle()
 
         # 1. GET DATA (NON-BLOCKING)
         data = io_engine.get()
         
         # Парсинг (с дефолтными значениями, чтобы не падало)
-        tr = data.get("r", 0)
-        tp = data.get("p", 0)
         alt = data.get("alt", 0)
         lat = data.get("lat", 0)
         lon = data.get("lon", 0)
@@ -213,9 +180,9 @@ def main():
         sd_ok = data.get("sd", 0)
         noise = data.get("noise", 0)
         
-        # Сглаживание движения
-        r += (tr - r) * 0.15
-        p += (tp - p) * 0.15
+        # Сглаживание движения (одинаковое при любом FPS)
+        if attitude.feed(data): latency.consume(data)
+        r, p = attitude.get()
         
         # 2. DRAW
         screen.fill(C_BG)
@@ -228,7 +195,8 @@ def main():
         map_engine.draw(screen, 740, 20)
         
         # Plane on Map
-        cx, cy = 740 + 300, 20 + 380
+        mx, my = map_engine.project(lat, lon) # Точная позиция на мозаике
+        cx, cy = 740 + mx, 20 + my
         plane_img = pygame.Surface((40,40), pygame.SRCALPHA)
         pygame.draw.polygon(plane_img, C_MAGENTA, [(20,0), (10,30), (30,30)])
         # Вращаем самолетик (используем крен как курс, т.к. нет компаса)
@@ -239,10 +207,11 @@ def main():
         draw_diagnostics(screen, WIDTH//2 - 110, 20, score, status, armed, sd_ok, noise)
         
         # Altitude Text
-        font = pygame.font.SysFont("consolas", 30)
-        screen.blit(font.render(f"ALT: {alt:.0f}m", True, C_WHITE), (760, 50))
+        text_cache.number(screen, get_font("consolas", 30), f"ALT: {alt:.0f}m", C_WHITE, (760, 50))
+        latency.draw(screen, get_font("consolas", 16), (760, 90))
         
         pygame.display.flip()
+        latency.flipped()
         clock.tick(FPS)
 
     pygame.quit()
@@ -1,13 +1,13 @@
 import pygame
-import serial
-import json
-import math
-import requests
-import io
-import threading
 import time
-import numpy as np
-from PIL import Image
+from ingest_daemon import ShmReader
+from serial_link import SerialLink
+from pfd_renderer import PFDRenderer
+from telemetry_store import TelemetryStore
+from hud_text import get_font, text_cache
+from attitude import AttitudeEstimator
+from latency import latency
+from tile_mosaic import TileMosaic
 
 # --- CONFIG ---
 SERIAL_PORT = '/dev/cu.wchusbserial1440' 
@@ -31,80 +31,53 @@ class SerialReader:
     def __init__(self, port, baud):
         self.data = {} # Сюда кладем свежие данные
         self.running = True
-        try:
-            self.ser = serial.Serial(port, baud, timeout=0.01)
-            print(f"CONNECTED @ {baud} BAUD")
-            # Запускаем демона-читателя
-            self.thread = threading.Thread(target=self._worker)
-            self.thread.daemon = True
-            self.thread.start()
-        except:
-            print("SIMULATION MODE")
-            self.ser = None
-
-    def _worker(self):
-        while self.running:
-            if self.ser and self.ser.in_waiting:
-                try:
-                    # Читаем сразу всё что есть, берем последнюю строку
-                    raw = self.ser.read(self.ser.in_waiting).decode(errors='ignore')
-                    lines = raw.split('\n')
-                    for line in lines:
-                        line = line.strip()
-                        if line.startswith('{') and line.endswith('}'):
-                            try:
-                                self.data = json.loads(line)
-                            except: pass
-                except: pass
-            else:
-                time.sleep(0.001) # Не грузим CPU если пусто
+        self.history = TelemetryStore() # Все поля телеметрии с метками времени
+        # Сам находит плату и переподключается после обрыва USB; бинарный
+        # протокол, JSON как запасной
+        self.link = SerialLink(port, baud, on_frame=self._on_frame,
+                               on_connect=lambda link: latency.set_link(link.baud)).start()
+
+    def _on_frame(self, d):
+        # Берем последний целый кадр
+        self.data = d
+        self.history.append(d)
 
     def get(self):
         return self.data
 
     def stop(self):
         self.running = False
-        if self.ser: self.ser.close()
+        self.link.stop()
 
 # ==========================================
 # MAP ENGINE
 # ==========================================
 class AsyncMap:
+    # Мозаика тайлов вокруг точной позиции (tile_mosaic.py): панорама каждый
+    # кадр без сети, соседние тайлы качаются в фоне
     def __init__(self, w, h):
         self.w, self.h = w, h
-        self.surf = pygame.Surface((w, h))
-        self.surf.fill((20, 20, 25))
-        self.loading = False
-        self.last = (0,0)
+        self.mosaic = TileMosaic(w, h, "imagery", zoom=15, bg=(20, 20, 25))
 
     def update(self, lat, lon):
         if lat == 0: lat, lon = 42.87, 74.56
-        if not self.loading and (abs(lat-self.last[0])>0.002 or abs(lon-self.last[1])>0.002):
-            self.last = (lat, lon)
-            self.loading = True
-            threading.Thread(target=self._fetch, args=(lat, lon)).start()
-
-    def _fetch(self, lat, lon):
-        try:
-            zoom = 14
-            n = 2.0 ** zoom
-            xtile = int((lon + 180.0) / 360.0 * n)
-            ytile = int((1.0 - math.log(math.tan(math.radians(lat)) + (1 / math.cos(math.radians(lat)))) / math.pi) / 2.0 * n)
-            url = f"https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{zoom}/{ytile}/{xtile}"
-            resp = requests.get(url, headers={'User-Agent': 'Flight/1.0'})
-            if resp.status_code == 200:
-                ib = io.BytesIO(resp.content)
-                pi = Image.open(ib).resize((self.w, self.h))
-                self.surf = pygame.image.fromstring(pi.tobytes(), pi.size, pi.mode)
-        except: pass
-        finally: self.loading = False
+        self.mosaic.update(lat, lon)
+
+    def zoom(self, step):
+        self.mosaic.set_zoom(self.mosaic.target_zoom + step)
+
+    def project(self, lat, lon):
+        if lat == 0: lat, lon = 42.87, 74.56
+        return self.mosaic.project(lat, lon)
 
     def draw(self, surf, x, y):
-        surf.blit(self.surf, (x, y))
+        self.mosaic.draw(surf, x, y)
 
 # ==========================================
 # GRAPHICS & UI
 # ==========================================
+pfd_renderer = PFDRenderer(px_per_deg=15, line_half=50, horizon_width=3, line_color=C_WHITE)
+
 def draw_pfd(surf, x, y, w, h, r, p, status):
     rect = pygame.Rect(x, y, w, h)
     surf.set_clip(rect)
@@ -112,24 +85,9 @@ def draw_pfd(surf, x, y, w, h, r, p, status):
     # Фон (меняется при опасности)
     bg_col = (50, 0, 0) if status == 2 and int(time.time()*15)%2 else C_GND
     
-    # Горизонт
+    # Горизонт: готовая повёрнутая текстура из кэша, тангаж — смещение blit
     cx, cy = x+w//2, y+h//2
-    size = max(w, h) * 1.5
-    big = pygame.Surface((size, size))
-    big.fill(bg_col)
-    
-    shift = p * 15
-    pygame.draw.rect(big, C_SKY, (0, 0, size, size//2 + shift))
-    pygame.draw.line(big, C_WHITE, (0, size//2 + shift), (size, size//2 + shift), 3)
-    
-    # Сетка тангажа
-    for i in range(-90, 91, 10):
-        if i == 0: continue
-        dy = size//2 + shift - (i * 15)
-        pygame.draw.line(big, C_WHITE, (size//2-50, dy), (size//2+50, dy), 1)
-    
-    rot = pygame.transform.rotate(big, -r)
-    surf.blit(rot, rot.get_rect(center=(cx, cy)))
+    pfd_renderer.draw(surf, rect, r, p, C_SKY, bg_col)
     
     # HUD
     pygame.draw.line(surf, (255,255,0), (cx-60, cy), (cx-20, cy), 5)
@@ -149,11 +107,11 @@ def draw_ai_brain(surf, x, y, score):
     w = int((score / 100) * 180)
     pygame.draw.rect(surf, col, (x+10, y+40, w, 20))
     
-    font = pygame.font.SysFont("consolas", 20, bold=True)
-    surf.blit(font.render(f"NEURAL SCORE: {int(score)}%", True, C_WHITE), (x+10, y+10))
+    font = get_font("consolas", 20, bold=True)
+    text_cache.number(surf, font, f"NEURAL SCORE: {int(score)}%", C_WHITE, (x+10, y+10))
     
     status = "SAFE" if score > 80 else "CRITICAL"
-    surf.blit(font.render(status, True, col), (x+10, y+70))
+    text_cache.text(surf, font, status, col, (x+10, y+70))
 
 # ==========================================
 # MAIN
@@ -164,32 +122,34 @@ def main():
     pygame.display.set_caption("GARMIN REAL-TIME AI")
     clock = pygame.time.Clock()
     
-    io_engine = SerialReader(SERIAL_PORT, BAUD_RATE)
+    # Если порт уже держит ingest_daemon.py — читаем из shared memory
+    io_engine = ShmReader.attach() or SerialReader(SERIAL_PORT, BAUD_RATE)
     map_engine = AsyncMap(600, 760)
     
-    # Physics smoothing
-    r, p = 0, 0
+    # Положение по времени приёма сэмплов, а не по кадрам (attitude.py)
+    attitude = AttitudeEstimator(link_latency=latency.uart_delay)
     
     while True:
         for e in pygame.event.get():
             if e.type == pygame.QUIT:
                 io_engine.stop()
                 return
+            if e.type == pygame.KEYDOWN and e.key in (pygame.K_EQUALS, pygame.K_PLUS): map_engine.zoom(+1)
+            if e.type == pygame.KEYDOWN and e.key == pygame.K_MINUS: map_engine.zoom(-1)
+            if e.type == pygame.KEYDOWN and e.key == pygame.K_l: latency.toggle()
 
         # 1. МГНОВЕННОЕ ПОЛУЧЕНИЕ ДАННЫХ
         data = io_engine.get()
         
-        target_r = data.get("r", 0)
-        target_p = data.get("p", 0)
         lat = data.get("lat", 0)
         lon = data.get("lon", 0)
         alt = data.get("alt", 0)
         score = data.get("as", 100) # AI Score
         status = data.get("st", 0)  # AI Status
         
-        # 2. Очень быстрая интерполяция (для 120 FPS)
-        r += (target_r - r) * 0.2
-        p += (target_p - p) * 0.2
+        # 2. Интерполяция по времени (одинаковая при 60 и 120 FPS)
+        if attitude.feed(data): latency.consume(data)
+        r, p = attitude.get()
         
         screen.fill(C_BG)
         
@@ -204,11 +164,12 @@ def main():
         draw_ai_brain(screen, WIDTH//2 - 100, 20, score)
         
         # Данные GPS
-        font = pygame.font.SysFont("consolas", 18)
         txt = f"ALT: {alt:.0f}m   LAT: {lat:.5f}   LON: {lon:.5f}"
-        screen.blit(font.render(txt, True, C_WHITE), (750, 40))
+        text_cache.number(screen, get_font("consolas", 18), txt, C_WHITE, (750, 40))
+        latency.draw(screen, get_font("consolas", 16), (750, 70))
         
         pygame.display.flip()
+        latency.flipped()
         clock.tick(FPS)
 
 if __name__ == "__main__":
@@ -1,12 +1,14 @@
 import pygame
-import json
-import serial
-import sys
 import math
+from ingest_daemon import ShmReader
+from serial_link import SerialLink
+from dirty_screen import DirtyScreen
+from hud_text import get_font, text_cache
 
 # --- НАСТРОЙКИ ПОРТА ---
 SERIAL_PORT = '/dev/cu.wchusbserial1440' # <-- ПРОВЕРЬ ПОРТ! (Может измениться на usbmodem)
-BAUD_RATE = 115200
+BAUD_RATE = 921600   # SERIAL_BAUD в main.cpp; SerialLink всё равно проверит обе скорости
+FPS = 60
 
 # Цвета
 BLACK = (0, 0, 0)
@@ -15,13 +17,14 @@ RED = (255, 0, 0)
 DARK_GREEN = (0, 50, 0)
 WHITE = (255, 255, 255)
 
-def draw_radar(screen, center, sats):
-    # Сетка радара
+def draw_radar_grid(screen, center):
+    # Сетка радара (статичная, рисуется в фон)
     pygame.draw.circle(screen, DARK_GREEN, center, 100, 1)
     pygame.draw.circle(screen, DARK_GREEN, center, 200, 1)
     pygame.draw.line(screen, DARK_GREEN, (center[0]-220, center[1]), (center[0]+220, center[1]), 1)
     pygame.draw.line(screen, DARK_GREEN, (center[0], center[1]-220), (center[0], center[1]+220), 1)
-    
+
+def draw_radar(screen, center, sats):
     # Имитация спутников (просто для визуализации пока нет координат спутников)
     for i in range(sats):
         angle = (i * (360/max(1, sats))) * (math.pi/180)
@@ -29,55 +32,64 @@ def draw_radar(screen, center, sats):
         y = center[1] + 150 * math.sin(angle)
         pygame.draw.circle(screen, GREEN, (int(x), int(y)), 5)
         pygame.draw.line(screen, DARK_GREEN, center, (int(x), int(y)), 1)
+    return pygame.Rect(center[0]-156, center[1]-156, 313, 313)
 
 def main():
     pygame.init()
     screen = pygame.display.set_mode((800, 600))
     pygame.display.set_caption("CORNELL FLIGHT SYSTEMS: GPS MODULE")
-    font_big = pygame.font.SysFont("monospace", 40)
-    font_small = pygame.font.SysFont("monospace", 20)
-    
-    try:
-        ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=0.1)
-    except:
-        print("Ошибка порта! Проверь USB.")
-        return
+    font_big = get_font("monospace", 40)
+    font_small = get_font("monospace", 20)
+    clock = pygame.time.Clock()
+
+    # Порт и скорость ищутся сами, после обрыва — переподключение. Остаёмся
+    # на JSON: sats / time есть только в строке, в бинарном кадре их нет
+    # (с ingest_daemon.py — shared memory: там только поля кадра, без них
+    # панели показывают значения по умолчанию)
+    link = ShmReader.attach() or SerialLink(SERIAL_PORT, BAUD_RATE, binary=False).start()
 
     data = {"sats": 0, "lat": 0.0, "lon": 0.0, "alt": 0.0, "time": "WAITING"}
+
+    def draw_static(surf):
+        surf.fill(BLACK)
+        draw_radar_grid(surf, (600, 300))
+
+    # Радар и подписи перерисовываются, только когда меняется значение
+    dirty = DirtyScreen(screen, draw_static)
+
+    def text(key, fnt, txt, col, pos):
+        dirty.widget(key, (txt, col), lambda surf: text_cache.text(surf, fnt, txt, col, pos))
     
     running = True
     while running:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
+            dirty.handle(event)
         
-        # Чтение данных
-        try:
-            line = ser.readline().decode('utf-8').strip()
-            if line.startswith('{'):
-                data = json.loads(line)
-        except:
-            pass
+        # Последний кадр (поля, которых нет в кадре, остаются прежними)
+        data.update(link.get())
 
-        screen.fill(BLACK)
-        
         # Отрисовка интерфейса
-        draw_radar(screen, (600, 300), data['sats'])
+        sats = data['sats']
+        dirty.widget("radar", sats, lambda surf: draw_radar(surf, (600, 300), sats))
         
         # Текст
         status_color = RED if data['sats'] < 4 else GREEN
         status_text = "NO FIX" if data['sats'] < 4 else "3D FIX LOCKED"
         
-        screen.blit(font_big.render(f"SATELLITES: {data['sats']}", True, status_color), (50, 50))
-        screen.blit(font_big.render(f"STATUS: {status_text}", True, status_color), (50, 100))
+        text("sats", font_big, f"SATELLITES: {data['sats']}", status_color, (50, 50))
+        text("status", font_big, f"STATUS: {status_text}", status_color, (50, 100))
         
-        screen.blit(font_small.render(f"LATITUDE : {data['lat']}", True, WHITE), (50, 200))
-        screen.blit(font_small.render(f"LONGITUDE: {data['lon']}", True, WHITE), (50, 230))
-        screen.blit(font_small.render(f"ALTITUDE : {data['alt']} m", True, WHITE), (50, 260))
-        screen.blit(font_small.render(f"UTC TIME : {data['time']}", True, WHITE), (50, 350))
+        text("lat", font_small, f"LATITUDE : {data['lat']}", WHITE, (50, 200))
+        text("lon", font_small, f"LONGITUDE: {data['lon']}", WHITE, (50, 230))
+        text("alt", font_small, f"ALTITUDE : {data['alt']} m", WHITE, (50, 260))
+        text("time", font_small, f"UTC TIME : {data['time']}", WHITE, (50, 350))
 
-        pygame.display.flip()
-    
+        dirty.present()
+        clock.tick(FPS)
+
+    link.stop()
     pygame.quit()
 
 if __name__ == "__main__":
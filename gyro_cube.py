@@ -1,12 +1,11 @@
 import pygame
-import serial
-import json
 import math
-import sys
+from ingest_daemon import ShmReader
+from serial_link import SerialLink
 
 # --- НАСТРОЙКИ ---
 SERIAL_PORT = '/dev/cu.wchusbserial1440' # <--- ПРОВЕРЬ ПОРТ!
-BAUD_RATE = 115200
+BAUD_RATE = 921600   # SERIAL_BAUD в main.cpp; SerialLink всё равно проверит обе скорости
 WINDOW_SIZE = 800
 
 # Цвета (Cyberpunk style)
@@ -59,11 +58,9 @@ def project_3d_to_2d(point, scale=200):
 
 # --- ГЛАВНЫЙ ЦИКЛ ---
 def main():
-    try:
-        ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=0.1)
-    except Exception as e:
-        print(f"Ошибка порта: {e}")
-        return
+    # Порт уже держит ingest_daemon.py — читаем из shared memory; иначе
+    # порт, скорость и протокол ищутся сами, после обрыва — переподключение
+    link = ShmReader.attach() or SerialLink(SERIAL_PORT, BAUD_RATE).start()
 
     roll_deg, pitch_deg = 0.0, 0.0
     
@@ -72,16 +69,13 @@ def main():
         for event in pygame.event.get():
             if event.type == pygame.QUIT: running = False
 
-        # 1. Чтение данных из Serial
-        try:
-            line = ser.readline().decode('utf-8', errors='ignore').strip()
-            if line.startswith('{'):
-                data = json.loads(line)
-                # Инвертируем или меняем оси, чтобы движения совпадали с реальностью
-                # Подстрой эти знаки (минусы), если куб крутится не туда!
-                roll_deg = -data.get("r", 0) 
-                pitch_deg = data.get("p", 0)
-        except: pass
+        # 1. Последний кадр с платы (поток приёма SerialLink, без ожидания)
+        data = link.get()
+        if data:
+            # Инвертируем или меняем оси, чтобы движения совпадали с реальностью
+            # Подстрой эти знаки (минусы), если куб крутится не туда!
+            roll_deg = -data.get("r", 0)
+            pitch_deg = data.get("p", 0)
 
         screen.fill(BLACK)
 
@@ -110,7 +104,7 @@ def main():
         pygame.display.flip()
         clock.tick(60) # Ограничение 60 FPS
 
-    ser.close()
+    link.stop()
     pygame.quit()
 
 if __name__ == "__main__":
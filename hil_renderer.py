@@ -0,0 +1,311 @@
+import os
+import math
+import ctypes
+import numpy as np
+from OpenGL.GL import *
+
+# ==========================================
+# HIL RENDERER (RETAINED GEOMETRY)
+# ==========================================
+# Раньше hil_sim каждый кадр заново слал вершины через glBegin/glVertex3f
+# и крутил сцену glRotatef. Теперь геометрия лежит в VBO на видеокарте:
+#
+#   дрон    — загружается один раз (Mesh)
+#   сетка   — один раз
+#   трасса  — кольцевой буфер (Trail): за сэмпл обновляется одна вершина
+#
+# Каждый кадр меняется только матрица модели (uniform mvp), поэтому
+# детальный дрон и трасса на десятки тысяч точек стоят столько же
+# вызовов, сколько крест из 4 линий.
+#
+#   gl = HilRenderer(800, 600)
+#   gl.trail_push(gl.nose(r, p))  # новый сэмпл телеметрии
+#   gl.draw(r, p)
+#
+# Шейдеры GLSL 1.20 без VAO: работают и в legacy-контексте pygame на macOS
+# (2.1), и в compatibility-профиле Mesa. headless_context() — контекст без
+# окна (EGL pbuffer или OSMesa) для бенчмарка, см. bench_gl.py.
+
+VERTEX_SHADER = """
+#version 120
+attribute vec3 pos;
+attribute vec3 color;
+uniform mat4 mvp;
+varying vec3 v_color;
+void main() {
+    v_color = color;
+    gl_Position = mvp * vec4(pos, 1.0);
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 120
+varying vec3 v_color;
+void main() {
+    gl_FragColor = vec4(v_color, 1.0);
+}
+"""
+
+VERTEX_DTYPE = np.dtype([('pos', '<f4', 3), ('color', '<f4', 3)])
+STRIDE = VERTEX_DTYPE.itemsize
+TRAIL_POINTS = int(os.environ.get('ESP32_TRAIL', 20000))
+NOSE = (1.5, 0.0, -1.5)        # точка дрона, чей след рисует трасса
+
+
+# ==========================================
+# MATRICES (как glRotatef / gluPerspective)
+# ==========================================
+def perspective(fovy, aspect, near, far):
+    f = 1.0 / math.tan(math.radians(fovy) / 2)
+    return np.array([[f / aspect, 0, 0, 0],
+                     [0, f, 0, 0],
+                     [0, 0, (far + near) / (near - far), 2 * far * near / (near - far)],
+                     [0, 0, -1, 0]], dtype=np.float32)
+
+
+def translate(x, y, z):
+    m = np.eye(4, dtype=np.float32)
+    m[:3, 3] = (x, y, z)
+    return m
+
+
+def rotate(deg, x, y, z):
+    a = math.radians(deg)
+    c, s = math.cos(a), math.sin(a)
+    ax = np.array([x, y, z], dtype=np.float64)
+    ax /= np.linalg.norm(ax)
+    k = np.array([[0, -ax[2], ax[1]], [ax[2], 0, -ax[0]], [-ax[1], ax[0], 0]])
+    m = np.eye(4, dtype=np.float32)
+    m[:3, :3] = c * np.eye(3) + s * k + (1 - c) * np.outer(ax, ax)
+    return m
+
+
+def attitude(r, p):
+    # glRotatef(p, 1, 0, 0); glRotatef(r, 0, 0, 1)
+    return rotate(p, 1, 0, 0) @ rotate(r, 0, 0, 1)
+
+
+# ==========================================
+# GEOMETRY (линии: пары вершин)
+# ==========================================
+def vertices(points, colors):
+    v = np.empty(len(points), dtype=VERTEX_DTYPE)
+    v['pos'] = points
+    v['color'] = colors
+    return v
+
+
+def ring(cx, cy, cz, radius, segments):
+    # Окружность в плоскости XZ отрезками
+    a = np.linspace(0, 2 * np.pi, segments + 1)
+    pts = np.stack([cx + radius * np.cos(a), np.full_like(a, cy), cz + radius * np.sin(a)], axis=1)
+    return np.repeat(pts, 2, axis=0)[1:-1]
+
+
+def drone_mesh(segments=32):
+    # Крест и моторы как в старом draw_drone() + кольца винтов по концам рам
+    green, red, grey = (0.0, 1.0, 0.0), (1.0, 0.0, 0.0), (0.6, 0.6, 0.6)
+    parts = [
+        (np.array([(-2, 0, 0), (2, 0, 0), (0, 0, -2), (0, 0, 2)], dtype=np.float32), green),
+        (np.array([(-2, 0.5, 0), (-2, -0.5, 0), (2, 0.5, 0), (2, -0.5, 0)], dtype=np.float32), red),
+    ]
+    if segments:
+        for x, z in ((-2, 0), (2, 0), (0, -2), (0, 2)):
+            parts.append((ring(x, 0.5, z, 0.6, segments), grey))
+    pts = np.concatenate([p for p, _ in parts])
+    cols = np.concatenate([np.tile(c, (len(p), 1)) for p, c in parts])
+    return vertices(pts, cols)
+
+
+def grid_mesh(size=20, step=1.0, y=-3.0, color=(0.15, 0.3, 0.2)):
+    ticks = np.arange(-size, size + step / 2, step)
+    n = len(ticks)
+    pts = np.empty((n * 4, 3), dtype=np.float32)
+    pts[0::4] = np.stack([ticks, np.full(n, y), np.full(n, -size)], axis=1)
+    pts[1::4] = np.stack([ticks, np.full(n, y), np.full(n, size)], axis=1)
+    pts[2::4] = np.stack([np.full(n, -size), np.full(n, y), ticks], axis=1)
+    pts[3::4] = np.stack([np.full(n, size), np.full(n, y), ticks], axis=1)
+    return vertices(pts, np.tile(color, (len(pts), 1)))
+
+
+# ==========================================
+# GPU BUFFERS
+# ==========================================
+class Mesh:
+    def __init__(self, verts, mode=GL_LINES, usage=GL_STATIC_DRAW):
+        self.mode = mode
+        self.count = len(verts)
+        self.vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, verts.nbytes, verts.tobytes(), usage)
+
+    def bind(self, prog):
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glVertexAttribPointer(prog.pos, 3, GL_FLOAT, GL_FALSE, STRIDE, ctypes.c_void_p(0))
+        glVertexAttribPointer(prog.color, 3, GL_FLOAT, GL_FALSE, STRIDE, ctypes.c_void_p(12))
+
+    def draw(self, prog, first=0, count=None):
+        self.bind(prog)
+        glDrawArrays(self.mode, first, self.count if count is None else count)
+
+    def delete(self):
+        glDeleteBuffers(1, [self.vbo])
+
+
+class Trail(Mesh):
+    # Кольцо на capacity точек, но в буфере 2*capacity: точка k пишется в
+    # k и k + capacity, так что последние capacity точек всегда лежат
+    # подряд — одна GL_LINE_STRIP без разрыва на стыке кольца.
+    def __init__(self, capacity=TRAIL_POINTS, color=(0.0, 0.8, 1.0)):
+        self.capacity = capacity
+        verts = np.zeros(2 * capacity, dtype=VERTEX_DTYPE)
+        verts['color'] = color
+        super().__init__(verts, GL_LINE_STRIP, GL_DYNAMIC_DRAW)
+        self.color = color
+        self.n = 0
+        self.one = np.zeros(1, dtype=VERTEX_DTYPE)
+        self.one['color'] = color
+
+    def push(self, point):
+        k = self.n % self.capacity
+        self.one['pos'] = point
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        one = self.one.tobytes()
+        glBufferSubData(GL_ARRAY_BUFFER, k * STRIDE, STRIDE, one)
+        glBufferSubData(GL_ARRAY_BUFFER, (k + self.capacity) * STRIDE, STRIDE, one)
+        self.n += 1
+
+    def draw(self, prog):
+        count = min(self.n, self.capacity)
+        if count < 2:
+            return
+        first = (self.n - count) % self.capacity
+        super().draw(prog, first, count)
+
+    def clear(self):
+        self.n = 0
+
+
+class Program:
+    def __init__(self, vs=VERTEX_SHADER, fs=FRAGMENT_SHADER):
+        self.id = glCreateProgram()
+        for src, kind in ((vs, GL_VERTEX_SHADER), (fs, GL_FRAGMENT_SHADER)):
+            sh = glCreateShader(kind)
+            glShaderSource(sh, src)
+            glCompileShader(sh)
+            if not glGetShaderiv(sh, GL_COMPILE_STATUS):
+                raise RuntimeError(glGetShaderInfoLog(sh).decode())
+            glAttachShader(self.id, sh)
+            glDeleteShader(sh)
+        glLinkProgram(self.id)
+        if not glGetProgramiv(self.id, GL_LINK_STATUS):
+            raise RuntimeError(glGetProgramInfoLog(self.id).decode())
+        self.pos = glGetAttribLocation(self.id, "pos")
+        self.color = glGetAttribLocation(self.id, "color")
+        self.mvp = glGetUniformLocation(self.id, "mvp")
+
+    def use(self):
+        glUseProgram(self.id)
+        glEnableVertexAttribArray(self.pos)
+        glEnableVertexAttribArray(self.color)
+
+    def set_mvp(self, m):
+        glUniformMatrix4fv(self.mvp, 1, GL_TRUE, m)
+
+
+# ==========================================
+# RENDERER
+# ==========================================
+class HilRenderer:
+    def __init__(self, w, h, segments=32, trail=TRAIL_POINTS, grid=True):
+        self.w, self.h = w, h
+        self.proj = perspective(45, w / h, 0.1, 100.0)
+        self.view = translate(0.0, 0.0, -10)
+        self.vp = self.proj @ self.view
+        self.prog = Program()
+        self.drone = Mesh(drone_mesh(segments))
+        self.grid = Mesh(grid_mesh()) if grid else None
+        self.trail = Trail(trail) if trail else None
+        glEnable(GL_DEPTH_TEST)
+        glViewport(0, 0, w, h)
+
+    def nose(self, r, p):
+        # Положение точки NOSE при текущей ориентации (для трассы)
+        return (attitude(r, p) @ np.array(NOSE + (1.0,), dtype=np.float32))[:3]
+
+    def trail_push(self, point):
+        if self.trail:
+            self.trail.push(point)
+
+    def draw(self, r, p):
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        self.prog.use()
+        self.prog.set_mvp(self.vp)
+        if self.grid:
+            self.grid.draw(self.prog)
+        if self.trail:
+            self.trail.draw(self.prog)
+        self.prog.set_mvp(self.vp @ attitude(r, p))
+        self.drone.draw(self.prog)
+
+    def stats(self):
+        return {"drone_vertices": self.drone.count,
+                "grid_vertices": self.grid.count if self.grid else 0,
+                "trail_points": min(self.trail.n, self.trail.capacity) if self.trail else 0}
+
+    def delete(self):
+        for m in (self.drone, self.grid, self.trail):
+            if m:
+                m.delete()
+        glDeleteProgram(self.prog.id)
+
+
+# ==========================================
+# HEADLESS CONTEXT
+# ==========================================
+def headless_context(w, h):
+    # Контекст без окна. Платформу PyOpenGL выбирают до первого импорта
+    # OpenGL: PYOPENGL_PLATFORM=egl (+ EGL_PLATFORM=surfaceless без X) или osmesa
+    platform = os.environ.get('PYOPENGL_PLATFORM')
+    if platform == 'egl':
+        return _egl_context(w, h)
+    if platform == 'osmesa':
+        return _osmesa_context(w, h)
+    raise RuntimeError("headless GL needs PYOPENGL_PLATFORM=egl or osmesa")
+
+
+def _egl_context(w, h):
+    from OpenGL import EGL
+    dpy = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+    major, minor = EGL.EGLint(), EGL.EGLint()
+    if not EGL.eglInitialize(dpy, ctypes.pointer(major), ctypes.pointer(minor)):
+        raise RuntimeError("eglInitialize failed")
+    attrs = (EGL.EGLint * 13)(EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+                              EGL.EGL_RED_SIZE, 8, EGL.EGL_GREEN_SIZE, 8, EGL.EGL_BLUE_SIZE, 8,
+                              EGL.EGL_DEPTH_SIZE, 24, EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+                              EGL.EGL_NONE)
+    cfg, n = EGL.EGLConfig(), EGL.EGLint()
+    if not EGL.eglChooseConfig(dpy, attrs, ctypes.pointer(cfg), 1, ctypes.pointer(n)) or not n.value:
+        raise RuntimeError("no EGL pbuffer config")
+    surf = EGL.eglCreatePbufferSurface(dpy, cfg, (EGL.EGLint * 5)(EGL.EGL_WIDTH, w, EGL.EGL_HEIGHT, h, EGL.EGL_NONE))
+    EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+    ctx = EGL.eglCreateContext(dpy, cfg, EGL.EGL_NO_CONTEXT, None)
+    if not EGL.eglMakeCurrent(dpy, surf, surf, ctx):
+        raise RuntimeError("eglMakeCurrent failed")
+    return ("egl", dpy, surf, ctx)
+
+
+def _osmesa_context(w, h):
+    from OpenGL import osmesa
+    ctx = osmesa.OSMesaCreateContextExt(osmesa.OSMESA_RGBA, 24, 0, 0, None)
+    buf = (ctypes.c_ubyte * (w * h * 4))()
+    if not osmesa.OSMesaMakeCurrent(ctx, buf, GL_UNSIGNED_BYTE, w, h):
+        raise RuntimeError("OSMesaMakeCurrent failed")
+    return ("osmesa", ctx, buf)
+
+
+def read_pixels(w, h):
+    # Кадр из текущего framebuffer (снизу вверх, RGB) — для сверки в бенчмарке
+    glFinish()
+    data = glReadPixels(0, 0, w, h, GL_RGB, GL_UNSIGNED_BYTE)
+    return np.frombuffer(data, dtype=np.uint8).reshape(h, w, 3)
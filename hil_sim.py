@@ -1,11 +1,9 @@
 import pygame
 from pygame.locals import *
 from OpenGL.GL import *
-from OpenGL.GLU import *
-import serial
-import json
-import threading
-import time
+from serial_link import SerialLink
+from uplink import UplinkScheduler
+from hil_renderer import HilRenderer
 
 # --- НАСТРОЙКИ ---
 # ТВОЙ ПРАВИЛЬНЫЙ ПОРТ
@@ -14,78 +12,61 @@ BAUD_RATE = 115200
 
 # Глобальные переменные
 data = {'p': 0, 'r': 0, 't': 0}
-dodge_cmd = False
+uplink = None
 
-def read_serial():
+def on_frame(d):
     global data
-    try:
-        # Открываем порт
-        ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
-        print(f"Успешное подключение к {SERIAL_PORT}")
-        
-        while True:
-            try:
-                # Читаем данные
-                if ser.in_waiting > 0:
-                    line = ser.readline().decode('utf-8', errors='ignore').strip()
-                    if line.startswith('{') and line.endswith('}'):
-                        data = json.loads(line)
-                
-                # Шлем команду уклонения (если нажат пробел)
-                msg = "DODGE:1\n" if dodge_cmd else "DODGE:0\n"
-                ser.write(msg.encode())
-                time.sleep(0.01) # Не спамим слишком часто
-                
-            except Exception:
-                pass
-    except serial.SerialException:
-        print(f"ОШИБКА: Порт {SERIAL_PORT} занят или не найден!")
-        print("СОВЕТ: Закрой Serial Monitor (иконку корзины) в VS Code!")
+    data = d
+    uplink.observe(d) # Подтверждения ARM/DISARM по полю arm
 
-def draw_drone():
-    glBegin(GL_LINES)
-    # Зеленый крест
-    glColor3f(0.0, 1.0, 0.0) 
-    glVertex3f(-2.0, 0.0, 0.0); glVertex3f(2.0, 0.0, 0.0)
-    glVertex3f(0.0, 0.0, -2.0); glVertex3f(0.0, 0.0, 2.0)
-    # Красные моторы
-    glColor3f(1.0, 0.0, 0.0)
-    glVertex3f(-2.0, 0.5, 0.0); glVertex3f(-2.0, -0.5, 0.0)
-    glVertex3f(2.0, 0.5, 0.0); glVertex3f(2.0, -0.5, 0.0)
-    glEnd()
+def read_serial():
+    global uplink
+    # Порт и скорость ищутся сами, после обрыва — переподключение; команды
+    # идут через link.write (пока платы нет — не пишутся, keepalive догонит)
+    link = SerialLink(SERIAL_PORT, BAUD_RATE, on_frame=on_frame)
+    uplink = UplinkScheduler(link)
+    uplink.set("dodge", "DODGE:0")
+    link.start()
+
+def command(key, line, ack=None):
+    # Команда на плату: уйдёт в uplink.poll(), только если изменилась
+    if uplink: uplink.set(key, line, ack)
 
 def main():
-    global dodge_cmd
     pygame.init()
     display = (800, 600)
-    pygame.display.set_mode(display, DOUBLEBUF | OPENGL)
-    gluPerspective(45, (display[0]/display[1]), 0.1, 50.0)
-    glTranslatef(0.0, 0.0, -10)
+    pygame.display.gl_set_attribute(pygame.GL_DEPTH_SIZE, 24)
+    try:
+        # Темп кадров задаёт vsync монитора, а не pygame.time.wait(10)
+        pygame.display.set_mode(display, DOUBLEBUF | OPENGL, vsync=1)
+    except pygame.error:
+        pygame.display.set_mode(display, DOUBLEBUF | OPENGL)
+    # Дрон, сетка и трасса один раз уходят в VBO; за кадр — только матрица
+    gl = HilRenderer(*display)
     
-    # Запуск чтения в фоне
-    thread = threading.Thread(target=read_serial)
-    thread.daemon = True
-    thread.start()
+    read_serial()
 
-    print("Симуляция старт! Жми ПРОБЕЛ для теста.")
+    print("Симуляция старт! Жми ПРОБЕЛ для теста, A / D — ARM / DISARM.")
+    last = None
 
     while True:
         for event in pygame.event.get():
             if event.type == QUIT: pygame.quit(); quit()
-            if event.type == KEYDOWN and event.key == K_SPACE: dodge_cmd = True
-            if event.type == KEYUP and event.key == K_SPACE: dodge_cmd = False
+            if event.type == KEYDOWN and event.key == K_SPACE: command("dodge", "DODGE:1")
+            if event.type == KEYUP and event.key == K_SPACE: command("dodge", "DODGE:0")
+            if event.type == KEYDOWN and event.key == K_a: command("arm", "ARM", lambda d: d.get("arm") == 1)
+            if event.type == KEYDOWN and event.key == K_d: command("arm", "DISARM", lambda d: d.get("arm") == 0)
+        # Изменения — сразу одной записью, остальное время — редкий keepalive
+        # (обрыв порта SerialLink гасит сам: write() вернёт 0, команды подождут)
+        if uplink: uplink.poll()
 
-        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-        glPushMatrix()
-        
-        # Вращаем сцену по данным с платы
-        glRotatef(data['p'], 1, 0, 0) # Тангаж
-        glRotatef(data['r'], 0, 0, 1) # Крен
-        
-        draw_drone()
-        glPopMatrix()
+        # Ориентация по данным с платы; новый кадр телеметрии — точка трассы
+        d = data
+        if d is not last:
+            last = d
+            gl.trail_push(gl.nose(d['r'], d['p']))
+        gl.draw(d['r'], d['p'])
         pygame.display.flip()
-        pygame.time.wait(10)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,155 @@
+import pygame
+from collections import OrderedDict
+
+# ==========================================
+# HUD TEXT (FONT REGISTRY + RENDER CACHE + GLYPH ATLAS)
+# ==========================================
+# SysFont ищет шрифт в системе и растеризует его заново при каждом вызове,
+# а font.render() на каждую строку — самая дорогая часть текста в кадре.
+#
+#   get_font()  — каждый (имя, размер, bold) резолвится один раз за процесс
+#   text()      — готовые Surface в LRU по (шрифт, строка, цвет); для подписей,
+#                 которых конечное число (заголовки, метки шкал, статусы)
+#   number()    — меняющиеся числа ("ALT: 123m"): новое значение собирается
+#                 из атласа глифов цифр и кусков текста из того же LRU (без
+#                 font.render) и само ложится в LRU; повтор — один blit.
+#
+# Обе функции принимают anchor — имя атрибута Rect ("topleft", "midtop",
+# "topright", "center"...), и возвращают Rect нарисованного текста.
+
+ATLAS_CHARS = "0123456789+-."
+
+_fonts = {}
+
+
+def get_font(name, size, bold=False):
+    key = (name, size, bool(bold))
+    font = _fonts.get(key)
+    if font is None:
+        font = _fonts[key] = pygame.font.SysFont(name, size, bold=bold)
+    return font
+
+
+class GlyphAtlas:
+    # Все символы ATLAS_CHARS одной строкой в одной SRCALPHA-поверхности
+    def __init__(self, font, color, chars=ATLAS_CHARS):
+        self.height = font.get_height()
+        self.glyphs = {}
+        widths = [font.size(ch)[0] for ch in chars]
+        self.surf = pygame.Surface((max(1, sum(widths)), self.height), pygame.SRCALPHA)
+        x = 0
+        for ch, w in zip(chars, widths):
+            # Ячейки не пересекаются: MAX просто копирует глиф с альфой
+            self.surf.blit(font.render(ch, True, color), (x, 0), special_flags=pygame.BLEND_RGBA_MAX)
+            self.glyphs[ch] = pygame.Rect(x, 0, w, self.height)
+            x += w
+
+    def width(self, s):
+        return sum(self.glyphs[ch].width for ch in s)
+
+
+class TextCache:
+    def __init__(self, budget_mb=16):
+        self.budget = budget_mb * 1024 * 1024
+        self.cache = OrderedDict()             # key -> (surface, bytes)
+        self.atlases = {}                      # (font, color) -> GlyphAtlas
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0                        # font.render()
+        self.composed = 0                      # собрано из атласа
+        self.evictions = 0
+
+    # ------------------------------------------
+    # LRU
+    # ------------------------------------------
+    def render(self, font, s, color):
+        key = (font, s, tuple(color))
+        item = self.cache.get(key)
+        if item is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return item[0]
+        self.misses += 1
+        surf = font.render(s, True, color)
+        self._put(key, surf)
+        return surf
+
+    def _put(self, key, surf):
+        size = surf.get_width() * surf.get_height() * surf.get_bytesize()
+        self.cache[key] = (surf, size)
+        self.bytes += size
+        while self.bytes > self.budget and len(self.cache) > 1:
+            _, (_, old) = self.cache.popitem(last=False)
+            self.bytes -= old
+            self.evictions += 1
+
+    def atlas(self, font, color):
+        key = (font, tuple(color))
+        atlas = self.atlases.get(key)
+        if atlas is None:
+            atlas = self.atlases[key] = GlyphAtlas(font, color)
+        return atlas
+
+    def clear(self):
+        self.cache.clear()
+        self.atlases.clear()
+        self.bytes = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "composed": self.composed,
+                "evictions": self.evictions,
+                "entries": len(self.cache), "atlases": len(self.atlases),
+                "mb": self.bytes / 1048576}
+
+    # ------------------------------------------
+    # DRAW
+    # ------------------------------------------
+    def text(self, surf, font, s, color, pos, anchor="topleft"):
+        img = self.render(font, s, color)
+        rect = img.get_rect(**{anchor: pos})
+        surf.blit(img, rect)
+        return rect
+
+    def number(self, surf, font, s, color, pos, anchor="topleft"):
+        img = self.compose(font, s, color)
+        rect = img.get_rect(**{anchor: pos})
+        surf.blit(img, rect)
+        return rect
+
+    def compose(self, font, s, color):
+        # Та же строка уже была — готовая Surface из LRU. Новое значение
+        # собирается из глифов атласа и кусков текста без растеризации
+        key = (font, s, tuple(color))
+        item = self.cache.get(key)
+        if item is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return item[0]
+
+        atlas = self.atlas(font, color)
+        glyphs = atlas.glyphs
+        parts, x, i, n = [], 0, 0, len(s)
+        while i < n:
+            area = glyphs.get(s[i])
+            if area is not None:
+                parts.append((atlas.surf, (x, 0), area))
+                x += area.width
+                i += 1
+                continue
+            j = i + 1
+            while j < n and s[j] not in glyphs:
+                j += 1
+            img = self.render(font, s[i:j], color)
+            parts.append((img, (x, 0), None))
+            x += img.get_width()
+            i = j
+
+        self.composed += 1
+        img = pygame.Surface((max(1, x), atlas.height), pygame.SRCALPHA)
+        img.blits([(src, dst, area, pygame.BLEND_RGBA_MAX) for src, dst, area in parts], False)
+        self._put(key, img)
+        return img
+
+
+# Общий кэш на процесс: все HUD-функции рисуют текст через него
+text_cache = TextCache()
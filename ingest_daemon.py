@@ -0,0 +1,208 @@
+import os
+import sys
+import time
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+from telemetry_proto import FIELDS
+from serial_link import SerialLink
+
+# ==========================================
+# INGEST DAEMON (ОДИН ПОРТ -> МНОГО HUD)
+# ==========================================
+# Порт открывает только этот процесс. Свежий кадр кладётся в shared memory,
+# а любое количество HUD (PFD, карта, диагностика — в разных процессах
+# и на разных мониторах) читают его оттуда без копирования и без serial.
+#
+#   python ingest_daemon.py [port] [baud]
+#
+# Запись защищена seqlock: writer делает seq нечётным, пишет слот, делает
+# seq чётным. Reader повторяет чтение, пока seq нечётный или изменился,
+# но не дольше SNAPSHOT_TRIES попыток: демон, упавший посреди записи,
+# оставит seq нечётным навсегда — HUD не должен зависнуть в цикле.
+#
+# Демон перезапустили — старый сегмент удалён, по имени открыт новый.
+# Reader, у которого STALE_S нет новых кадров, раз в STALE_S открывает
+# сегмент по имени и, если там другой демон (pid) или другой формат
+# (magic), переключается на него: HUD не замирает на последнем кадре.
+
+SERIAL_PORT = '/dev/cu.wchusbserial1440'
+BAUD_RATE = 921600
+SHM_NAME = 'esp32_telemetry'
+SHM_MAGIC = 0x45535033   # 'ESP3' (слот с us)
+SNAPSHOT_TRIES = 1000    # запись слота — микросекунды; дольше — писатель мёртв
+STALE_S = 0.5            # без новых кадров столько — проверить, не перезапущен ли демон
+
+SLOT_DTYPE = np.dtype([(f, '<f8') for f in FIELDS])
+SHM_DTYPE = np.dtype([
+    ('magic', '<u4'),
+    ('seq', '<u4'),      # seqlock
+    ('frames', '<u8'),   # сколько кадров опубликовано
+    ('t_ns', '<u8'),     # time.monotonic_ns() приёма кадра
+    ('pid', '<u8'),
+    ('data', SLOT_DTYPE),
+])
+
+
+# ==========================================
+# WRITER
+# ==========================================
+class ShmPublisher:
+    def __init__(self, name=SHM_NAME):
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=SHM_DTYPE.itemsize)
+        except FileExistsError:
+            # Остался сегмент от упавшего демона — переиспользуем, если он того
+            # же размера; от старой версии (другой слот) — пересоздаём
+            self.shm = shared_memory.SharedMemory(name=name)
+            if self.shm.size != SHM_DTYPE.itemsize:
+                self.shm.close()
+                self.shm.unlink()
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=SHM_DTYPE.itemsize)
+        self.hdr = np.ndarray((), dtype=SHM_DTYPE, buffer=self.shm.buf)
+        self.hdr['seq'] = 0
+        self.hdr['frames'] = 0
+        self.hdr['pid'] = 0
+        self.hdr['magic'] = SHM_MAGIC
+        self.slot = self.hdr['data']
+
+    def publish(self, d, t_ns=None):
+        hdr = self.hdr
+        prev = self.slot.item()
+        row = tuple(d.get(f, prev[i]) for i, f in enumerate(FIELDS))
+        hdr['seq'] += 1   # нечётный: идёт запись
+        self.slot[()] = row
+        hdr['t_ns'] = t_ns or time.monotonic_ns()
+        hdr['frames'] += 1
+        hdr['seq'] += 1   # чётный: можно читать
+
+    def close(self):
+        del self.slot, self.hdr
+        self.shm.close()
+        self.shm.unlink()
+
+
+# ==========================================
+# READER (drop-in для SerialReader / DataLink)
+# ==========================================
+class ShmReader:
+    def __init__(self, name=SHM_NAME):
+        self.name = name
+        self.shm, self.hdr = self._open()
+        self.data = {}
+        self.frames = 0
+        self.t_ns = 0
+        self.t_new = time.monotonic()   # когда был последний новый кадр
+        self.t_check = self.t_new
+        self.reattaches = 0
+
+    def _open(self):
+        shm = shared_memory.SharedMemory(name=self.name)
+        try:
+            # Reader не владеет сегментом: иначе resource_tracker удалит его при выходе
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        except Exception: pass
+        if shm.size < SHM_DTYPE.itemsize:
+            shm.close()
+            raise ValueError("not an ingest daemon segment")
+        hdr = np.ndarray((), dtype=SHM_DTYPE, buffer=shm.buf)
+        hdr.flags.writeable = False
+        if hdr['magic'] != SHM_MAGIC:
+            del hdr
+            shm.close()
+            raise ValueError("not an ingest daemon segment")
+        return shm, hdr
+
+    def _reattach(self):
+        # Сегмент по имени принадлежит другому демону — переходим на него
+        try:
+            shm, hdr = self._open()
+        except (FileNotFoundError, ValueError):
+            return False                 # демона нет: держим последний кадр
+        if int(hdr['pid']) == int(self.hdr['pid']) and self.hdr['magic'] == SHM_MAGIC:
+            del hdr
+            shm.close()                  # тот же демон, просто нет кадров
+            return False
+        del self.hdr
+        self.shm.close()
+        self.shm, self.hdr = shm, hdr
+        self.frames = 0
+        self.reattaches += 1
+        print("RE-ATTACHED TO INGEST DAEMON")
+        return True
+
+    @classmethod
+    def attach(cls, name=SHM_NAME):
+        # None, если демон не запущен
+        try:
+            reader = cls(name)
+            print("ATTACHED TO INGEST DAEMON")
+            return reader
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def snapshot(self):
+        # Согласованная копия слота (или None, если новых кадров нет
+        # или писатель так и не закончил запись)
+        hdr = self.hdr
+        for _ in range(SNAPSHOT_TRIES):
+            s1 = int(hdr['seq'])
+            if s1 & 1: continue
+            frames = int(hdr['frames'])
+            if frames == self.frames:
+                return None
+            slot = hdr['data'].copy()
+            t_ns = int(hdr['t_ns'])
+            if int(hdr['seq']) == s1:
+                self.frames, self.t_ns = frames, t_ns
+                return slot
+        return None
+
+    def get(self):
+        slot = self.snapshot()
+        now = time.monotonic()
+        if slot is None and now - self.t_new > STALE_S and now - self.t_check > STALE_S:
+            self.t_check = now
+            if self._reattach():
+                slot = self.snapshot()
+        if slot is not None:
+            self.t_new = now
+            self.data = {f: float(slot[f]) for f in FIELDS}
+            self.data["t"] = self.t_ns / 1e9   # время приёма (monotonic): attitude.py, latency.py
+            if not self.data["us"]:
+                del self.data["us"]              # прошивка без меток времени
+        return self.data
+
+    def stop(self):
+        del self.hdr
+        self.shm.close()
+
+    close = stop
+
+
+# ==========================================
+# MAIN
+# ==========================================
+def run(port=SERIAL_PORT, baud=BAUD_RATE):
+    print(f"INGEST DAEMON: {port} @ {baud} -> shm '{SHM_NAME}'")
+    pub = ShmPublisher()
+    pub.hdr['pid'] = os.getpid()
+
+    # Поток приёма спит в select() на порту и сам переподключается после
+    # обрыва; HUD'ы на shared memory этого не замечают. Главный поток отчитывается
+    link = SerialLink(port, baud, on_frame=lambda d: pub.publish(d, int(d["t"] * 1e9))).start()
+    try:
+        while True:
+            time.sleep(5)
+            if link.connected:
+                print(dict(link.parser.stats(), **link.stats()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        link.stop()
+        pub.close()
+
+
+if __name__ == "__main__":
+    port = sys.argv[1] if len(sys.argv) > 1 else SERIAL_PORT
+    baud = int(sys.argv[2]) if len(sys.argv) > 2 else BAUD_RATE
+    run(port, baud)
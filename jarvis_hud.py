@@ -1,11 +1,16 @@
 import pygame
-import serial
-import json
+import os
 import math
 import time
-import random
 import numpy as np
 from collections import deque
+from ingest_daemon import ShmReader
+from serial_link import SerialLink
+from telemetry_store import TelemetryStore
+from hud_text import get_font, text_cache
+from strip_chart import StripChart
+from attitude import AttitudeEstimator
+from latency import latency
 
 # ==============================================================================
 # КОНФИГУРАЦИЯ "STARK INDUSTRIES"
@@ -14,6 +19,7 @@ SERIAL_PORT = '/dev/cu.wchusbserial1440' # <--- ПРОВЕРЬ ПОРТ!
 BAUD_RATE = 115200
 WIDTH, HEIGHT = 1200, 800
 FPS = 60
+STAR_COUNT = int(os.environ.get('ESP32_STARS', 150))   # звезд в фоне (StarField)
 
 # ЦВЕТОВАЯ СХЕМА (NEON CYBER)
 C_BG        = (5, 8, 12)          # Deep Space
@@ -24,15 +30,21 @@ C_GRID      = (20, 40, 60)        # Сетка
 C_TRAIL     = (0, 200, 255)       # Шлейф
 
 # НАСТРОЙКИ ФИЗИКИ
-SMOOTH_FACTOR = 0.15  # 0.1 = очень плавно, 0.5 = резко
+DISPLAY_LATENCY = 0.010  # задержка датчик -> экран, с (0 = прогноз на «сейчас»)
 FOV = 800             # Поле зрения
 
 # ==============================================================================
 # ЯДРО 3D ДВИЖКА (MATRIX MATH)
 # ==============================================================================
+# transform() и project() работают над всем массивом вершин сразу (без циклов
+# по точкам), матрица вращения пересчитывается только при смене углов.
+# project() возвращает (xy, factor, visible): целые экранные координаты Nx2,
+# перспективный множитель и маску точек перед камерой.
 class Engine3D:
     def __init__(self):
         self.nodes = np.zeros((0, 4))
+        self._angles = None
+        self._R = None
 
     def rotate_x(self, angle):
         rad = math.radians(angle)
@@ -49,80 +61,186 @@ class Engine3D:
         c, s = math.cos(rad), math.sin(rad)
         return np.array([[c, -s, 0, 0], [s, c, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]])
 
+    def rotation(self, r, p, y):
+        # Полная матрица вращения (кэш: углы часто не меняются между кадрами)
+        angles = (r, p, y)
+        if angles != self._angles:
+            Rx = self.rotate_x(p)
+            Ry = self.rotate_y(y)
+            Rz = self.rotate_z(-r) # Инверсия для визуализации
+            self._R = np.dot(Rz, np.dot(Ry, Rx))
+            self._angles = angles
+        return self._R
+
     def transform(self, points, r, p, y, scale, pos):
-        # Матрицы вращения
-        Rx = self.rotate_x(p)
-        Ry = self.rotate_y(y)
-        Rz = self.rotate_z(-r) # Инверсия для визуализации
-        
-        # Полная матрица вращения
-        R = np.dot(Rz, np.dot(Ry, Rx))
-        
-        # Применяем вращение
-        rotated = np.dot(points, R.T)
-        
-        # Масштабирование и перемещение
-        rotated = rotated * scale
-        rotated[:, 0] += pos[0]
-        rotated[:, 1] += pos[1]
-        rotated[:, 2] += pos[2]
-        
+        # Вращение, масштаб и перемещение одним выражением
+        R = self.rotation(r, p, y)
+        rotated = np.dot(points, R.T * scale)
+        rotated[:, :3] += pos
         return rotated
 
     def project(self, points):
-        # Перспективная проекция
-        projected = []
-        for node in points:
-            x, y, z = node[0], node[1], node[2]
-            if z > -FOV + 1:
-                factor = FOV / (FOV + z)
-                px = int(x * factor + WIDTH / 2)
-                py = int(y * factor + HEIGHT / 2)
-                projected.append([px, py, factor]) # factor нужен для размера точек/линий
-            else:
-                projected.append(None)
-        return projected
+        # Перспективная проекция; точки за камерой отсекаются маской
+        z = points[:, 2]
+        visible = z > -FOV + 1
+        factor = FOV / (FOV + np.where(visible, z, 0.0))   # factor нужен для размера точек/линий
+        xy = points[:, :2] * factor[:, None]
+        xy += (WIDTH / 2, HEIGHT / 2)
+        return xy.astype(np.int32), factor, visible
 
 # ==============================================================================
 # ОБЪЕКТЫ СЦЕНЫ
 # ==============================================================================
 class StarField:
+    # Частицы в массивах NumPy: позиция (X, Y, Z) всех звезд двигается,
+    # респаунится и проецируется одной операцией над массивом, а рисуется
+    # прямо в пиксели экрана (surfarray) готовыми штампами кружков радиуса 1
+    # и 2 — без draw.circle на каждую звезду. Количество можно менять на
+    # ходу: resize(count).
+    DEPTH = 2000
+    # Пиксели pygame.draw.circle(r) относительно центра
+    STAMPS = {
+        1: [(-1, -1), (0, -1), (-1, 0), (0, 0)],
+        2: [(-1, -2), (0, -2),
+            (-2, -1), (-1, -1), (0, -1), (1, -1),
+            (-2, 0), (-1, 0), (0, 0), (1, 0),
+            (-1, 1), (0, 1)],
+    }
+
     def __init__(self, count):
-        self.stars = []
-        for _ in range(count):
-            self.stars.append([random.randint(-WIDTH, WIDTH), 
-                               random.randint(-HEIGHT, HEIGHT), 
-                               random.randint(100, 2000)]) # X, Y, Z
+        self.stars = np.zeros((0, 3))
+        self.colors = {}                       # формат Surface -> цвет по яркости
+        self.resize(count)
+
+    def resize(self, count):
+        n = len(self.stars)
+        if count <= n:
+            self.stars = self.stars[:count]
+            return
+        new = np.column_stack([np.random.randint(-WIDTH, WIDTH + 1, count - n),
+                               np.random.randint(-HEIGHT, HEIGHT + 1, count - n),
+                               np.random.randint(100, self.DEPTH + 1, count - n)]) # X, Y, Z
+        self.stars = np.vstack([self.stars, new.astype(np.float64)])
+
+    def update(self, roll, pitch):
+        # Движение звезд зависит от наклона (эффект полета)
+        x, y, z = self.stars[:, 0], self.stars[:, 1], self.stars[:, 2]
+        x -= roll * 2
+        y -= pitch * 2
+        z -= 5 # Звезды летят к нам
+
+        # Респаун
+        z[z < 1] = self.DEPTH
+        x[x < -WIDTH] = WIDTH
+        x[x > WIDTH] = -WIDTH
+        y[y < -HEIGHT] = HEIGHT
+        y[y > HEIGHT] = -HEIGHT
+
+    def _palette(self, surf):
+        # Серые (b, b, b) в пиксельном формате surf, 256 уровней
+        key = (surf.get_bitsize(), surf.get_masks())
+        pal = self.colors.get(key)
+        if pal is None:
+            pal = self.colors[key] = np.array([surf.map_rgb((b, b, b)) for b in range(256)], dtype=np.int64)
+        return pal
+
+    def draw(self, surf):
+        # Проекция
+        x, y, z = self.stars[:, 0], self.stars[:, 1], self.stars[:, 2]
+        factor = FOV / (FOV + z)
+        px = (x * factor + WIDTH / 2).astype(np.int32)
+        py = (y * factor + HEIGHT / 2).astype(np.int32)
+        depth = 1 - z / self.DEPTH
+        size = (depth * 3).astype(np.int32)
+        # Цвет зависит от глубины
+        brightness = (255 * depth).astype(np.int32)
+
+        if surf.get_bytesize() not in (1, 2, 4):
+            for cx, cy, r, b in zip(px.tolist(), py.tolist(), size.tolist(), brightness.tolist()):
+                if r > 0:
+                    pygame.draw.circle(surf, (b, b, b), (cx, cy), r)
+            return
+
+        w, h = surf.get_size()
+        clip = surf.get_clip()
+        pal = self._palette(surf)
+        pixels = pygame.surfarray.pixels2d(surf)
+        try:
+            for r in (1, 2):                    # ближние (крупные) — поверх
+                sel = size == r
+                if not sel.any():
+                    continue
+                cx, cy, col = px[sel], py[sel], pal[brightness[sel]]
+                for dx, dy in self.STAMPS[r]:
+                    sx, sy = cx + dx, cy + dy
+                    ok = (sx >= clip.left) & (sx < min(w, clip.right)) & (sy >= clip.top) & (sy < min(h, clip.bottom))
+                    pixels[sx[ok], sy[ok]] = col[ok]
+        finally:
+            del pixels                          # снять lock с Surface
 
     def update_and_draw(self, surf, roll, pitch):
-        # Движение звезд зависит от наклона (эффект полета)
-        dx = roll * 2
-        dy = pitch * 2
-        
-        for star in self.stars:
-            star[0] -= dx
-            star[1] -= dy
-            star[2] -= 5 # Звезды летят к нам
-            
-            # Респаун
-            if star[2] < 1: star[2] = 2000
-            if star[0] < -WIDTH: star[0] = WIDTH
-            if star[0] > WIDTH: star[0] = -WIDTH
-            if star[1] < -HEIGHT: star[1] = HEIGHT
-            if star[1] > HEIGHT: star[1] = -HEIGHT
-            
-            # Проекция
-            factor = FOV / (FOV + star[2])
-            x = int(star[0] * factor + WIDTH / 2)
-            y = int(star[1] * factor + HEIGHT / 2)
-            size = int((1 - star[2]/2000) * 3)
-            
-            # Цвет зависит от глубины
-            brightness = int(255 * (1 - star[2]/2000))
-            color = (brightness, brightness, brightness)
-            
-            if size > 0:
-                pygame.draw.circle(surf, color, (x, y), size)
+        self.update(roll, pitch)
+        self.draw(surf)
+
+def _line_pixels(segs):
+    # Центральные пиксели всех отрезков разом (DDA по большей оси):
+    # отрезок i занимает x[ends[i-1]:ends[i]]
+    x0, y0 = segs[:, 0, 0], segs[:, 0, 1]
+    dx, dy = segs[:, 1, 0] - x0, segs[:, 1, 1] - y0
+    n = np.maximum(np.abs(dx), np.abs(dy))
+    cnt = n + 1
+    ends = np.cumsum(cnt)
+    t = np.arange(int(ends[-1]), dtype=np.int32) - np.repeat((ends - cnt).astype(np.int32), cnt)
+    t = t.astype(np.float32)
+    inv = 1.0 / np.maximum(n, 1).astype(np.float32)
+    x = np.repeat(x0.astype(np.float32) + 0.5, cnt) + np.repeat((dx * inv).astype(np.float32), cnt) * t
+    y = np.repeat(y0.astype(np.float32) + 0.5, cnt) + np.repeat((dy * inv).astype(np.float32), cnt) * t
+    return x.astype(np.int32), y.astype(np.int32), ends
+
+def _grow(m, k):
+    # Толщина k вперёд по оси 1 маски (сдвиги с удвоением)
+    span = 1
+    while span < k:
+        s = min(span, k - span)
+        m[:, s:] |= m[:, :-s]
+        span += s
+
+def _fill_line_pixels(pixels, groups, color, clip):
+    # Одна запись цвета на пачку. Группы (толщина, (пологие, крутые)) идут по
+    # убыванию толщины; как и draw.line, толщина растёт по малой оси:
+    # у пологих рёбер — по y, у крутых — по x, отдельная маска на каждые.
+    # Утолщения складываются (k, потом j — это k + j - 1), поэтому пиксели
+    # толстой группы пишутся первыми и дорастают вместе с тонкими
+    wmax = groups[0][0]
+    xs = [x for _, runs in groups for x, _ in runs if len(x)]
+    ys = [y for _, runs in groups for _, y in runs if len(y)]
+    xmin, xmax = min(int(x.min()) for x in xs), max(int(x.max()) for x in xs)
+    ymin, ymax = min(int(y.min()) for y in ys), max(int(y.max()) for y in ys)
+    # Рамка с запасом в толщину, но не дальше толщины от clip
+    bx0, bx1 = max(clip.left - wmax, xmin - wmax), min(clip.right + wmax, xmax + wmax + 1)
+    by0, by1 = max(clip.top - wmax, ymin - wmax), min(clip.bottom + wmax, ymax + wmax + 1)
+    if bx0 >= bx1 or by0 >= by1:
+        return
+    w, h = bx1 - bx0, by1 - by0
+    flat = np.zeros((2, w * h), bool)           # раскладка как у pixels2d: x подряд
+    flat_x, flat_y = flat
+    mx, my = flat_x.reshape(h, w).T, flat_y.reshape(h, w)
+    for i, (width, runs) in enumerate(groups):
+        lo = (width - 1) // 2                   # толщина растёт вперёд: сдвиг назад
+        for dst, (x, y), sx, sy in ((flat_x, runs[0], 0, lo), (flat_y, runs[1], lo, 0)):
+            if len(x):
+                x, y = x - (bx0 + sx), y - (by0 + sy)
+                ok = (x >= 0) & (x < w) & (y >= 0) & (y < h)
+                dst[y[ok] * w + x[ok]] = True
+        nxt = groups[i + 1][0] if i + 1 < len(groups) else 1
+        _grow(mx, width - nxt + 1)              # пологие — по y
+        _grow(my, width - nxt + 1)              # крутые — по x
+    flat_x |= flat_y
+    cx0, cx1 = max(bx0, clip.left), min(bx1, clip.right)
+    cy0, cy1 = max(by0, clip.top), min(by1, clip.bottom)
+    if cx0 < cx1 and cy0 < cy1:
+        np.copyto(pixels[cx0:cx1, cy0:cy1], color,
+                  where=mx[cx0 - bx0:cx1 - bx0, cy0 - by0:cy1 - by0])
 
 class DroneMesh:
     def __init__(self):
@@ -141,7 +259,7 @@ class DroneMesh:
         self.vertices = np.array(self.vertices)
         
         # Связи линий (какую точку с какой соединять)
-        self.edges = [
+        edges = [
             (0,1), (1,2), (2,3), (3,0), # Top Body
             (4,5), (5,6), (6,7), (7,4), # Bottom Body
             (0,4), (1,5), (2,6), (3,7), # Pillars
@@ -150,35 +268,81 @@ class DroneMesh:
             (12,14), (14,13), (13,15), (15,12), # Propeller guard hints (optional)
             (16,17), (17,19), (19,18), (18,16)  # Bottom motors logic
         ]
+        self.edges = np.array(edges)
+        # Лучи оранжевые, тело голубое
+        self.edge_colors = [C_NEON_CYAN, C_NEON_BLUE]
+        self.edge_color = (self.edges[:, 0] >= 8).astype(np.int8)   # индекс в edge_colors
         
         # След (Trail)
         self.trail = deque(maxlen=40)
 
-    def draw_glow_line(self, surf, p1, p2, color, factor):
-        # Рисует линию с эффектом свечения (Bloom)
-        # Основная яркая линия
-        pygame.draw.line(surf, color, p1, p2, 2)
-        # Полупрозрачное свечение (нужен Surface с альфа-каналом)
-        # Для скорости просто рисуем толстые темные линии под низом - но тут мы сделаем проще
-        # Мы рисуем линию толщиной 4 с прозрачностью
-        if factor > 0.5:
-            # Имитация Glow через отрисовку толстой прозрачной линии
-            # Pygame draw.line не поддерживает альфа напрямую на экране, нужен temp surface
-            # Но для скорости мы просто рисуем более темный цвет шире
-            darker = (color[0]//3, color[1]//3, color[2]//3)
-            pygame.draw.line(surf, darker, p1, p2, int(6*factor))
-            pygame.draw.line(surf, color, p1, p2, 2)
+    # С какого числа рёбер рисовать через маски в surfarray: цена масок
+    # растёт с площадью экрана, draw.line — с числом рёбер; ниже порога
+    # (штатная модель — 28 рёбер) draw.line быстрее
+    EDGE_BULK = 1200
+
+    def draw_edges(self, surf, xy, factor, visible):
+        # Рисует рёбра с эффектом свечения (Bloom), пачками по (цвет, толщина):
+        # сначала все широкие тёмные подложки, поверх — все яркие линии.
+        # Pygame draw.line не поддерживает альфа напрямую на экране, поэтому
+        # glow — это просто более тёмный цвет шире
+        a, b = self.edges[:, 0], self.edges[:, 1]
+        keep = visible[a] & visible[b]
+        a, b, color = a[keep], b[keep], self.edge_color[keep]
+        f = (factor[a] + factor[b]) / 2                 # яркость/толщина по глубине
+        glow = np.where(f > 0.5, (6 * f).astype(np.int32), 0)
+        d = np.abs(xy[b] - xy[a])
+        steep = d[:, 1] > d[:, 0]                       # толщина по x, а не по y
+        # Рёбра по (цвет, glow, крутизна): каждая группа — непрерывный срез
+        order = np.lexsort((steep, glow, color))
+        color, glow, steep = color[order], glow[order], steep[order]
+        segs = np.stack([xy[a[order]], xy[b[order]]], axis=1)   # N x (p1, p2) x (x, y)
+
+        # Пачка: цвет и группы рёбер (толщина, от, середина, до) по убыванию
+        # толщины; до середины пологие рёбра, после — крутые
+        n = len(self.edge_colors)
+        glows, brights = [[] for _ in range(n)], [[] for _ in range(n)]
+        bounds = np.flatnonzero(np.diff(color * 8 + glow)) + 1
+        for lo, hi in zip([0] + bounds.tolist(), bounds.tolist() + [len(segs)]):
+            ci, width = int(color[lo]), int(glow[lo])
+            mid = lo + int(np.count_nonzero(~steep[lo:hi]))
+            if width > 0:
+                glows[ci].insert(0, (width, lo, mid, hi))
+            brights[ci].append((2, lo, mid, hi))
+        batches = [((c[0]//3, c[1]//3, c[2]//3), glows[ci]) for ci, c in enumerate(self.edge_colors)]
+        batches += [(c, brights[ci]) for ci, c in enumerate(self.edge_colors)]
+
+        if len(segs) < self.EDGE_BULK or surf.get_bytesize() not in (1, 2, 4):
+            line = pygame.draw.line
+            for col, groups in batches:
+                for width, lo, mid, hi in groups:
+                    for p1, p2 in segs[lo:hi].tolist():
+                        line(surf, col, p1, p2, width)
+            return
+
+        x, y, ends = _line_pixels(segs)
+        starts = np.concatenate(([0], ends)).tolist()
+        clip = surf.get_clip()
+        pixels = pygame.surfarray.pixels2d(surf)
+        try:
+            for col, groups in batches:
+                groups = [(width, [(x[starts[i]:starts[j]], y[starts[i]:starts[j]])
+                                   for i, j in ((lo, mid), (mid, hi))])
+                          for width, lo, mid, hi in groups if lo < hi]
+                if groups:
+                    _fill_line_pixels(pixels, groups, surf.map_rgb(col), clip)
+        finally:
+            del pixels                                  # снять lock с Surface
 
     def draw(self, surf, engine, roll, pitch):
         # Трансформация
         t_verts = engine.transform(self.vertices, roll, pitch, 0, 40, [0, 0, 0])
-        proj = engine.project(t_verts)
+        xy, factor, visible = engine.project(t_verts)
         
         # 1. Рисуем Трейл (Шлейф)
         # Берем центр дрона (среднее между точками тела)
-        if proj[0] and proj[2]:
-            center_x = (proj[0][0] + proj[2][0]) // 2
-            center_y = (proj[0][1] + proj[2][1]) // 2
+        if visible[0] and visible[2]:
+            center_x, center_y = ((xy[0] + xy[2]) // 2).tolist()
             self.trail.append((center_x, center_y))
         
         if len(self.trail) > 1:
@@ -193,26 +357,15 @@ class DroneMesh:
                 pygame.draw.line(surf, color, pts[i], pts[i+1], th)
 
         # 2. Рисуем Дрон
-        for edge in self.edges:
-            p1 = proj[edge[0]]
-            p2 = proj[edge[1]]
-            if p1 and p2:
-                # Определяем цвет и яркость по глубине
-                factor = (p1[2] + p2[2]) / 2
-                
-                # Лучи оранжевые, тело голубое
-                col = C_NEON_CYAN
-                if edge[0] >= 8: col = C_NEON_BLUE
-                
-                self.draw_glow_line(surf, (p1[0], p1[1]), (p2[0], p2[1]), col, factor)
+        self.draw_edges(surf, xy, factor, visible)
 
         # 3. Рисуем Пропеллеры (Вращающиеся круги)
         motor_indices = [12, 13, 14, 15]
         t = time.time() * 20
         for idx in motor_indices:
-            p = proj[idx]
-            if p:
-                radius = int(30 * p[2])
+            if visible[idx]:
+                p = xy[idx].tolist()
+                radius = int(30 * factor[idx])
                 # Рисуем эллипс (круг в перспективе)
                 rect = pygame.Rect(p[0]-radius, p[1]-radius/3, radius*2, radius*0.6)
                 pygame.draw.ellipse(surf, (0, 100, 100), rect, 1)
@@ -225,29 +378,17 @@ class DroneMesh:
 
 class HUD:
     def __init__(self):
-        self.font_big = pygame.font.SysFont("futura", 50)
-        self.font_small = pygame.font.SysFont("consolas", 18)
-        self.hist_r = deque(maxlen=200)
-        self.hist_p = deque(maxlen=200)
-
-    def draw_graph(self, surf, data, x, y, w, h, color, label):
-        # Фон графика
-        s = pygame.Surface((w, h), pygame.SRCALPHA)
-        s.fill((10, 20, 30, 150)) # Полупрозрачный фон
-        
-        if len(data) > 1:
-            pts = []
-            for i, val in enumerate(data):
-                px = int(i * (w / 200))
-                # Масштаб: +-90 градусов = высота
-                py = h/2 - int(val * (h/180))
-                pts.append((px, py))
-            pygame.draw.lines(s, color, False, pts, 2)
-        
-        # Рамка
-        pygame.draw.rect(s, color, (0,0,w,h), 1)
-        surf.blit(s, (x, y))
-        surf.blit(self.font_small.render(label, True, color), (x, y-20))
+        self.font_big = get_font("futura", 50)
+        self.font_small = get_font("consolas", 18)
+        self.history = TelemetryStore(capacity=4096) # История r/p для графиков
+        # Графики: 200 последних сэмплов, масштаб +-90 градусов = высота
+        self.roll_chart = StripChart(300, 100, [("r", C_NEON_CYAN)], window=200)
+        self.pitch_chart = StripChart(300, 100, [("p", C_NEON_BLUE)], window=200)
+
+    def draw_graph(self, surf, chart, x, y, color, label):
+        # Полупрозрачный фон и линии живут в chart.surf, дорисовывается только новое
+        chart.draw(surf, self.history, (x, y))
+        text_cache.text(surf, self.font_small, label, color, (x, y-20))
 
     def draw_overlay(self, surf, r, p):
         # Центральное кольцо
@@ -262,21 +403,17 @@ class HUD:
         pygame.draw.line(surf, C_NEON_RED, (cx, cy+10), (cx, cy+50), 2)
 
         # Текст (Большие цифры)
-        lbl_r = self.font_big.render(f"{r:.1f}°", True, C_NEON_CYAN)
-        lbl_p = self.font_big.render(f"{p:.1f}°", True, C_NEON_BLUE)
-        
-        surf.blit(lbl_r, (cx - 280, cy - 20))
-        surf.blit(lbl_p, (cx + 200, cy - 20))
+        text_cache.number(surf, self.font_big, f"{r:.1f}°", C_NEON_CYAN, (cx - 280, cy - 20))
+        text_cache.number(surf, self.font_big, f"{p:.1f}°", C_NEON_BLUE, (cx + 200, cy - 20))
         
-        surf.blit(self.font_small.render("ROLL STABILIZER", True, C_NEON_CYAN), (cx - 280, cy - 40))
-        surf.blit(self.font_small.render("PITCH GYRO", True, C_NEON_BLUE), (cx + 200, cy - 40))
+        text_cache.text(surf, self.font_small, "ROLL STABILIZER", C_NEON_CYAN, (cx - 280, cy - 40))
+        text_cache.text(surf, self.font_small, "PITCH GYRO", C_NEON_BLUE, (cx + 200, cy - 40))
 
         # Графики внизу
-        self.hist_r.append(r)
-        self.hist_p.append(p)
+        self.history.append({"r": r, "p": p})
         
-        self.draw_graph(surf, self.hist_r, 50, HEIGHT-150, 300, 100, C_NEON_CYAN, "ROLL HISTORY")
-        self.draw_graph(surf, self.hist_p, WIDTH-350, HEIGHT-150, 300, 100, C_NEON_BLUE, "PITCH HISTORY")
+        self.draw_graph(surf, self.roll_chart, 50, HEIGHT-150, C_NEON_CYAN, "ROLL HISTORY")
+        self.draw_graph(surf, self.pitch_chart, WIDTH-350, HEIGHT-150, C_NEON_BLUE, "PITCH HISTORY")
         
         # Статус
         status = "SYSTEM OPTIMAL"
@@ -285,8 +422,7 @@ class HUD:
             status = "WARNING: HIGH ANGLE"
             col = C_NEON_RED
         
-        st_lbl = self.font_big.render(status, True, col)
-        surf.blit(st_lbl, (cx - st_lbl.get_width()//2, 50))
+        text_cache.text(surf, self.font_big, status, col, (cx, 50), "midtop")
 
 
 # ==============================================================================
@@ -302,45 +438,28 @@ def main():
     engine = Engine3D()
     drone = DroneMesh()
     hud = HUD()
-    stars = StarField(150) # 150 звезд
+    stars = StarField(STAR_COUNT)
 
-    # Serial
-    try:
-        ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=0.01)
-        print("LINK ESTABLISHED.")
-    except:
-        print("SIMULATION MODE (NO SERIAL)")
-        ser = None
+    # Serial (если порт уже держит ingest_daemon.py — читаем из shared memory).
+    # SerialLink сам ищет плату, скорость и протокол и переподключается
+    link = ShmReader.attach() or SerialLink(SERIAL_PORT, BAUD_RATE,
+                                            on_connect=lambda link: latency.set_link(link.baud)).start()
 
-    # Переменные
-    target_r, target_p = 0.0, 0.0
-    curr_r, curr_p = 0.0, 0.0
+    # Положение по времени приёма сэмплов (одинаково при любом FPS)
+    attitude = AttitudeEstimator(latency=DISPLAY_LATENCY, link_latency=latency.uart_delay)
 
     running = True
     while running:
         for event in pygame.event.get():
             if event.type == pygame.QUIT: running = False
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_l: latency.toggle()
 
         # --- Чтение данных (Anti-Lag) ---
-        if ser and ser.in_waiting:
-            last_line = None
-            while ser.in_waiting:
-                try:
-                    last_line = ser.readline()
-                except: pass
-            
-            if last_line:
-                try:
-                    txt = last_line.decode('utf-8', errors='ignore').strip()
-                    if txt.startswith('{'):
-                        d = json.loads(txt)
-                        target_r = d.get("r", 0)
-                        target_p = d.get("p", 0)
-                except: pass
+        data = link.get()
+        if attitude.feed(data): latency.consume(data)
         
-        # --- Физика (Smooth Lerp) ---
-        curr_r += (target_r - curr_r) * SMOOTH_FACTOR
-        curr_p += (target_p - curr_p) * SMOOTH_FACTOR
+        # --- Физика (интерполяция по времени) ---
+        curr_r, curr_p = attitude.get()
 
         # --- Рендер ---
         screen.fill(C_BG) # Очистка
@@ -360,8 +479,10 @@ def main():
 
         # 5. Vignette (затемнение углов)
         # Можно добавить картинку виньетки, но для скорости пропустим
+        latency.draw(screen, hud.font_small, (WIDTH - 260, 20))
 
         pygame.display.flip()
+        latency.flipped()
         clock.tick(FPS)
 
     pygame.quit()
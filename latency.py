@@ -0,0 +1,209 @@
+import os
+import math
+import time
+from collections import deque
+from hud_text import text_cache
+from telemetry_proto import ENC_LEN
+
+# ==========================================
+# LATENCY (SENSOR -> PHOTON)
+# ==========================================
+# Каждый кадр телеметрии несёт метки:
+#   us     — micros() платы в момент чтения IMU (src/main.cpp, кадр v2 / JSON)
+#   t      — time.monotonic() хоста сразу после read() из порта
+#   t_dec  — после разбора кадра парсером
+# HUD, взяв новый кадр, зовёт latency.consume(d); после pygame.display.flip()
+# — latency.flipped(). Каждый кадр раскладывается по стадиям:
+#
+#   uart    плата -> приём на хосте (UART, USB, опрос порта)
+#   decode  приём -> разобран
+#   state   разобран -> забран HUD (очередь/слот, сглаживание)
+#   render  забран -> flip() вернулся (отрисовка кадра)
+#   total   плата -> flip()   (без us: приём -> flip())
+#
+# Часы платы и хоста разные: смещение = минимум (t - us) за последние
+# OFFSET_WINDOW секунд (самый быстрый кадр почти не ждал) минус время
+# передачи кадра по UART (airtime). Значит uart никогда не меньше airtime,
+# а всё сверх него — реальная очередь. uart_delay() — сглаженная стадия uart
+# (её берёт AttitudeEstimator как link_latency). micros() переполняется раз в ~71 мин —
+# разворачивается; сброс платы (время назад) — оценка начинается заново.
+#
+# ESP32_LATENCY=1 — оверлей p50/p99 по стадиям сразу при старте (клавиша L
+# в HUD переключает).
+
+STAGES = ("uart", "decode", "state", "render", "total")
+OFFSET_WINDOW = 30        # с
+UART_ALPHA = 0.05         # EMA для uart_delay()
+JSON_FRAME_BYTES = 140    # типичная строка JSON из main.cpp
+OVERLAY = os.environ.get('ESP32_LATENCY', '') not in ('', '0')
+
+
+def airtime(frame_bytes, baud):
+    # 10 бит на байт (старт + 8 + стоп)
+    return frame_bytes * 10.0 / baud if baud else 0.0
+
+
+class Histogram:
+    # Логарифмические корзины: PER_DECADE на порядок, от LO до HI секунд
+    LO, HI, PER_DECADE = 1e-6, 10.0, 20
+
+    def __init__(self):
+        self.bins = [0] * (int(math.log10(self.HI / self.LO) * self.PER_DECADE) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, x):
+        x = max(x, self.LO)
+        i = min(int(math.log10(x / self.LO) * self.PER_DECADE), len(self.bins) - 1)
+        self.bins[i] += 1
+        self.count += 1
+        self.total += x
+        if x > self.max:
+            self.max = x
+
+    def percentile(self, q):
+        # Верхняя граница корзины, где набралось q% (точность ~12%)
+        if not self.count:
+            return 0.0
+        need = q / 100.0 * self.count
+        acc = 0
+        for i, n in enumerate(self.bins):
+            acc += n
+            if acc >= need:
+                return min(self.LO * 10 ** ((i + 1) / self.PER_DECADE), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+class LatencyTracker:
+    def __init__(self, airtime_s=0.0):
+        self.airtime = airtime_s
+        self.hist = {s: Histogram() for s in STAGES}
+        self.pending = []                  # забранные кадры, ждущие flip()
+        self.overlay = OVERLAY
+        self.frames = 0
+        self.resets = 0
+        # Смещение часов (хост - плата), минимумы по секундам
+        self.minima = deque(maxlen=OFFSET_WINDOW)
+        self.offset = None
+        self.uart = None                   # EMA стадии uart, с
+        self._us_last = None
+        self._us_base = 0
+
+    def set_link(self, baud, binary=True):
+        # Минимальное время кадра в UART: нижняя граница стадии uart
+        self.airtime = airtime(ENC_LEN + 1 if binary else JSON_FRAME_BYTES, baud)
+
+    def reset(self):
+        for s in STAGES:
+            self.hist[s] = Histogram()
+        self.pending = []
+
+    # ------------------------------------------
+    # CLOCK OFFSET
+    # ------------------------------------------
+    def device_time(self, us):
+        # u32 micros -> секунды без переполнения
+        us = int(us)
+        if self._us_last is not None and us < self._us_last:
+            if self._us_last - us > 1 << 31:
+                self._us_base += 1 << 32          # переполнение micros()
+            else:
+                self._restart()                   # плата перезагрузилась
+        self._us_last = us
+        return (self._us_base + us) / 1e6
+
+    def _restart(self):
+        self._us_base = 0
+        self.minima.clear()
+        self.offset = None
+        self.uart = None
+        self.resets += 1
+
+    def _observe(self, dev, t_rx):
+        d = t_rx - dev
+        sec = int(t_rx)
+        if self.minima and self.minima[-1][0] == sec:
+            if d < self.minima[-1][1]:
+                self.minima[-1] = (sec, d)
+        else:
+            self.minima.append((sec, d))
+        self.offset = min(m for _, m in self.minima) - self.airtime
+        u = t_rx - (dev + self.offset)
+        self.uart = u if self.uart is None else self.uart + UART_ALPHA * (u - self.uart)
+
+    def uart_delay(self):
+        # Измеренная задержка плата -> приём на хосте; None — меток us ещё не было
+        return self.uart
+
+    # ------------------------------------------
+    # TAGS
+    # ------------------------------------------
+    def consume(self, d, t=None):
+        # HUD забрал новый кадр d (с метками t / t_dec / us)
+        t_rx = d.get("t")
+        if t_rx is None:
+            return
+        t_dec = d.get("t_dec")
+        dev = None
+        us = d.get("us")
+        if us:                                    # 0 — кадр без метки (как в ShmReader)
+            dev = self.device_time(us)
+            self._observe(dev, t_rx)
+        self.pending.append((dev, t_rx, t_dec, time.monotonic() if t is None else t))
+
+    def flipped(self, t=None):
+        # Сразу после pygame.display.flip(): всё забранное теперь на экране
+        self.frames += 1
+        if not self.pending:
+            return
+        t_flip = time.monotonic() if t is None else t
+        h = self.hist
+        for dev, t_rx, t_dec, t_state in self.pending:
+            start = t_rx
+            if dev is not None and self.offset is not None:
+                start = dev + self.offset
+                h["uart"].add(t_rx - start)
+            if t_dec is not None:
+                h["decode"].add(t_dec - t_rx)
+                h["state"].add(t_state - t_dec)
+            else:
+                h["state"].add(t_state - t_rx)
+            h["render"].add(t_flip - t_state)
+            h["total"].add(t_flip - start)
+        self.pending = []
+
+    # ------------------------------------------
+    # REPORT
+    # ------------------------------------------
+    def stats(self):
+        out = {s: {"n": h.count, "p50_ms": h.percentile(50) * 1000,
+                   "p99_ms": h.percentile(99) * 1000, "max_ms": h.max * 1000}
+               for s, h in self.hist.items()}
+        out["offset_s"] = self.offset
+        out["uart_ms"] = self.uart * 1000 if self.uart is not None else None
+        out["resets"] = self.resets
+        return out
+
+    def toggle(self):
+        self.overlay = not self.overlay
+
+    def draw(self, surf, font, pos, color=(255, 255, 0)):
+        # Таблица p50/p99 по стадиям (только если оверлей включён)
+        if not self.overlay:
+            return None
+        x, y = pos
+        rect = text_cache.text(surf, font, "LATENCY  p50 / p99 ms", color, (x, y))
+        for s in STAGES:
+            h = self.hist[s]
+            y += font.get_linesize()
+            line = f"{s:<7}{h.percentile(50) * 1000:6.1f} /{h.percentile(99) * 1000:6.1f}" if h.count else f"{s:<7}   -"
+            rect.union_ip(text_cache.number(surf, font, line, color, (x, y)))
+        return rect
+
+
+# Общий трекер на процесс: ридеры ставят метки, HUD закрывает кадр flip()'ом
+latency = LatencyTracker()
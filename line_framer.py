@@ -0,0 +1,121 @@
+# ==========================================
+# STREAM FRAMER (ZERO-LOSS LINE SPLITTER)
+# ==========================================
+# ser.read(in_waiting) рвёт кадры где угодно: хвост одного чтения и голова
+# следующего — это один и тот же JSON. Фреймер держит незаконченный кадр в
+# заранее выделенном буфере между чтениями и ищет разделители прямо в нём,
+# без split() и без копий. Наружу отдаётся только самый свежий целый кадр.
+
+class LineFramer:
+    def __init__(self, capacity=8192, delim=b'\n'):
+        self.capacity = capacity
+        self.delim = delim
+        self.buf = bytearray(capacity)
+        self.view = memoryview(self.buf)
+        self.head = 0   # начало незаконченного кадра
+        self.tail = 0   # конец записанных байт
+        self._resync = False
+        self._carry = False  # в буфере лежит начало кадра с прошлого чтения
+
+        # Счётчики
+        self.frames = 0      # целых кадров увидели
+        self.superseded = 0  # целые, но не декодированы (пришёл кадр новее)
+        self.partial = 0     # кадров, разорванных между чтениями и склеенных
+        self.dropped = 0     # кадров потеряно (длиннее буфера)
+        self.rejected = 0    # кадров, отвергнутых декодером
+        self.bytes_in = 0
+
+    def feed(self, chunk):
+        # Возвращает самый свежий целый кадр (bytes) или None
+        newest = None
+        for begin, last in self._scan(chunk):
+            count = self.buf.count(self.delim, begin, last + 1)
+            prev = self.buf.rfind(self.delim, begin, last)
+            if prev >= 0:
+                begin = prev + 1
+            if newest is not None:
+                self.superseded += 1
+            self.superseded += count - 1
+            newest = bytes(self.view[begin:last])
+        return newest
+
+    def blocks(self, chunk):
+        # Отдаёт все целые кадры пачкой (memoryview вместе с разделителями)
+        # для векторного декодера. View живёт только до следующего feed/blocks.
+        for begin, last in self._scan(chunk):
+            yield self.view[begin:last + 1]
+
+    def _scan(self, chunk):
+        # Дописывает chunk в буфер и выдаёт (начало, последний разделитель)
+        # областей с целыми кадрами. Разделитель — один байт.
+        mv = memoryview(chunk)
+        self.bytes_in += len(mv)
+
+        while len(mv):
+            if self.head and self.tail + len(mv) > self.capacity:
+                self._compact()
+            if self.tail == self.capacity:
+                # Кадр не влез в буфер целиком: выбрасываем и ждём разделитель
+                if not self._resync:
+                    self.dropped += 1
+                self.head = self.tail = 0
+                self._resync = True
+                self._carry = False
+
+            n = min(len(mv), self.capacity - self.tail)
+            start = self.tail
+            self.view[start:start + n] = mv[:n]
+            mv = mv[n:]
+            self.tail += n
+
+            last = self.buf.rfind(self.delim, start, self.tail)
+            if last < 0:
+                continue
+
+            if self._resync:
+                # Хвост выброшенного кадра до первого разделителя — мусор
+                self.head = self.buf.find(self.delim, start, self.tail) + 1
+                self._resync = False
+                if self.head > last:
+                    continue
+
+            if self._carry:
+                self.partial += 1
+                self._carry = False
+            # Между head и start разделителей нет, поэтому считаем от head
+            self.frames += self.buf.count(self.delim, self.head, last + 1)
+            begin = self.head
+            self.head = last + 1
+            yield begin, last
+
+        if self.head == self.tail:
+            self.head = self.tail = 0
+        self._carry = self.tail > self.head and not self._resync
+
+    def reject(self):
+        # Декодер не смог разобрать кадр, который мы отдали
+        self.rejected += 1
+
+    def reset(self):
+        self.head = self.tail = 0
+        self._resync = False
+        self._carry = False
+
+    def pending(self):
+        return self.tail - self.head
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "superseded": self.superseded,
+            "partial": self.partial,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "bytes": self.bytes_in,
+        }
+
+    def _compact(self):
+        # Переносим незаконченный кадр в начало буфера (memmove, без аллокаций)
+        n = self.tail - self.head
+        self.view[:n] = self.view[self.head:self.tail]
+        self.head, self.tail = 0, n
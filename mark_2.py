@@ -1,13 +1,14 @@
 import pygame
-import serial
-import json
 import math
-import threading
 import time
 import random
-import requests
-import io
-from PIL import Image, ImageOps
+from ingest_daemon import ShmReader
+from serial_link import SerialLink
+from telemetry_store import TelemetryStore
+from hud_text import get_font, text_cache
+from attitude import AttitudeEstimator
+from latency import latency
+from tile_mosaic import TileMosaic, lut_decoder
 
 # --- ULTRA CONFIG ---
 W, H = 1680, 1050 
@@ -31,36 +32,21 @@ class DataLink:
     def __init__(self):
         self.data = {"r":0, "p":0, "alt":0, "as":100, "st":0, "arm":0, "noise":0, "lat":42.87, "lon":74.56}
         self.active = True
-        try:
-            self.s = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=0.01)
-            print(f"SYSTEM ONLINE: {SERIAL_PORT}")
-            threading.Thread(target=self._worker, daemon=True).start()
-        except:
-            print("!!! DEMO MODE (NO SENSOR) !!!")
-            self.s = None
+        self.history = TelemetryStore()
+        # Пока платы нет — значения по умолчанию; появится — подхватим без перезапуска
+        self.link = SerialLink(SERIAL_PORT, BAUD_RATE, on_frame=self._on_frame,
+                               on_connect=lambda link: latency.set_link(link.baud)).start()
 
-    def _worker(self):
-        while self.active:
-            if self.s and self.s.in_waiting:
-                try:
-                    raw = self.s.read(self.s.in_waiting).decode(errors='ignore')
-                    lines = raw.split('\n')
-                    for l in lines:
-                        if l.startswith('{') and l.endswith('}'):
-                            try: 
-                                new_data = json.loads(l)
-                                self.data.update(new_data)
-                            except: pass
-                except: pass
-            else:
-                time.sleep(0.001)
+    def _on_frame(self, new_data):
+        self.data.update(new_data)
+        self.history.append(new_data)
 
     def get(self):
         return self.data
 
     def close(self):
         self.active = False
-        if self.s: self.s.close()
+        self.link.stop()
 
 # ==========================================
 # 2. ENGINE: STABLE TERRAIN MAP
@@ -68,64 +54,27 @@ class DataLink:
 class TerrainMap:
     def __init__(self, w, h):
         self.w, self.h = w, h
-        self.surf = pygame.Surface((w, h))
-        self.surf.fill((0, 10, 5))
-        
-        # State
-        self.loading = False
-        self.last_coords = (0,0)
-        self.zoom = 13
-        
-        # Buffer for thread safety
-        self.img_buffer = None 
-        self.map_ready = False
+        self.zoom = 14
+        # Мозаика тайлов вокруг точной позиции (tile_mosaic.py), Esri World Shaded Relief.
+        # Night Vision Filter — таблица яркость -> цвет, декод в потоках пула
+        self.mosaic = TileMosaic(w, h, "relief", self.zoom, decode=lut_decoder("#000500", "#00ff66"),
+                                 variant=("nv",), bg=(0, 10, 5))
 
-    def update(self, lat, lon):
-        # 1. Check if we have a new downloaded image waiting
-        if self.img_buffer:
-            try:
-                # Convert bytes to Surface in MAIN THREAD
-                pil_img = Image.open(io.BytesIO(self.img_buffer))
-                pil_img = pil_img.resize((self.w, self.h), Image.Resampling.LANCZOS)
-                
-                # Night Vision Filter
-                pil_img = ImageOps.grayscale(pil_img)
-                pil_img = ImageOps.colorize(pil_img, black="#000500", white="#00ff66")
-                
-                raw = pil_img.tobytes()
-                self.surf = pygame.image.fromstring(raw, pil_img.size, pil_img.mode)
-                self.map_ready = True
-            except Exception as e:
-                print(f"Map Render Error: {e}")
-            finally:
-                self.img_buffer = None # Clear buffer
-                self.loading = False
+    @property
+    def loading(self):
+        return self.mosaic.loading()
 
-        # 2. Start new download if moved far
-        if not self.loading and (abs(lat - self.last_coords[0]) > 0.005 or abs(lon - self.last_coords[1]) > 0.005):
-            self.last_coords = (lat, lon)
-            self.loading = True
-            threading.Thread(target=self._download_task, args=(lat, lon)).start()
+    @property
+    def map_ready(self):
+        return self.mosaic.ready()
 
-    def _download_task(self, lat, lon):
-        try:
-            # Esri World Shaded Relief
-            n = 2.0 ** self.zoom
-            xt = int((lon + 180.0) / 360.0 * n)
-            yt = int((1.0 - math.log(math.tan(math.radians(lat)) + (1 / math.cos(math.radians(lat)))) / math.pi) / 2.0 * n)
-            url = f"https://server.arcgisonline.com/ArcGIS/rest/services/World_Shaded_Relief/MapServer/tile/{self.zoom}/{yt}/{xt}"
-            
-            resp = requests.get(url, headers={'User-Agent': 'F35/HUD'}, timeout=2)
-            if resp.status_code == 200:
-                self.img_buffer = resp.content # Just store bytes, don't process!
-            else:
-                self.loading = False
-        except:
-            self.loading = False
+    def update(self, lat, lon):
+        # Каждый кадр: панорама без сети, недостающие тайлы качаются в фоне
+        self.mosaic.update(lat, lon)
 
     def draw(self, screen, x, y, color):
         # Draw Map
-        screen.blit(self.surf, (x, y))
+        self.mosaic.draw(screen, x, y)
         
         # Grid overlay (Tactical look)
         pygame.draw.rect(screen, color, (x, y, self.w, self.h), 2)
@@ -139,8 +88,7 @@ class TerrainMap:
         status = "ONLINE" if self.map_ready else "NO DATA / SEARCHING..."
         if self.loading: status = "DOWNLOADING..."
         
-        font = pygame.font.SysFont("consolas", 14)
-        screen.blit(font.render(f"SAT LINK: {status}", True, color), (x+5, y+5))
+        text_cache.text(screen, get_font("consolas", 14), f"SAT LINK: {status}", color, (x+5, y+5))
 
 # ==========================================
 # 3. HUD RENDERER
@@ -153,15 +101,16 @@ class HUD:
         pygame.display.set_caption("F-35 TARGETING SYSTEM")
         self.clk = pygame.time.Clock()
         
-        self.link = DataLink()
+        self.link = ShmReader.attach() or DataLink() # Порт может держать ingest_daemon.py
         self.map = TerrainMap(400, 300) # Размер карты
         
-        self.f_s = pygame.font.SysFont("consolas", 20)
-        self.f_m = pygame.font.SysFont("consolas", 28, bold=True)
-        self.f_xl = pygame.font.SysFont("consolas", 60, bold=True)
+        self.f_s = get_font("consolas", 20)
+        self.f_m = get_font("consolas", 28, bold=True)
+        self.f_xl = get_font("consolas", 60, bold=True)
         
         self.r = 0
         self.p = 0
+        self.attitude = AttitudeEstimator(link_latency=latency.uart_delay) # r/p по времени приёма, а не по кадрам
         self.alt = 0
         self.hdg = 0
 
@@ -209,16 +158,14 @@ class HUD:
             pygame.draw.line(self.scr, color, rp4, tp4, 2)
 
             if i % 10 == 0:
-                txt = self.f_m.render(f"{abs(i)}", True, color)
                 rtx, rty = self.rotate_pt(cx, cy, p1[0]-45, p1[1]-12, -roll)
-                self.scr.blit(txt, (rtx, rty))
+                text_cache.text(self.scr, self.f_m, f"{abs(i)}", color, (rtx, rty))
 
     def draw_tape(self, x, y, w, h, val, title, align="L", color=C_HUD):
         pygame.draw.rect(self.scr, (0, 10, 5), (x, y, w, h)) 
         pygame.draw.rect(self.scr, color, (x, y, w, h), 2)   
         
-        t = self.f_s.render(title, True, color)
-        self.scr.blit(t, (x + w//2 - t.get_width()//2, y - 25))
+        text_cache.text(self.scr, self.f_s, title, color, (x + w//2, y - 25), "midtop")
         
         center_y = y + h//2
         range_v = 60
@@ -234,12 +181,10 @@ class HUD:
             
             if align == "L":
                 pygame.draw.line(self.scr, color, (x+w-15, py), (x+w, py), 2)
-                lbl = self.f_m.render(str(v), True, color)
-                self.scr.blit(lbl, (x+w-20-lbl.get_width(), py-10))
+                text_cache.text(self.scr, self.f_m, str(v), color, (x+w-20, py-10), "topright")
             else:
                 pygame.draw.line(self.scr, color, (x, py), (x+15, py), 2)
-                lbl = self.f_m.render(str(v), True, color)
-                self.scr.blit(lbl, (x+20, py-10))
+                text_cache.text(self.scr, self.f_m, str(v), color, (x+20, py-10))
         
         self.scr.set_clip(None)
         
@@ -247,8 +192,7 @@ class HUD:
         box_y = center_y - 22
         pygame.draw.rect(self.scr, (0,0,0), (x, box_y, w, 44))
         pygame.draw.rect(self.scr, color, (x, box_y, w, 44), 3)
-        cur = self.f_m.render(f"{int(val)}", True, color)
-        self.scr.blit(cur, (x + w//2 - cur.get_width()//2, box_y + 8))
+        text_cache.number(self.scr, self.f_m, f"{int(val)}", color, (x + w//2, box_y + 8), "midtop")
 
     def draw_compass_strip(self, cx, y, hdg, color):
         w = 800
@@ -265,8 +209,7 @@ class HUD:
                 elif norm == 90: txt = "E"
                 elif norm == 180: txt = "S"
                 elif norm == 270: txt = "W"
-                t = self.f_m.render(txt, True, color)
-                self.scr.blit(t, (px - t.get_width()//2, y))
+                text_cache.text(self.scr, self.f_m, txt, color, (px, y), "midtop")
                 pygame.draw.line(self.scr, color, (px, y+35), (px, y+55), 2)
             elif norm % 5 == 0:
                 pygame.draw.line(self.scr, color, (px, y+45), (px, y+55), 1)
@@ -278,36 +221,37 @@ class HUD:
         pygame.draw.rect(self.scr, (0, 10, 5), (x, y, 350, 220))
         pygame.draw.rect(self.scr, color, (x, y, 350, 220), 2)
         
-        lbl = self.f_s.render("NEURAL CO-PILOT [CORE 0]", True, color)
-        self.scr.blit(lbl, (x+10, y+10))
+        text_cache.text(self.scr, self.f_s, "NEURAL CO-PILOT [CORE 0]", color, (x+10, y+10))
         
         st_txt = "FLIGHT STABLE"
         if status == 1: st_txt = "TURBULENCE DETECTED"
         if status == 2: st_txt = "!!! CRASH PREDICTION !!!"
         
-        ts = self.f_m.render(st_txt, True, color)
-        self.scr.blit(ts, (x+10, y+40))
+        text_cache.text(self.scr, self.f_m, st_txt, color, (x+10, y+40))
         
         # Safety Bar
         pygame.draw.rect(self.scr, C_HUD_DIM, (x+10, y+90, 330, 20))
         pygame.draw.rect(self.scr, color, (x+10, y+90, int(score/100 * 330), 20))
-        self.scr.blit(self.f_s.render(f"INTEGRITY: {int(score)}%", True, C_BG), (x+20, y+92))
+        text_cache.number(self.scr, self.f_s, f"INTEGRITY: {int(score)}%", C_BG, (x+20, y+92))
         
         # Engine Noise
         h = min(noise * 3, 60)
         pygame.draw.line(self.scr, color, (x+10, y+200), (x+340, y+200), 2)
         pygame.draw.rect(self.scr, color, (x+10, y+200-h, 330, h))
-        self.scr.blit(self.f_s.render("THRUST OUTPUT", True, color), (x+10, y+130))
+        text_cache.text(self.scr, self.f_s, "THRUST OUTPUT", color, (x+10, y+130))
 
     def run(self):
         while True:
             for e in pygame.event.get():
                 if e.type == pygame.QUIT: self.link.close(); return
                 if e.type == pygame.KEYDOWN and e.key == pygame.K_ESCAPE: self.link.close(); return
+                if e.type == pygame.KEYDOWN and e.key in (pygame.K_EQUALS, pygame.K_PLUS): self.map.mosaic.set_zoom(self.map.mosaic.target_zoom + 1)
+                if e.type == pygame.KEYDOWN and e.key == pygame.K_MINUS: self.map.mosaic.set_zoom(self.map.mosaic.target_zoom - 1)
+                if e.type == pygame.KEYDOWN and e.key == pygame.K_l: latency.toggle()
 
             d = self.link.get()
-            self.r += (d.get('r', 0) - self.r) * 0.2
-            self.p += (d.get('p', 0) - self.p) * 0.2
+            if self.attitude.feed(d): latency.consume(d)
+            self.r, self.p = self.attitude.get()
             self.alt += (d.get('alt', 0) - self.alt) * 0.1
             
             if abs(self.r) > 2: self.hdg += self.r * 0.05
@@ -342,15 +286,16 @@ class HUD:
             
             # WARNINGS
             if ai_stat == 2 and int(time.time()*5)%2:
-                warn = self.f_xl.render("PULL UP", True, C_ALERT)
-                self.scr.blit(warn, (cx - warn.get_width()//2, cy - 250))
+                text_cache.text(self.scr, self.f_xl, "PULL UP", C_ALERT, (cx, cy - 250), "midtop")
                 pygame.draw.rect(self.scr, C_ALERT, (0,0,W,H), 20)
 
             status_txt = "MASTER ARM: ON" if armed else "SAFE"
             s_col = C_ALERT if armed else MAIN_COL
-            self.scr.blit(self.f_m.render(status_txt, True, s_col), (120, 120))
+            text_cache.text(self.scr, self.f_m, status_txt, s_col, (120, 120))
+            latency.draw(self.scr, self.f_s, (120, 160))
 
             pygame.display.flip()
+            latency.flipped()
             self.clk.tick(FPS)
 
 if __name__ == "__main__":
@@ -1,11 +1,14 @@
 import pygame
-import json
-import serial
 import math
+from ingest_daemon import ShmReader
+from serial_link import SerialLink
+from dirty_screen import DirtyScreen
+from hud_text import get_font, text_cache
 
 # --- НАСТРОЙКИ ---
 SERIAL_PORT = '/dev/cu.wchusbserial1440' # <--- ПРОВЕРЬ ЭТО
-BAUD_RATE = 115200
+BAUD_RATE = 921600   # SERIAL_BAUD в main.cpp; SerialLink всё равно проверит обе скорости
+FPS = 60
 
 # ЦВЕТА
 BG_COLOR = (15, 20, 25)
@@ -20,9 +23,9 @@ pygame.init()
 W, H = 1000, 650
 screen = pygame.display.set_mode((W, H))
 pygame.display.set_caption("CORNELL SYSTEMS: STRATOSPHERE MODULE")
-font = pygame.font.SysFont("monospace", 16)
-font_big = pygame.font.SysFont("monospace", 30)
-font_huge = pygame.font.SysFont("monospace", 50)
+font = get_font("monospace", 16)
+font_big = get_font("monospace", 30)
+font_huge = get_font("monospace", 50)
 
 def draw_panel(scr, x, y, w, h, title):
     pygame.draw.rect(scr, (30, 35, 40), (x, y, w, h))
@@ -36,78 +39,95 @@ def draw_bar(scr, x, y, w, h, val, min_v, max_v, color):
     fill_w = int(w * pct)
     pygame.draw.rect(scr, color, (x, y, fill_w, h))
     pygame.draw.rect(scr, (200, 200, 200), (x, y, w, h), 1)
+    return pygame.Rect(x, y, w, h)
+
+def draw_sats(scr, sats):
+    # Визуализация спутников (просто круги)
+    pygame.draw.circle(scr, GRID_COLOR, (170, 280), 50, 1)
+    for i in range(sats):
+        ang = i * (6.28/max(1,sats))
+        pygame.draw.circle(scr, TEXT_GREEN, (170 + int(40*math.cos(ang)), 280 + int(40*math.sin(ang))), 4)
+    return pygame.Rect(120, 230, 101, 101)
+
+def draw_static(scr):
+    # Всё, что не зависит от телеметрии: рисуется один раз в фон DirtyScreen
+    scr.fill(BG_COLOR)
+
+    # 1. HEADER
+    scr.blit(font_huge.render("FLIGHT DATA RECORDER", True, TEXT_CYAN), (20, 10))
+
+    # 2-4. ПАНЕЛИ
+    draw_panel(scr, 20, 120, 300, 250, "GPS NAVIGATION")
+    draw_panel(scr, 340, 120, 300, 250, "ATMOSPHERICS (BMP280)")
+    scr.blit(font.render("(Barometric)", True, (100,100,100)), (350, 310))
+    draw_panel(scr, 660, 120, 320, 250, "FLIGHT DYNAMICS")
+
+    # 5. FOOTER
+    pygame.draw.line(scr, GRID_COLOR, (20, 400), (980, 400), 2)
+    scr.blit(font.render("LOG: Receiving telemetry stream...", True, (100,100,100)), (20, 410))
+
+def text_widget(dirty, key, fnt, txt, col, pos):
+    dirty.widget(key, (txt, col), lambda scr: text_cache.text(scr, fnt, txt, col, pos))
 
 def main():
-    try:
-        ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=0.1)
-    except:
-        print("ERROR: Check Serial Port")
-        return
+    # Порт и скорость ищутся сами, после обрыва — переподключение. Остаёмся
+    # на JSON: temp / press / sats есть только в строке, не в бинарном кадре
+    # (с ingest_daemon.py — shared memory: там только поля кадра, без них
+    # панели показывают значения по умолчанию)
+    link = ShmReader.attach() or SerialLink(SERIAL_PORT, BAUD_RATE, binary=False).start()
+    clock = pygame.time.Clock()
 
     # Данные по умолчанию
     data = {"sats": 0, "lat": 0.0, "lon": 0.0, "temp": 0.0, "press": 0.0, 
             "alt_baro": 0.0, "roll": 0.0, "pitch": 0.0, "bat": 12.4}
 
+    # Перерисовываются только изменившиеся значения
+    dirty = DirtyScreen(screen, draw_static)
+
     running = True
     while running:
         for event in pygame.event.get():
             if event.type == pygame.QUIT: running = False
+            dirty.handle(event)
 
-        try:
-            line = ser.readline().decode('utf-8', errors='ignore').strip()
-            if line.startswith('{'):
-                new_data = json.loads(line)
-                data.update(new_data)
-        except: pass
-
-        screen.fill(BG_COLOR)
+        # Последний кадр с платы, без ожидания строки
+        data.update(link.get())
 
         # 1. HEADER
-        screen.blit(font_huge.render("FLIGHT DATA RECORDER", True, TEXT_CYAN), (20, 10))
         status_col = TEXT_GREEN if data['sats'] > 3 else TEXT_RED
         status_txt = "SYSTEM ONLINE" if data['sats'] > 3 else "WAITING FOR GPS..."
-        screen.blit(font_big.render(status_txt, True, status_col), (20, 60))
+        text_widget(dirty, "status", font_big, status_txt, status_col, (20, 60))
 
         # 2. GPS PANEL (LEFT)
-        draw_panel(screen, 20, 120, 300, 250, "GPS NAVIGATION")
-        screen.blit(font.render(f"LAT : {data['lat']:.6f}", True, TEXT_CYAN), (30, 150))
-        screen.blit(font.render(f"LON : {data['lon']:.6f}", True, TEXT_CYAN), (30, 180))
-        screen.blit(font_big.render(f"SATS: {data['sats']}", True, status_col), (30, 220))
-        
-        # Визуализация спутников (просто круги)
-        pygame.draw.circle(screen, GRID_COLOR, (170, 280), 50, 1)
-        for i in range(data['sats']):
-            ang = i * (6.28/max(1,data['sats']))
-            pygame.draw.circle(screen, TEXT_GREEN, (170 + int(40*math.cos(ang)), 280 + int(40*math.sin(ang))), 4)
+        text_widget(dirty, "lat", font, f"LAT : {data['lat']:.6f}", TEXT_CYAN, (30, 150))
+        text_widget(dirty, "lon", font, f"LON : {data['lon']:.6f}", TEXT_CYAN, (30, 180))
+        text_widget(dirty, "sats", font_big, f"SATS: {data['sats']}", status_col, (30, 220))
+        dirty.widget("sats_ring", data['sats'], lambda scr: draw_sats(scr, data['sats']))
 
         # 3. ATMOSPHERICS (CENTER) - ЭТО НОВОЕ!
-        draw_panel(screen, 340, 120, 300, 250, "ATMOSPHERICS (BMP280)")
-        
         # Temp
-        screen.blit(font.render(f"TEMP: {data['temp']:.2f} C", True, TEXT_ORANGE), (350, 150))
-        draw_bar(screen, 350, 170, 280, 20, data['temp'], -10, 40, TEXT_ORANGE)
+        text_widget(dirty, "temp", font, f"TEMP: {data['temp']:.2f} C", TEXT_ORANGE, (350, 150))
+        dirty.widget("temp_bar", round(data['temp'], 2),
+                     lambda scr: draw_bar(scr, 350, 170, 280, 20, data['temp'], -10, 40, TEXT_ORANGE))
         
         # Pressure
-        screen.blit(font.render(f"PRESS: {data['press']:.2f} hPa", True, TEXT_CYAN), (350, 210))
-        draw_bar(screen, 350, 230, 280, 20, data['press'], 900, 1100, TEXT_CYAN)
+        text_widget(dirty, "press", font, f"PRESS: {data['press']:.2f} hPa", TEXT_CYAN, (350, 210))
+        dirty.widget("press_bar", round(data['press'], 2),
+                     lambda scr: draw_bar(scr, 350, 230, 280, 20, data['press'], 900, 1100, TEXT_CYAN))
 
         # Altitude
-        screen.blit(font_big.render(f"ALT: {data['alt_baro']:.1f} m", True, TEXT_GREEN), (350, 280))
-        screen.blit(font.render("(Barometric)", True, (100,100,100)), (350, 310))
+        text_widget(dirty, "alt", font_big, f"ALT: {data['alt_baro']:.1f} m", TEXT_GREEN, (350, 280))
 
         # 4. FLIGHT STATUS (RIGHT)
-        draw_panel(screen, 660, 120, 320, 250, "FLIGHT DYNAMICS")
-        screen.blit(font.render(f"ROLL : {data['roll']:.2f}", True, (255,255,255)), (670, 150))
-        screen.blit(font.render(f"PITCH: {data['pitch']:.2f}", True, (255,255,255)), (670, 180))
-        screen.blit(font_big.render(f"BAT: {data['bat']:.1f} V", True, TEXT_ORANGE), (670, 250))
-
-        # 5. FOOTER
-        pygame.draw.line(screen, GRID_COLOR, (20, 400), (980, 400), 2)
-        screen.blit(font.render("LOG: Receiving telemetry stream...", True, (100,100,100)), (20, 410))
+        text_widget(dirty, "roll", font, f"ROLL : {data['roll']:.2f}", (255,255,255), (670, 150))
+        text_widget(dirty, "pitch", font, f"PITCH: {data['pitch']:.2f}", (255,255,255), (670, 180))
+        text_widget(dirty, "bat", font_big, f"BAT: {data['bat']:.1f} V", TEXT_ORANGE, (670, 250))
 
-        pygame.display.flip()
+        dirty.present()
+        clock.tick(FPS)
 
+    link.stop()
     pygame.quit()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,159 @@
+import math
+import pygame
+from collections import OrderedDict
+
+# ==========================================
+# PFD RENDERER (CACHED ATTITUDE TEXTURE)
+# ==========================================
+# Раньше draw_pfd каждый кадр создавал Surface ~1140x1140, рисовал небо,
+# землю и 18 линий тангажа и крутил его pygame.transform.rotate.
+#
+# Теперь готовые (уже повёрнутые) текстуры ADI лежат в LRU-кэше по ключу
+# (размер, палитра, страница тангажа, крен с квантованием). Страница k —
+# это сдвиг горизонта k * P, где P — шаг лестницы (10 градусов); текстура
+# больше окна на P с каждой стороны, и остаток сдвига 0..P внутри страницы —
+# просто смещение blit. Кадр без промаха = один blit.
+# Промах не крутит большую поверхность: небо — один полигон, обрезанный
+# по прямоугольнику текстуры, линии — уже повёрнутые отрезки.
+# Мигающая CRASH-палитра — просто ещё один вариант в том же кэше.
+
+def clip_halfplane(poly, nx, ny, c):
+    # Sutherland–Hodgman: оставляет часть полигона, где nx*x + ny*y <= c
+    out = []
+    n = len(poly)
+    for i in range(n):
+        ax, ay = poly[i]
+        bx, by = poly[(i + 1) % n]
+        da = nx * ax + ny * ay - c
+        db = nx * bx + ny * by - c
+        if da <= 0:
+            out.append((ax, ay))
+        if (da < 0 < db) or (db < 0 < da):
+            t = da / (da - db)
+            out.append((ax + (bx - ax) * t, ay + (by - ay) * t))
+    return out
+
+
+def sky_polygon(rect, cx, cy, roll, shift):
+    # Небо в экранных координатах: точки выше горизонта, который повёрнут
+    # на roll вокруг (cx, cy) и сдвинут на shift пикселей вниз
+    x, y, w, h = rect
+    a = math.radians(roll)
+    nx, ny = -math.sin(a), math.cos(a)       # «вниз» в системе самолёта
+    box = [(x, y), (x + w, y), (x + w, y + h), (x, y + h)]
+    return clip_halfplane(box, nx, ny, nx * cx + ny * cy + shift)
+
+
+def ground_polygon(rect, cx, cy, roll, shift):
+    # Дополнение sky_polygon: всё ниже горизонта
+    x, y, w, h = rect
+    a = math.radians(roll)
+    nx, ny = -math.sin(a), math.cos(a)
+    box = [(x, y), (x + w, y), (x + w, y + h), (x, y + h)]
+    return clip_halfplane(box, -nx, -ny, -(nx * cx + ny * cy + shift))
+
+
+class PFDRenderer:
+    def __init__(self, px_per_deg=12, line_half=40, horizon_width=3,
+                 line_color=(255, 255, 255), roll_step=1.0, budget_mb=96):
+        self.px_per_deg = px_per_deg
+        self.line_half = line_half
+        self.horizon_width = horizon_width
+        self.line_color = line_color
+        self.roll_step = roll_step
+        self.period = 10 * px_per_deg          # шаг лестницы в пикселях
+        self.budget = budget_mb * 1024 * 1024
+
+        self.cache = OrderedDict()             # key -> (surface, bytes)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ------------------------------------------
+    # LRU
+    # ------------------------------------------
+    def _get(self, key):
+        item = self.cache.get(key)
+        if item is None:
+            return None
+        self.cache.move_to_end(key)
+        return item[0]
+
+    def _put(self, key, surf):
+        size = surf.get_width() * surf.get_height() * surf.get_bytesize()
+        self.cache[key] = (surf, size)
+        self.bytes += size
+        while self.bytes > self.budget and len(self.cache) > 1:
+            _, (_, old) = self.cache.popitem(last=False)
+            self.bytes -= old
+            self.evictions += 1
+
+    def clear(self):
+        self.cache.clear()
+        self.bytes = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": len(self.cache), "mb": self.bytes / 1048576}
+
+    # ------------------------------------------
+    # TEXTURE
+    # ------------------------------------------
+    def _variant(self, w, h, k, rq, sky, gnd):
+        key = (w, h, k, rq, sky, gnd)
+        tex = self._get(key)
+        if tex is not None:
+            self.hits += 1
+            return tex
+        self.misses += 1
+
+        P = self.period
+        tw, th = w + 2 * P, h + 2 * P
+        cx, cy = tw / 2, th / 2
+        tex = pygame.Surface((tw, th))
+        tex.fill(gnd)
+
+        shift = k * P
+        poly = sky_polygon((0, 0, tw, th), cx, cy, rq, shift)
+        if len(poly) >= 3:
+            pygame.draw.polygon(tex, sky, poly)
+
+        # Оси самолёта на экране: ux — вдоль горизонта, uy — «вниз»
+        a = math.radians(rq)
+        ux, uy = (math.cos(a), math.sin(a)), (-math.sin(a), math.cos(a))
+
+        def pt(lx, ly):
+            return (cx + lx * ux[0] + ly * uy[0], cy + lx * ux[1] + ly * uy[1])
+
+        far = tw + th
+        pygame.draw.line(tex, self.line_color, pt(-far, shift), pt(far, shift), self.horizon_width)
+        reach = math.hypot(tw, th) / 2 + 2
+        for i in range(-90, 91, 10):
+            if i == 0: continue
+            dy = shift - i * self.px_per_deg
+            if abs(dy) <= reach:
+                pygame.draw.line(tex, self.line_color,
+                                 pt(-self.line_half, dy), pt(self.line_half, dy), 1)
+
+        self._put(key, tex)
+        return tex
+
+    # ------------------------------------------
+    # DRAW
+    # ------------------------------------------
+    def draw(self, surf, rect, roll, pitch, sky, gnd):
+        x, y, w, h = rect
+        P = self.period
+        shift = pitch * self.px_per_deg
+        k = math.floor(shift / P)
+        d = shift - k * P                      # 0..P внутри страницы
+        rq = round(roll / self.roll_step) * self.roll_step
+
+        tex = self._variant(w, h, k, rq, sky, gnd)
+
+        # Сдвиг d вдоль «вертикали» повёрнутой текстуры
+        a = math.radians(rq)
+        vx, vy = -d * math.sin(a), d * math.cos(a)
+        surf.blit(tex, (round(x + w / 2 + vx - tex.get_width() / 2),
+                        round(y + h / 2 + vy - tex.get_height() / 2)))
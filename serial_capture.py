@@ -0,0 +1,296 @@
+import os
+import sys
+import mmap
+import time
+import struct
+import serial
+import numpy as np
+
+# ==========================================
+# SERIAL CAPTURE & REPLAY
+# ==========================================
+# Запись: каждый сырой кусок, прочитанный из порта, дописывается в файл
+# вместе с time.monotonic_ns() относительно начала записи.
+#
+#   файл   = MAGIC | u32 baud | record*
+#   record = u64 t_ns | u32 len | len байт
+#
+# Воспроизведение: ReplaySerial повторяет интерфейс serial.Serial, который
+# используют SerialReader, DataLink и hil_sim.read_serial (in_waiting, read,
+# readline, write, close), и отдаёт байты в записанном темпе: 1x, Nx или
+# так быстро, как читают (speed=0). Файл мапится в память, не читается целиком.
+#
+#   python serial_capture.py record /dev/cu.wchusbserial1440 921600 flight.cap
+#   python serial_capture.py info flight.cap
+#
+# В HUD: SERIAL_PORT = 'flight.cap' — и open_port() вернёт ReplaySerial.
+# ESP32_CAPTURE=flight.cap — любой HUD пишет всё, что читает из порта.
+
+MAGIC = b'ESPCAP1\n'
+HDR = struct.Struct('<I')
+REC = struct.Struct('<QI')
+
+CAPTURE_PATH = os.environ.get('ESP32_CAPTURE')
+REPLAY_SPEED = float(os.environ.get('ESP32_REPLAY_SPEED', 1.0))
+
+
+# ==========================================
+# CAPTURE
+# ==========================================
+def _scan_records(f):
+    # (время последней целой записи, конец последней целой записи);
+    # (0, None) — нет даже целого заголовка
+    f.seek(0, os.SEEK_END)
+    end = f.tell()
+    pos, last = len(MAGIC) + HDR.size, 0
+    if end < pos:
+        return 0, None
+    while pos + REC.size <= end:
+        f.seek(pos)
+        t, n = REC.unpack(f.read(REC.size))
+        if pos + REC.size + n > end:
+            break
+        pos += REC.size + n
+        last = t
+    return last, pos
+
+
+class CaptureWriter:
+    def __init__(self, path, baud=0):
+        self.f = open(path, 'a+b')
+        last, end = _scan_records(self.f)
+        if end is None:
+            self.f.truncate(0)                  # пусто или оборван сам заголовок
+            self.f.write(MAGIC + HDR.pack(baud))
+            offset = 0
+        else:
+            # Прошлая запись могла оборваться посреди record (kill, выдернули
+            # кабель): хвост отрезаем, иначе новая сессия пишется после мусора
+            # и replay читает её со сдвигом. Время продолжается после последней
+            # записи, иначе times не отсортированы и replay путает порядок
+            self.f.truncate(end)
+            offset = last + 1
+        self.f.seek(0, os.SEEK_END)
+        self.t0 = time.monotonic_ns() - offset
+        self.chunks = 0
+        self.bytes = 0
+
+    def write(self, chunk, t_ns=None):
+        if not chunk:
+            return
+        t = (t_ns or time.monotonic_ns()) - self.t0
+        self.f.write(REC.pack(t, len(chunk)))
+        self.f.write(chunk)
+        self.chunks += 1
+        self.bytes += len(chunk)
+
+    def close(self):
+        self.f.close()
+
+
+class CaptureSerial:
+    # Обёртка над настоящим serial.Serial: всё прочитанное уходит в файл
+    def __init__(self, ser, path):
+        self.ser = ser
+        self.capture = CaptureWriter(path, getattr(ser, 'baudrate', 0))
+
+    def read(self, size=1):
+        chunk = self.ser.read(size)
+        self.capture.write(chunk)
+        return chunk
+
+    def readline(self, *args):
+        line = self.ser.readline(*args)
+        self.capture.write(line)
+        return line
+
+    def close(self):
+        self.capture.close()
+        self.ser.close()
+
+    def __getattr__(self, name):
+        return getattr(self.ser, name)
+
+
+# ==========================================
+# REPLAY
+# ==========================================
+class ReplaySerial:
+    def __init__(self, path, speed=REPLAY_SPEED, timeout=None, loop=False):
+        self.path = path
+        self.speed = speed
+        self.timeout = timeout
+        self.loop = loop
+        self.port = path
+        self.is_open = True
+        self.written = bytearray()   # что HUD отправил «в плату»
+
+        self._f = open(path, 'rb')
+        self.mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm[:len(MAGIC)] != MAGIC:
+            raise serial.SerialException(f"{path}: not a capture file")
+        self.baudrate = HDR.unpack_from(self.mm, len(MAGIC))[0]
+        self._index()
+        self.rewind()
+
+    def _index(self):
+        # Один проход по заголовкам записей; данные не трогаем
+        times, offsets, lengths = [], [], []
+        pos, end = len(MAGIC) + HDR.size, len(self.mm)
+        while pos + REC.size <= end:
+            t, n = REC.unpack_from(self.mm, pos)
+            pos += REC.size
+            if pos + n > end:
+                break   # запись оборвана (файл ещё пишется)
+            times.append(t); offsets.append(pos); lengths.append(n)
+            pos += n
+        self.times = np.array(times, dtype=np.int64)
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.cum = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.cum[1:])
+        self.total = int(self.cum[-1])
+        self.duration_ns = int(self.times[-1]) if len(times) else 0
+
+    def rewind(self):
+        self.pos = 0   # позиция в логическом потоке байт
+        self.t_start = time.monotonic_ns()
+
+    # --- Часы воспроизведения ---
+    def _released(self):
+        # Сколько байт «уже пришло» по часам воспроизведения
+        if self.speed <= 0:
+            # Без пауз, но кусками, как они приходили из порта
+            return int(self.cum[self._chunk(self.pos) + 1]) if self.pos < self.total else self.total
+        now = (time.monotonic_ns() - self.t_start) * self.speed
+        k = int(np.searchsorted(self.times, now, side='right'))
+        return int(self.cum[k])
+
+    def _wait_for_data(self, deadline):
+        # Спим до следующего куска (или до таймаута). False — данных больше нет
+        if self.pos >= self.total:
+            if not self.loop:
+                if deadline is not None:
+                    time.sleep(max(0.0, deadline - time.monotonic()))
+                return False
+            self.rewind()
+            return True
+        if self.speed <= 0:
+            return True
+        k = self._chunk(self.pos)
+        due = self.t_start + self.times[k] / self.speed
+        wait = (due - time.monotonic_ns()) / 1e9
+        if deadline is not None:
+            wait = min(wait, deadline - time.monotonic())
+            if wait <= 0 and time.monotonic() >= deadline:
+                return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    def _chunk(self, pos):
+        return int(np.searchsorted(self.cum, pos, side='right')) - 1
+
+    @property
+    def in_waiting(self):
+        return max(0, self._released() - self.pos)
+
+    def _take(self, n):
+        # n байт логического потока из mmap (через границы записей)
+        out = bytearray()
+        while n > 0:
+            k = self._chunk(self.pos)
+            skip = self.pos - int(self.cum[k])
+            m = min(n, int(self.cum[k + 1]) - self.pos)
+            a = int(self.offsets[k]) + skip
+            out += self.mm[a:a + m]
+            self.pos += m
+            n -= m
+        return bytes(out)
+
+    def read(self, size=1):
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while True:
+            avail = self.in_waiting
+            if avail >= size or (avail and self.speed <= 0):
+                break
+            if not self._wait_for_data(deadline):
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+        return self._take(min(size, self.in_waiting))
+
+    def readline(self, size=-1):
+        line = bytearray()
+        while size < 0 or len(line) < size:
+            c = self.read(1)
+            if not c:
+                break
+            line += c
+            if c == b'\n':
+                break
+        return bytes(line)
+
+    def write(self, data):
+        self.written += data
+        return len(data)
+
+    def flush(self): pass
+    def reset_input_buffer(self):
+        # speed=0: «пришло» всё до конца текущего куска — не выбрасываем его,
+        # иначе сброс в начале (probe) теряет первый кусок записи
+        if self.speed > 0:
+            self.pos = self._released()
+
+    def close(self):
+        if self.is_open:
+            self.is_open = False
+            self.mm.close()
+            self._f.close()
+
+
+# ==========================================
+# FACTORY
+# ==========================================
+def open_port(port, baud, timeout=None):
+    # Drop-in для serial.Serial(port, baud, timeout=...)
+    if port.endswith('.cap'):
+        if not os.path.exists(port):
+            raise serial.SerialException(f"{port}: no such capture")
+        return ReplaySerial(port, timeout=timeout)
+    ser = serial.Serial(port, baud, timeout=timeout)
+    if CAPTURE_PATH:
+        print(f"CAPTURE -> {CAPTURE_PATH}")
+        return CaptureSerial(ser, CAPTURE_PATH)
+    return ser
+
+
+def info(path):
+    r = ReplaySerial(path, speed=0)
+    dur = r.duration_ns / 1e9
+    print(f"{path}: {len(r.times)} chunks, {r.total} bytes, {dur:.2f} s, "
+          f"{r.total / max(dur, 1e-9):.0f} B/s, baud {r.baudrate}")
+    r.close()
+
+
+def record(port, baud, path):
+    ser = serial.Serial(port, baud, timeout=0.05)
+    cap = CaptureWriter(path, baud)
+    print(f"RECORDING {port} @ {baud} -> {path} (Ctrl+C to stop)")
+    try:
+        while True:
+            cap.write(ser.read(max(1, ser.in_waiting)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cap.close()
+        ser.close()
+        print(f"{cap.chunks} chunks, {cap.bytes} bytes")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 5 and sys.argv[1] == 'record':
+        record(sys.argv[2], int(sys.argv[3]), sys.argv[4])
+    elif len(sys.argv) >= 3 and sys.argv[1] == 'info':
+        info(sys.argv[2])
+    else:
+        print("usage: serial_capture.py record PORT BAUD FILE | info FILE")
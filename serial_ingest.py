@@ -0,0 +1,132 @@
+import os
+import time
+import selectors
+import threading
+from telemetry_proto import TelemetryParser
+
+# ==========================================
+# SERIAL INGEST (EVENT-DRIVEN)
+# ==========================================
+# Раньше каждый ридер крутил `if in_waiting: read() else: sleep(0.001)`:
+# 1000 пробуждений в секунду даже на молчащем порту и до 1 мс задержки
+# на каждый кадр. Теперь поток спит в select() на файловом дескрипторе
+# порта и просыпается только когда пришли байты (или stop()).
+#
+#   ingest = SerialIngest(ser, on_frame, parser).start()
+#   ...
+#   ingest.stop()
+#
+# Каждый кусок: read(in_waiting) -> метка t -> parser.feed -> метка t_dec
+# -> on_frame(d). Передача в рендер — слот последнего значения: ридер
+# в on_frame просто присваивает self.data = d (старый кадр, который HUD
+# не успел забрать, перезаписывается; очередь не растёт).
+#
+# Порт без fileno() (ReplaySerial, ScriptedSerial из bench_hud) читается
+# блокирующим read() с таймаутом самого порта — тоже без холостого цикла.
+# Ошибка порта (кабель выдернут) останавливает поток, она в self.error.
+
+READ_MAX = 65536
+
+
+class SerialIngest:
+    def __init__(self, ser, on_frame, parser=None, name="serial-ingest"):
+        self.ser = ser
+        self.on_frame = on_frame
+        self.parser = parser or TelemetryParser()
+        self.name = name
+        self.running = False
+        self.thread = None
+        self.error = None
+        self.wakeups = 0
+        self.chunks = 0
+        self.bytes = 0
+        self.frames = 0
+        self.errors = 0
+        self.mode = None
+        self._wake_r, self._wake_w = os.pipe()   # stop() будит select()
+
+    def _fileno(self):
+        try:
+            return self.ser.fileno()
+        except Exception:
+            return None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=0.5):
+        self.running = False
+        if self._wake_w is None:
+            return
+        try:
+            os.write(self._wake_w, b'x')
+        except OSError:
+            pass
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+            if self.thread.is_alive():
+                return
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+        self._wake_r = self._wake_w = None
+
+    # ------------------------------------------
+    # LOOP
+    # ------------------------------------------
+    def _run(self):
+        fd = self._fileno()
+        self.mode = "blocking" if fd is None else "select"
+        try:
+            if fd is None:
+                self._run_blocking()
+            else:
+                self._run_select(fd)
+        except OSError as e:                     # SerialException — тоже OSError
+            self.error = e
+        finally:
+            self.running = False
+
+    def _run_select(self, fd):
+        sel = selectors.DefaultSelector()
+        sel.register(fd, selectors.EVENT_READ)
+        sel.register(self._wake_r, selectors.EVENT_READ)
+        try:
+            while self.running:
+                sel.select()
+                self.wakeups += 1
+                if not self.running:
+                    return
+                # Готов к чтению, но пуст — порт закрыт на том конце: read() бросит
+                self._handle(self.ser.read(min(self.ser.in_waiting, READ_MAX) or 1))
+        finally:
+            sel.close()
+
+    def _run_blocking(self):
+        while self.running:
+            chunk = self.ser.read(max(1, min(self.ser.in_waiting, READ_MAX)))
+            self.wakeups += 1
+            if chunk:
+                self._handle(chunk)
+
+    def _handle(self, chunk):
+        t_rx = time.monotonic()
+        self.chunks += 1
+        self.bytes += len(chunk)
+        try:
+            d = self.parser.feed(chunk)
+            if d:
+                d["t"] = t_rx                    # время приёма (attitude.py, latency.py)
+                d["t_dec"] = time.monotonic()
+                self.frames += 1
+                self.on_frame(d)
+        except Exception:
+            self.errors += 1
+
+    def stats(self):
+        return {"wakeups": self.wakeups, "chunks": self.chunks, "bytes": self.bytes,
+                "frames": self.frames, "errors": self.errors,
+                "mode": self.mode,
+                "error": str(self.error) if self.error else None}
@@ -0,0 +1,248 @@
+import os
+import time
+import threading
+import serial_capture
+from telemetry_proto import TelemetryParser
+from serial_ingest import SerialIngest
+
+try:
+    from serial.tools import list_ports
+except ImportError:
+    list_ports = None
+
+# ==========================================
+# SERIAL LINK (ПОИСК ПОРТА + ПЕРЕПОДКЛЮЧЕНИЕ)
+# ==========================================
+# Вместо «открыть SERIAL_PORT или навсегда SIMULATION MODE»:
+#
+#   1. кандидаты: ESP32_PORT из окружения, порт из конфига скрипта, USB-UART
+#      мосты ESP32 (CH340/CH9102/CP210x/FTDI/родной USB S3) из list_ports,
+#      симлинк esp32_sim.py (/tmp/esp32);
+#   2. скорость и протокол — по первым годным кадрам: на каждой скорости
+#      из bauds ждём до PROBE_S целый JSON или бинарный кадр с верным CRC
+#      (на чужой скорости приходит мусор, парсер его не примет);
+#   3. порт пропал (кабель, сброс USB) — SerialIngest падает с ошибкой,
+#      поиск идёт каждые SCAN_S, последняя удачная пара (порт, скорость)
+#      пробуется первой: плата снова в эфире меньше чем за секунду.
+#
+# При каждом подключении входной буфер сбрасывается (старые кадры из
+# буфера драйвера не показываются как свежие), парсер — новый.
+#
+#   link = SerialLink(SERIAL_PORT, BAUD_RATE, on_frame=...).start()
+#   d = link.get()                # как ShmReader.get(): последний кадр
+#   link.write(b"ARM\n")          # 0, если сейчас не подключены
+#
+# stats(): порт, скорость, протокол, ttff_ms — от начала поиска (старт или
+# обрыв) до первого кадра, open_ms — от открытия порта до первого кадра.
+
+PORT_ENV = os.environ.get('ESP32_PORT')
+BAUDS = (921600, 115200)
+SIM_LINK = '/tmp/esp32'            # esp32_sim.py --link
+PROBE_S = 0.25
+SCAN_S = 0.1
+
+USB_IDS = {
+    (0x1A86, 0x7523): "CH340",
+    (0x1A86, 0x55D4): "CH9102",
+    (0x10C4, 0xEA60): "CP210x",
+    (0x0403, 0x6001): "FTDI",
+    (0x303A, 0x1001): "ESP32-S3 USB",
+}
+NAME_HINTS = ("wchusbserial", "usbserial", "usbmodem", "SLAB_USBtoUART", "ttyUSB", "ttyACM")
+
+
+def scan_ports():
+    # USB-UART мосты, похожие на плату: сначала по VID:PID, потом по имени
+    if list_ports is None:
+        return []
+    known, named = [], []
+    for p in list_ports.comports():
+        if (p.vid, p.pid) in USB_IDS:
+            known.append(p.device)
+        elif any(h in p.device for h in NAME_HINTS):
+            named.append(p.device)
+    return known + named
+
+
+def candidates(preferred=None):
+    out = []
+    for port in [PORT_ENV, preferred] + scan_ports() + [SIM_LINK if os.path.exists(SIM_LINK) else None]:
+        if port and port not in out:
+            out.append(port)
+    return out
+
+
+def find_port(preferred=None):
+    # Для скриптов без SerialLink: первый существующий кандидат
+    for port in candidates(preferred):
+        if os.path.exists(port):
+            return port
+    return preferred
+
+
+def _flush(ser):
+    try:
+        ser.reset_input_buffer()
+    except Exception:
+        pass
+
+
+def probe(port, bauds=BAUDS, timeout=PROBE_S):
+    # (ser, скорость, парсер, первый кадр) или None
+    try:
+        ser = serial_capture.open_port(port, bauds[0], timeout=0.02)
+    except Exception:
+        return None
+    for baud in bauds:
+        try:
+            if getattr(ser, 'baudrate', baud) != baud:
+                ser.baudrate = baud
+            _flush(ser)
+            parser = TelemetryParser()
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                d = parser.feed(ser.read(max(1, ser.in_waiting)))
+                if d:
+                    d["t"] = time.monotonic()
+                    return ser, baud, parser, d
+        except Exception:
+            break
+    try:
+        ser.close()
+    except Exception:
+        pass
+    return None
+
+
+class SerialLink:
+    def __init__(self, port=None, baud=None, on_frame=None, on_connect=None, binary=True, bauds=BAUDS):
+        self.port = port
+        self.bauds = ((baud,) if baud else ()) + tuple(b for b in bauds if b != baud)
+        self.on_frame = on_frame
+        self.on_connect = on_connect
+        self.binary = binary                 # PROTO:BIN или PROTO:JSON после подключения
+        self.data = {}
+        self.ser = None
+        self.parser = None
+        self.ingest = None
+        self.path = None
+        self.baud = None
+        self.last = None                     # (порт, скорость) последнего подключения
+        self.running = False
+        self.connected = False
+        self.thread = None
+
+        self.connects = 0
+        self.frames = 0
+        self.ttff_ms = None
+        self.open_ms = None
+        self.outage_ms = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="serial-link", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        ingest, self.ingest = self.ingest, None
+        if ingest:
+            ingest.stop()
+        self._close()
+
+    close = stop
+
+    def get(self):
+        return self.data
+
+    def write(self, data):
+        ser = self.ser
+        if not self.connected or ser is None:
+            return 0
+        try:
+            return ser.write(data) or 0
+        except Exception:
+            return 0
+
+    # ------------------------------------------
+    # LOOP
+    # ------------------------------------------
+    def _find(self):
+        order = []
+        if self.last:
+            order.append((self.last[0], (self.last[1],) + tuple(b for b in self.bauds if b != self.last[1])))
+        order += [(p, self.bauds) for p in candidates(self.port) if not self.last or p != self.last[0]]
+        for port, bauds in order:
+            if not self.running:
+                return None
+            t_open = time.monotonic()
+            found = probe(port, bauds)
+            if found:
+                return (port, t_open) + found
+        return None
+
+    def _run(self):
+        t_search = time.monotonic()
+        announced = False
+        while self.running:
+            found = self._find()
+            if not found:
+                if not announced:
+                    print("SEARCHING FOR BOARD... (HUD keeps running)")
+                    announced = True
+                time.sleep(SCAN_S)
+                continue
+            port, t_open, ser, baud, parser, first = found
+            self._serve(port, baud, ser, parser, first, t_search, t_open)
+            t_search = time.monotonic()
+            announced = False
+
+    def _serve(self, port, baud, ser, parser, first, t_search, t_open):
+        self.ser, self.parser, self.path, self.baud = ser, parser, port, baud
+        self.last = (port, baud)
+        self.connects += 1
+        self.ttff_ms = (first["t"] - t_search) * 1000
+        self.open_ms = (first["t"] - t_open) * 1000
+        if self.connects > 1:
+            self.outage_ms = self.ttff_ms
+        mode = parser.mode
+        if (mode == "bin") != self.binary:
+            parser.negotiate(ser, self.binary)   # плата могла остаться в другом режиме
+        self.connected = True
+        print(f"CONNECTED {port} @ {baud} ({mode.upper()}), first frame in {self.ttff_ms:.0f} ms")
+        if self.on_connect:
+            self.on_connect(self)
+        self._frame(first)
+
+        ingest = self.ingest = SerialIngest(ser, self._frame, parser).start()
+        while self.running and ingest.running:
+            ingest.thread.join(0.2)
+        err = ingest.error
+        if self.ingest is ingest:
+            self.ingest = None
+            ingest.stop()
+        self.connected = False
+        self._close()
+        if self.running:
+            print(f"LINK LOST {port}: {err}")
+
+    def _frame(self, d):
+        self.data = d
+        self.frames += 1
+        if self.on_frame:
+            self.on_frame(d)
+
+    def _close(self):
+        ser, self.ser = self.ser, None
+        if ser:
+            try:
+                ser.close()
+            except Exception:
+                pass
+
+    def stats(self):
+        return {"connected": self.connected, "port": self.path, "baud": self.baud,
+                "protocol": self.parser.mode if self.parser else None,
+                "connects": self.connects, "frames": self.frames,
+                "ttff_ms": self.ttff_ms, "open_ms": self.open_ms, "outage_ms": self.outage_ms}
@@ -22,6 +22,13 @@
 #define N_OUTPUTS 3
 #define TENSOR_ARENA 2 * 1024
 
+// TELEMETRY PROTOCOL (см. telemetry_proto.py)
+#define PROTO_JSON 0
+#define PROTO_BIN 1
+#define FRAME_VERSION 2
+#define JSON_PERIOD_US 10000   // 100 Hz, как раньше с delay(10)
+#define BIN_PERIOD_US 2000     // 500 Hz: кадр 29 байт вместо ~130
+
 Eloquent::TinyML::TfLite<N_INPUTS, N_OUTPUTS, TENSOR_ARENA> ml;
 
 TinyGPSPlus gps;
@@ -33,6 +40,72 @@ volatile float ai_safe=100;
 volatile int ai_stat=0;
 bool armed = false;
 
+uint8_t proto = PROTO_JSON;
+char cmd_buf[32];      // команда с хоста копится здесь между итерациями loop()
+uint8_t cmd_len = 0;
+uint16_t tx_seq = 0;
+uint32_t next_tx_us = 0;
+
+struct __attribute__((packed)) TelemetryFrame {
+  uint8_t ver;
+  uint16_t seq;
+  int16_t r, p;        // 0.1 deg
+  int32_t lat, lon;    // 1e-7 deg
+  int16_t alt;         // m
+  uint8_t as, st;
+  uint8_t flags;       // bit0 arm, bit1 sd
+  uint8_t noise;
+  uint32_t us;         // micros() в момент чтения IMU (задержка на хосте, latency.py)
+  uint16_t crc;        // CRC-16/CCITT-FALSE
+};
+
+uint16_t crc16(const uint8_t *d, size_t n) {
+  uint16_t crc = 0xFFFF;
+  while (n--) {
+    crc ^= (uint16_t)(*d++) << 8;
+    for (int i = 0; i < 8; i++) crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+  }
+  return crc;
+}
+
+// COBS: out должен вмещать n + n/254 + 1 байт. Возвращает длину без 0x00.
+size_t cobsEncode(const uint8_t *in, size_t n, uint8_t *out) {
+  size_t code_at = 0, o = 1;
+  uint8_t code = 1;
+  for (size_t i = 0; i < n; i++) {
+    if (in[i] == 0) {
+      out[code_at] = code; code_at = o++; code = 1;
+    } else {
+      out[o++] = in[i];
+      if (++code == 0xFF) { out[code_at] = code; code_at = o++; code = 1; }
+    }
+  }
+  out[code_at] = code;
+  return o;
+}
+
+void sendBinary(float r, float p, float sc, int st, float noise, uint32_t t_us) {
+  TelemetryFrame f;
+  f.ver = FRAME_VERSION;
+  f.seq = tx_seq++;
+  f.r = (int16_t)lroundf(r * 10);
+  f.p = (int16_t)lroundf(p * 10);
+  f.lat = (int32_t)llround(gps.location.lat() * 1e7);
+  f.lon = (int32_t)llround(gps.location.lng() * 1e7);
+  f.alt = (int16_t)lround(gps.altitude.meters());
+  f.as = (uint8_t)lroundf(sc);
+  f.st = (uint8_t)st;
+  f.flags = armed ? 0x01 : 0;   // bit1 (sd) = 0: карта пока не подключена
+  f.noise = (uint8_t)lroundf(noise);
+  f.us = t_us;
+  f.crc = crc16((const uint8_t *)&f, sizeof(f) - 2);
+
+  uint8_t buf[sizeof(f) + 2];
+  size_t n = cobsEncode((const uint8_t *)&f, sizeof(f), buf);
+  buf[n++] = 0;
+  Serial.write(buf, n);
+}
+
 // ==========================================
 // TASK AI
 // ==========================================
@@ -69,6 +142,31 @@ void TaskAI(void *pvParameters) {
   }
 }
 
+// ==========================================
+// COMMANDS (uplink.py)
+// ==========================================
+void handleCommand(const char *c) {
+  if (!strcmp(c, "ARM")) armed = true;
+  else if (!strcmp(c, "DISARM")) armed = false;
+  else if (!strcmp(c, "PROTO:BIN")) proto = PROTO_BIN;
+  else if (!strcmp(c, "PROTO:JSON")) proto = PROTO_JSON;
+}
+
+// Без readStringUntil(): он ждёт '\n' до Serial.setTimeout (1 с) и сбивает
+// темп датчика. Берём только то, что уже пришло; хост шлёт команды
+// пачкой строк в одной записи — разбираем все.
+void pollCommands() {
+  while (Serial.available()) {
+    char ch = Serial.read();
+    if (ch == '\n' || ch == '\r') {
+      if (cmd_len) { cmd_buf[cmd_len] = 0; handleCommand(cmd_buf); }
+      cmd_len = 0;
+    } else if (cmd_len < sizeof(cmd_buf) - 1) {
+      cmd_buf[cmd_len++] = ch;
+    }
+  }
+}
+
 // ==========================================
 // SETUP & LOOP
 // ==========================================
@@ -86,11 +184,7 @@ void setup() {
 }
 
 void loop() {
-  if (Serial.available()) {
-    String c = Serial.readStringUntil('\n');
-    if (c.indexOf("ARM") >= 0) armed = true;
-    if (c.indexOf("DISARM") >= 0) armed = false;
-  }
+  pollCommands();
 
   while (ss.available()) gps.encode(ss.read());
 
@@ -102,6 +196,7 @@ void loop() {
   float noise = raw_mic / 40.95;
 
   if (Wire.available() >= 6) {
+    uint32_t t_us = micros();   // метка сэмпла: хост меряет по ней задержку до экрана
     int16_t AcX = Wire.read()<<8 | Wire.read();
     int16_t AcY = Wire.read()<<8 | Wire.read();
     int16_t AcZ = Wire.read()<<8 | Wire.read();
@@ -121,12 +216,29 @@ void loop() {
       xSemaphoreGive(dataMutex);
     }
 
-    // ИСПРАВЛЕННАЯ СТРОКА: Добавлены lat и lon
-    Serial.printf("{\"r\":%.1f,\"p\":%.1f,\"lat\":%.6f,\"lon\":%.6f,\"alt\":%.0f,\"as\":%.0f,\"st\":%d,\"arm\":%d,\"sd\":%d,\"noise\":%.0f}\n", 
-                  r, p, 
-                  gps.location.lat(), gps.location.lng(), 
-                  gps.altitude.meters(), 
-                  sc, st, armed, 0, noise);
+    if (proto == PROTO_BIN) {
+      sendBinary(r, p, sc, st, noise, t_us);
+    } else {
+      // ИСПРАВЛЕННАЯ СТРОКА: Добавлены lat и lon
+      Serial.printf("{\"r\":%.1f,\"p\":%.1f,\"lat\":%.6f,\"lon\":%.6f,\"alt\":%.0f,\"as\":%.0f,\"st\":%d,\"arm\":%d,\"sd\":%d,\"noise\":%.0f,\"us\":%lu}\n", 
+                    r, p, 
+                    gps.location.lat(), gps.location.lng(), 
+                    gps.altitude.meters(), 
+                    sc, st, armed, 0, noise, (unsigned long)t_us);
+    }
+  }
+
+  // Темп телеметрии вместо delay(10): бинарный кадр в 5 раз короче
+  uint32_t period = (proto == PROTO_BIN) ? BIN_PERIOD_US : JSON_PERIOD_US;
+  next_tx_us += period;
+  int32_t wait = (int32_t)(next_tx_us - micros());
+  if (wait > 0) {
+    // Целые миллисекунды — delay() (vTaskDelay: CPU отдаётся другим задачам
+    // и idle), остаток меньше тика досыпаем delayMicroseconds (busy-wait)
+    if (wait >= 1000) delay(wait / 1000);
+    wait = (int32_t)(next_tx_us - micros());
+    if (wait > 0) delayMicroseconds(wait);
+  } else {
+    next_tx_us = micros();
   }
-  delay(10); 
 }
\ No newline at end of file
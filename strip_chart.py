@@ -0,0 +1,129 @@
+import numpy as np
+import pygame
+
+# ==========================================
+# STRIP CHART (SCROLLING TELEMETRY GRAPH)
+# ==========================================
+# График истории из TelemetryStore на постоянной Surface. Каждый кадр
+# картинка сдвигается (Surface.scroll) на столько пикселей, сколько
+# пришло новых сэмплов, и дорисовывается только новый кусок справа.
+# Позиция сэмпла по X считается от его глобального номера (store.count),
+# поэтому новый кусок точно стыкуется со старым.
+#
+#   chart = StripChart(300, 100, [("r", CYAN), ("p", BLUE)], window=200)
+#   chart.draw(screen, store, (x, y))
+#
+# window <= w: ломаная через все сэмплы (как раньше в draw_graph).
+# window >  w: на каждый пиксель — вертикальная черта min..max своих
+#              сэмплов (окна на 10k–1M точек без потери пиков).
+# Окно больше capacity store показывает столько, сколько в нём есть.
+
+
+class StripChart:
+    def __init__(self, w, h, channels, window=200, span=(-90, 90),
+                 bg=(10, 20, 30, 150), border=None, width=2):
+        self.w, self.h = w, h
+        self.channels = list(channels)         # [(поле store, цвет), ...]
+        self.window = int(window)              # сэмплов на всю ширину
+        self.lo, self.hi = span
+        self.bg = bg
+        self.border = border or self.channels[0][1]
+        self.width = width
+        self.envelope = self.window > w
+        self.surf = pygame.Surface((w, h), pygame.SRCALPHA)
+        self.surf.fill(bg)
+        self.head = None                       # столбец правого края
+        self.count = 0                         # store.count на прошлом кадре
+        self.rebuilds = 0
+        self.columns = 0                       # дорисовано столбцов всего
+
+    def _col(self, k):
+        # Столбец глобального сэмпла k (массив или число)
+        return (k * self.w) // self.window
+
+    def _y(self, v):
+        y = (self.hi - v) * (self.h / (self.hi - self.lo))
+        return np.clip(y, 0, self.h - 1).astype(np.int32)
+
+    def reset(self):
+        self.head = None
+
+    # ------------------------------------------
+    # UPDATE
+    # ------------------------------------------
+    def update(self, store):
+        count = store.count
+        if not count:
+            return
+        if self.envelope:
+            head = int(self._col(count))       # последний столбец ещё не полный
+        else:
+            head = int(self._col(count - 1)) + 1
+        if self.head is None or count < self.count:
+            prev = head - self.w               # перерисовать всё
+        else:
+            prev = max(self.head, head - self.w)
+        self.count = count
+        if head == prev and self.head is not None:
+            return
+        shift = head - prev
+        if shift >= self.w:
+            self.surf.fill(self.bg)
+            self.rebuilds += 1
+        else:
+            self.surf.scroll(-shift, 0)
+            self.surf.fill(self.bg, (self.w - shift, 0, shift, self.h))
+        self.head = head
+        self.columns += shift
+
+        # Сэмплы новых столбцов + один перед ними (стык с уже нарисованным)
+        first = -(-prev * self.window // self.w)        # ceil: первый сэмпл столбца prev
+        first = max(first - 1, count - len(store), 0)
+        data = store.last(count - first)
+        ks = np.arange(first, count)
+        xs = self.w - (head - self._col(ks))
+        if self.envelope:
+            self._draw_envelope(data, ks, xs, prev)
+        else:
+            self._draw_lines(data, xs)
+
+    def _draw_lines(self, data, xs):
+        if len(xs) < 2:
+            return
+        xs = xs.tolist()
+        for name, color in self.channels:
+            pts = list(zip(xs, self._y(data[name]).tolist()))
+            pygame.draw.lines(self.surf, color, False, pts, self.width)
+
+    def _draw_envelope(self, data, ks, xs, prev):
+        # Только полные столбцы >= prev; сэмпл перед столбцом входит в его
+        # диапазон, чтобы черты соседних столбцов смыкались
+        cols = self._col(ks)
+        sel = np.flatnonzero((cols >= prev) & (xs < self.w))
+        if not len(sel):
+            return
+        starts = sel[np.r_[True, cols[sel][1:] != cols[sel][:-1]]]
+        x = xs[starts].tolist()
+        line = pygame.draw.line
+        for name, color in self.channels:
+            v = np.ascontiguousarray(data[name][:sel[-1] + 1])   # reduceat по strided view медленный
+            lo = np.minimum.reduceat(v, starts)
+            hi = np.maximum.reduceat(v, starts)
+            before = v[np.maximum(starts - 1, 0)]
+            top = self._y(np.maximum(hi, before)).tolist()
+            bottom = self._y(np.minimum(lo, before)).tolist()
+            for cx, y0, y1 in zip(x, top, bottom):
+                line(self.surf, color, (cx, y0), (cx, y1), 1)
+
+    # ------------------------------------------
+    # DRAW
+    # ------------------------------------------
+    def draw(self, surf, store, pos):
+        self.update(store)
+        rect = surf.blit(self.surf, pos)
+        pygame.draw.rect(surf, self.border, rect, 1)   # Рамка
+        return rect
+
+    def stats(self):
+        return {"head": self.head, "columns": self.columns, "rebuilds": self.rebuilds,
+                "mode": "envelope" if self.envelope else "lines"}
@@ -0,0 +1,372 @@
+import json
+import struct
+import numpy as np
+from line_framer import LineFramer
+
+# ==========================================
+# BINARY TELEMETRY FRAME (v2)
+# ==========================================
+# Та же телеметрия, что и JSON из src/main.cpp, но фиксированной длины:
+#
+#   ver u8 | seq u16 | r i16 | p i16 | lat i32 | lon i32 | alt i16 |
+#   as u8 | st u8 | flags u8 | noise u8 | us u32 | crc u16  (27 байт, LE)
+#
+# r/p в десятых градуса, lat/lon в 1e-7 градуса, alt в метрах,
+# flags: bit0 = arm, bit1 = sd, us — micros() платы в момент чтения IMU
+# (для latency.py). CRC-16/CCITT-FALSE по всем байтам до crc.
+# На проводе кадр упакован в COBS и закрыт байтом 0x00: 27 -> 28 + 1 = 29 байт
+# вместо ~130 байт JSON. Кадры v1 (без us, 23 байта) по-прежнему читаются:
+# у них нет "us" в dict и us = 0 в столбцах.
+# Хост просит бинарный режим строкой "PROTO:BIN\n", "PROTO:JSON\n" — обратно.
+# Прошивка по умолчанию шлёт JSON, так что старые HUD работают как раньше.
+
+FIELDS = ("r", "p", "lat", "lon", "alt", "as", "st", "arm", "sd", "noise", "us")
+
+FRAME_VERSION = 2
+FRAME_FMT = '<BHhhiihBBBBI'
+RAW_LEN = struct.calcsize(FRAME_FMT) + 2   # + crc
+ENC_LEN = RAW_LEN + 1                      # + COBS overhead (кадр < 254 байт)
+
+_V1_FIELDS = [
+    ('ver', 'u1'), ('seq', '<u2'),
+    ('r', '<i2'), ('p', '<i2'),
+    ('lat', '<i4'), ('lon', '<i4'), ('alt', '<i2'),
+    ('as', 'u1'), ('st', 'u1'), ('flags', 'u1'), ('noise', 'u1'),
+]
+FRAME_DTYPE = np.dtype(_V1_FIELDS + [('us', '<u4'), ('crc', '<u2')])
+assert FRAME_DTYPE.itemsize == RAW_LEN
+
+V1_FMT = '<BHhhiihBBBB'
+V1_DTYPE = np.dtype(_V1_FIELDS + [('crc', '<u2')])
+V1_RAW_LEN = V1_DTYPE.itemsize
+V1_ENC_LEN = V1_RAW_LEN + 1
+
+SCALAR_MAX = 4   # до стольких кадров одной длины — без векторизации
+MODE_MISSES = 3  # кусков подряд в «чужом» формате до смены режима парсера
+
+# (версия, длина в COBS, dtype) — что умеет decode_buffer
+LAYOUTS = ((FRAME_VERSION, ENC_LEN, FRAME_DTYPE), (1, V1_ENC_LEN, V1_DTYPE))
+
+FLAG_ARM = 0x01
+FLAG_SD = 0x02
+
+CMD_BINARY = b"PROTO:BIN\n"
+CMD_JSON = b"PROTO:JSON\n"
+
+
+def _crc_table():
+    table = np.zeros(256, dtype=np.uint32)
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table[i] = crc & 0xFFFF
+    return table
+
+CRC_TABLE = _crc_table()
+_CRC_LIST = CRC_TABLE.tolist()
+
+
+def crc16(data):
+    crc = 0xFFFF
+    for b in data:
+        crc = ((crc << 8) & 0xFFFF) ^ _CRC_LIST[((crc >> 8) ^ b) & 0xFF]
+    return crc
+
+
+# ==========================================
+# COBS
+# ==========================================
+def cobs_encode(data):
+    out = bytearray(b'\x00')
+    code_at, code = 0, 1
+    for b in data:
+        if b == 0:
+            out[code_at] = code
+            code_at, code = len(out), 1
+            out.append(0)
+        else:
+            out.append(b)
+            code += 1
+            if code == 0xFF:
+                out[code_at] = code
+                code_at, code = len(out), 1
+                out.append(0)
+    out[code_at] = code
+    return bytes(out)
+
+
+def cobs_decode(data):
+    out = bytearray()
+    i = 0
+    while i < len(data):
+        code = data[i]
+        if code == 0 or i + code > len(data) + 1:
+            raise ValueError("bad COBS frame")
+        out += data[i + 1:i + code]
+        i += code
+        if code < 0xFF and i < len(data):
+            out.append(0)
+    return bytes(out)
+
+
+# ==========================================
+# ENCODE (симулятор / тесты / эталон для прошивки)
+# ==========================================
+def encode_frame(d, seq, version=FRAME_VERSION):
+    flags = (FLAG_ARM if d.get("arm") else 0) | (FLAG_SD if d.get("sd") else 0)
+    values = [
+        version, seq & 0xFFFF,
+        int(round(d.get("r", 0) * 10)), int(round(d.get("p", 0) * 10)),
+        int(round(d.get("lat", 0) * 1e7)), int(round(d.get("lon", 0) * 1e7)),
+        int(round(d.get("alt", 0))),
+        int(round(d.get("as", 100))), int(d.get("st", 0)), flags,
+        int(round(d.get("noise", 0))),
+    ]
+    if version == 1:
+        body = struct.pack(V1_FMT, *values)
+    else:
+        body = struct.pack(FRAME_FMT, *values, int(d.get("us", 0)) & 0xFFFFFFFF)
+    body += struct.pack('<H', crc16(body))
+    return cobs_encode(body) + b'\x00'
+
+
+# ==========================================
+# VECTORIZED DECODE
+# ==========================================
+def decode_buffer(buf):
+    # Разбирает весь буфер за один вызов.
+    # Возвращает (records, consumed, bad): structured array FRAME_DTYPE,
+    # сколько байт съедено (до последнего 0x00 включительно) и число битых кадров.
+    a = np.frombuffer(buf, dtype=np.uint8)
+    ends = np.flatnonzero(a == 0)
+    if not len(ends):
+        return np.empty(0, dtype=FRAME_DTYPE), 0, 0
+    consumed = int(ends[-1]) + 1
+
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    lengths = ends - starts
+
+    parts, order, bad = [], [], 0
+    known = np.zeros(len(lengths), dtype=bool)
+    for version, enc_len, dtype in LAYOUTS:
+        fits = lengths == enc_len
+        known |= fits
+        if not fits.any():
+            continue
+        where = starts[fits]
+        recs, ok = _decode_fixed(a, where, version, enc_len, dtype)
+        bad += int(len(where) - len(recs))
+        if dtype is not FRAME_DTYPE:
+            recs = _upgrade(recs)
+        parts.append(recs)
+        order.append(where[ok])
+    bad += int(np.count_nonzero(lengths[~known]))   # пустые промежутки не считаем
+
+    if not parts:
+        return np.empty(0, dtype=FRAME_DTYPE), consumed, bad
+    if len(parts) == 1:
+        return parts[0], consumed, bad
+    # Смесь версий (переключение прошивки посреди записи): порядок потока
+    recs = np.concatenate(parts)[np.argsort(np.concatenate(order), kind='stable')]
+    return recs, consumed, bad
+
+
+def _decode_fixed(a, starts, version, enc_len, dtype):
+    # Кадры одной длины: COBS + CRC + версия. -> (records, маска годных)
+    if len(starts) <= SCALAR_MAX:
+        return _decode_scalar(a, starts, version, enc_len, dtype)
+    raw_len = enc_len - 1
+    enc = a[starts[:, None] + np.arange(enc_len)]
+    raw = enc[:, 1:].copy()
+
+    # COBS: идём по цепочке кодов сразу во всех кадрах. Каждый код на позиции
+    # pos > 0 означает ноль в raw[pos - 1]. Не больше enc_len шагов.
+    pos = enc[:, 0].astype(np.intp)
+    ok = pos > 0
+    for _ in range(enc_len):
+        live = np.flatnonzero(ok & (pos < enc_len))
+        if not len(live):
+            break
+        p = pos[live]
+        raw[live, p - 1] = 0
+        step = enc[live, p]
+        ok[live] = step > 0
+        pos[live] = p + step
+    ok &= pos == enc_len
+
+    # CRC-16 по столбцам
+    crc = np.full(len(starts), 0xFFFF, dtype=np.uint32)
+    for j in range(raw_len - 2):
+        crc = ((crc << 8) & 0xFFFF) ^ CRC_TABLE[((crc >> 8) ^ raw[:, j]) & 0xFF]
+    got = raw[:, -2].astype(np.uint32) | (raw[:, -1].astype(np.uint32) << 8)
+    ok &= (crc == got) & (raw[:, 0] == version)
+
+    return np.ascontiguousarray(raw[ok]).view(dtype)[:, 0], ok
+
+
+def _decode_scalar(a, starts, version, enc_len, dtype):
+    # То же по одному кадру: при чтении «по событию» в куске обычно 1-2 кадра,
+    # и накладные расходы numpy на каждом шаге цепочки COBS дороже самого кадра
+    ok = np.zeros(len(starts), dtype=bool)
+    raws = bytearray()
+    for i, s in enumerate(starts.tolist()):
+        try:
+            raw = cobs_decode(a[s:s + enc_len].tobytes())
+        except ValueError:
+            continue
+        if len(raw) == enc_len - 1 and raw[0] == version and crc16(raw[:-2]) == raw[-2] | (raw[-1] << 8):
+            ok[i] = True
+            raws += raw
+    return np.frombuffer(raws, dtype=dtype), ok
+
+
+def _upgrade(recs):
+    # v1 -> FRAME_DTYPE (us = 0)
+    out = np.zeros(len(recs), dtype=FRAME_DTYPE)
+    for name in V1_DTYPE.names:
+        out[name] = recs[name]
+    return out
+
+
+def records_to_columns(recs):
+    # Физические величины столбцами (float64/int)
+    return {
+        "seq": recs['seq'].astype(np.int64),
+        "r": recs['r'] / 10.0,
+        "p": recs['p'] / 10.0,
+        "lat": recs['lat'] / 1e7,
+        "lon": recs['lon'] / 1e7,
+        "alt": recs['alt'].astype(np.float64),
+        "as": recs['as'].astype(np.float64),
+        "st": recs['st'].astype(np.int64),
+        "arm": (recs['flags'] & FLAG_ARM).astype(np.int64),
+        "sd": ((recs['flags'] & FLAG_SD) >> 1).astype(np.int64),
+        "noise": recs['noise'].astype(np.float64),
+        "us": recs['us'].astype(np.int64),
+    }
+
+
+def record_to_dict(rec):
+    # Один кадр -> тот же dict, что дал бы json.loads
+    flags = int(rec['flags'])
+    d = {
+        "r": int(rec['r']) / 10.0,
+        "p": int(rec['p']) / 10.0,
+        "lat": int(rec['lat']) / 1e7,
+        "lon": int(rec['lon']) / 1e7,
+        "alt": int(rec['alt']),
+        "as": int(rec['as']),
+        "st": int(rec['st']),
+        "arm": flags & FLAG_ARM,
+        "sd": (flags & FLAG_SD) >> 1,
+        "noise": int(rec['noise']),
+        "seq": int(rec['seq']),
+    }
+    if rec['ver'] >= 2:
+        d["us"] = int(rec['us'])
+    return d
+
+
+# ==========================================
+# PARSER (JSON <-> BIN)
+# ==========================================
+class TelemetryParser:
+    # Сам определяет формат потока: 0x00 бывает только в бинарном,
+    # "}\n" — конец JSON-строки. feed() отдаёт самый свежий кадр как dict.
+    # Режим меняется не по одному куску (в бинарном кадре тоже бывает "}\n"),
+    # а после MODE_MISSES кусков подряд, которые текущий режим не разобрал
+    # и которые похожи на другой формат.
+    def __init__(self, mode="auto"):
+        self.mode = mode
+        self.json_framer = LineFramer()
+        self.bin_framer = LineFramer(capacity=16384, delim=b'\x00')
+        self.last_seq = None
+        self.seq_gaps = 0   # кадры, потерянные по дороге (по seq)
+        self.misses = 0     # кусков подряд без кадра, похожих на другой формат
+        self.switches = 0
+
+    @property
+    def framer(self):
+        return self.bin_framer if self.mode == "bin" else self.json_framer
+
+    def negotiate(self, ser, binary=True):
+        ser.write(CMD_BINARY if binary else CMD_JSON)
+
+    @staticmethod
+    def _hint(chunk):
+        if b'\x00' in chunk:
+            return "bin"
+        if b'}\n' in chunk or b'}\r\n' in chunk:
+            return "json"
+        return None
+
+    def _switch(self, mode):
+        self.mode = mode
+        self.json_framer.reset()
+        self.bin_framer.reset()
+        self.last_seq = None
+        self.misses = 0
+        self.switches += 1
+
+    def _feed_mode(self, chunk):
+        return self._feed_bin(chunk) if self.mode == "bin" else self._feed_json(chunk)
+
+    def feed(self, chunk):
+        if self.mode == "auto":
+            hint = self._hint(chunk)
+            if hint is None:
+                return None
+            self._switch(hint)
+
+        framer = self.framer
+        rejected = framer.rejected
+        d = self._feed_mode(chunk)
+        if d is not None:
+            self.misses = 0
+            return d
+        other = self._hint(chunk)
+        if other == self.mode:
+            other = None
+        if other or framer.rejected > rejected:
+            self.misses += 1
+            if other and self.misses >= MODE_MISSES:
+                self._switch(other)
+                return self._feed_mode(chunk)
+        return None
+
+    def _feed_json(self, chunk):
+        line = self.json_framer.feed(chunk)
+        if line:
+            line = line.strip()
+            if line.startswith(b'{') and line.endswith(b'}'):
+                try: return json.loads(line)
+                except: self.json_framer.reject()
+        return None
+
+    def _feed_bin(self, chunk):
+        newest = None
+        for block in self.bin_framer.blocks(chunk):
+            recs, _, bad = decode_buffer(block)
+            self.bin_framer.rejected += bad
+            if len(recs):
+                self._track_seq(recs['seq'])
+                newest = recs[-1]
+        return record_to_dict(newest) if newest is not None else None
+
+    def _track_seq(self, seq):
+        seq = seq.astype(np.int64)
+        if self.last_seq is not None:
+            seq = np.concatenate(([self.last_seq], seq))
+        gaps = (np.diff(seq) - 1) % 65536
+        self.seq_gaps += int(gaps[gaps < 32768].sum())
+        self.last_seq = int(seq[-1])
+
+    def stats(self):
+        s = self.framer.stats()
+        s["mode"] = self.mode
+        s["switches"] = self.switches
+        s["seq_gaps"] = self.seq_gaps
+        return s
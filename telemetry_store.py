@@ -0,0 +1,108 @@
+import time
+import numpy as np
+from telemetry_proto import FIELDS
+
+# ==========================================
+# TELEMETRY STORE (COLUMNAR RING BUFFER)
+# ==========================================
+# История всех полей телеметрии в одном заранее выделенном structured-массиве
+# с меткой времени t (time.monotonic()). Кольцо «зеркальное»: каждая запись
+# пишется дважды (i и i + capacity), поэтому любые последние <= capacity
+# сэмплов — это один непрерывный срез, то есть view без копирования.
+# Графики, алерты и анализ читают из store вместо своих deque.
+
+def store_dtype(fields=FIELDS):
+    return np.dtype([('t', '<f8')] + [(f, '<f8') for f in fields])
+
+
+class TelemetryStore:
+    def __init__(self, capacity=65536, fields=FIELDS):
+        self.capacity = capacity
+        self.fields = tuple(fields)
+        self.dtype = store_dtype(self.fields)
+        self.buf = np.zeros(capacity * 2, dtype=self.dtype)
+        self.count = 0   # всего записей за всё время
+        self.pos = 0     # куда пишем следующую (0..capacity-1)
+        self._row = [0.0] * (len(self.fields) + 1)
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, d, t=None):
+        # O(1): две записи одной строки. Отсутствующие поля — как в прошлом сэмпле
+        row = self._row
+        row[0] = time.monotonic() if t is None else t
+        for i, f in enumerate(self.fields, 1):
+            v = d.get(f)
+            if v is not None: row[i] = v
+        row = tuple(row)
+        self.buf[self.pos] = row
+        self.buf[self.pos + self.capacity] = row
+        self._advance(1)
+
+    def extend(self, columns, t):
+        # Пачка сэмплов сразу (например, records_to_columns(decode_buffer(...)))
+        t = np.asarray(t, dtype=np.float64)
+        n = len(t)
+        if n > self.capacity:
+            skip = n - self.capacity
+            t = t[skip:]
+            columns = {k: v[skip:] for k, v in columns.items()}
+            self.count += skip
+            self.pos = (self.pos + skip) % self.capacity
+            n = self.capacity
+        if not n:
+            return
+
+        idx = (self.pos + np.arange(n)) % self.capacity
+        for base in (idx, idx + self.capacity):
+            self.buf['t'][base] = t
+            for f in self.fields:
+                if f in columns:
+                    self.buf[f][base] = columns[f]
+                else:
+                    self.buf[f][base] = self._row[self.fields.index(f) + 1]
+        last = self.buf[idx[-1]]
+        self._row = [float(last[name]) for name in self.dtype.names]
+        self._advance(n)
+
+    def _advance(self, n):
+        self.count += n
+        self.pos = (self.pos + n) % self.capacity
+
+    # ------------------------------------------
+    # Запросы (все возвращают view, кроме resample)
+    # ------------------------------------------
+    def last(self, n=None):
+        size = len(self)
+        n = size if n is None else min(n, size)
+        end = self.pos + self.capacity
+        return self.buf[end - n:end]
+
+    def column(self, name, n=None):
+        return self.last(n)[name]
+
+    def window(self, t0, t1):
+        # Сэмплы с t0 <= t < t1; время в кольце монотонно, значит searchsorted
+        data = self.last()
+        ts = data['t']
+        i0, i1 = np.searchsorted(ts, (t0, t1), side='left')
+        return data[i0:i1]
+
+    def since(self, seconds):
+        data = self.last()
+        if not len(data):
+            return data
+        return self.window(data['t'][-1] - seconds, np.inf)
+
+    def decimate(self, n, step):
+        # Каждый step-й сэмпл из последних n (strided view)
+        return self.last(n)[::-1][::step][::-1]
+
+    def resample(self, name, t0, t1, count):
+        # Равномерная сетка по времени (копия: интерполяция)
+        data = self.window(t0, t1)
+        grid = np.linspace(t0, t1, count, endpoint=False)
+        if not len(data):
+            return grid, np.full(count, np.nan)
+        return grid, np.interp(grid, data['t'], data[name])
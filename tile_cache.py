@@ -0,0 +1,437 @@
+import os
+import io
+import sys
+import math
+import socket
+import time
+import threading
+import requests
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
+
+# ==========================================
+# MAP TILE CACHE (MEMORY LRU + DISK)
+# ==========================================
+# AsyncMap и TerrainMap раньше качали тайл заново при каждом сдвиге на
+# 0.002–0.005 градуса, даже если тайл тот же или уже был на этом маршруте.
+#
+#   память — готовые Surface в LRU с бюджетом в байтах; ключ
+#            (layer, z, x, y) + вариант (размер, фильтр), т.к. каждый HUD
+#            декодирует тайл по-своему
+#   диск   — сырые байты тайла в ESP32_TILE_CACHE/<layer>/<z>/<x>/<y>;
+#            устаревают через TTL, при превышении бюджета удаляются самые
+#            старые файлы
+#
+# Сеть трогаем только если тайла нет ни там, ни там. Если сеть недоступна,
+# отдаём устаревший тайл с диска — лучше старая карта, чем пустая.
+#
+# Сеть — через FetchPool: фиксированное число потоков, общий requests.Session
+# (keep-alive), ближайший к самолёту тайл первым, отставшие запросы выкидываются.
+#
+#   ESP32_TILE_URL=http://127.0.0.1:8765/{layer}/{z}/{y}/{x}  — свой тайл-сервер
+#   python tile_cache.py serve 8765      # локальный сервер-заглушка (для тестов)
+#   python tile_cache.py info            # что лежит в дисковом кэше
+#   python tile_cache.py bench           # пропускная способность: пул vs старый путь
+
+LAYERS = {
+    "imagery": "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}",
+    "relief": "https://server.arcgisonline.com/ArcGIS/rest/services/World_Shaded_Relief/MapServer/tile/{z}/{y}/{x}",
+}
+
+CACHE_DIR = os.environ.get('ESP32_TILE_CACHE', os.path.expanduser('~/.cache/esp32_hud/tiles'))
+TILE_URL = os.environ.get('ESP32_TILE_URL')
+USER_AGENT = 'Flight/1.0'
+FETCH_WORKERS = 4
+
+
+def deg2tile(lat, lon, z):
+    n = 2.0 ** z
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.log(math.tan(math.radians(lat)) + (1 / math.cos(math.radians(lat)))) / math.pi) / 2.0 * n)
+    return x, y
+
+
+class TileCache:
+    def __init__(self, root=CACHE_DIR, mem_mb=64, disk_mb=512, ttl_days=30, timeout=2, url=None):
+        self.root = root
+        self.url_template = url or TILE_URL
+        self.mem_budget = mem_mb * 1024 * 1024
+        self.disk_budget = disk_mb * 1024 * 1024
+        self.ttl = ttl_days * 86400
+        self.timeout = timeout
+        self.lock = threading.Lock()
+
+        # Одно keep-alive соединение на поток пула
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+        self.session.mount('http://', HTTPAdapter(pool_maxsize=FETCH_WORKERS))
+        self.session.mount('https://', HTTPAdapter(pool_maxsize=FETCH_WORKERS))
+
+        self.mem = OrderedDict()               # key -> (surface, bytes)
+        self.mem_bytes = 0
+        self.disk_bytes = None                 # считается при первом обращении
+
+        self.mem_hits = 0
+        self.mem_misses = 0
+        self.disk_hits = 0
+        self.disk_stale = 0
+        self.net_fetches = 0
+        self.net_errors = 0
+        self.disk_errors = 0
+        self.mem_evictions = 0
+        self.disk_evictions = 0
+
+    # ------------------------------------------
+    # MEMORY (decoded surfaces)
+    # ------------------------------------------
+    def get_surface(self, key):
+        with self.lock:
+            item = self.mem.get(key)
+            if item is None:
+                self.mem_misses += 1
+                return None
+            self.mem_hits += 1
+            self.mem.move_to_end(key)
+            return item[0]
+
+    def put_surface(self, key, surf):
+        size = surf.get_width() * surf.get_height() * surf.get_bytesize()
+        with self.lock:
+            old = self.mem.pop(key, None)
+            if old is not None:
+                self.mem_bytes -= old[1]
+            self.mem[key] = (surf, size)
+            self.mem_bytes += size
+            while self.mem_bytes > self.mem_budget and len(self.mem) > 1:
+                _, (_, old) = self.mem.popitem(last=False)
+                self.mem_bytes -= old
+                self.mem_evictions += 1
+
+    def surface(self, layer, z, x, y, decode, variant=()):
+        # Всё сразу: память -> диск/сеть -> decode(bytes) -> память.
+        # Вызывать из фонового потока: может ждать сеть
+        key = (layer, z, x, y) + tuple(variant)
+        surf = self.get_surface(key)
+        if surf is not None:
+            return surf
+        data = self.fetch(layer, z, x, y)
+        if data is None:
+            return None
+        surf = decode(data)
+        self.put_surface(key, surf)
+        return surf
+
+    # ------------------------------------------
+    # DISK + NETWORK (raw bytes)
+    # ------------------------------------------
+    def path(self, layer, z, x, y):
+        return os.path.join(self.root, layer, str(z), str(x), str(y))
+
+    def url(self, layer, z, x, y):
+        template = self.url_template or LAYERS[layer]
+        return template.format(layer=layer, z=z, x=x, y=y)
+
+    def fetch(self, layer, z, x, y):
+        path = self.path(layer, z, x, y)
+        stale = None
+        try:
+            age = time.time() - os.path.getmtime(path)
+            with open(path, 'rb') as f:
+                data = f.read()
+            if age < self.ttl:
+                self.disk_hits += 1
+                return data
+            stale = data
+            self.disk_stale += 1
+        except OSError:
+            pass
+
+        data = None
+        try:
+            self.net_fetches += 1
+            resp = self.session.get(self.url(layer, z, x, y), timeout=self.timeout)
+            if resp.status_code == 200 and resp.content:
+                data = resp.content
+            else:
+                self.net_errors += 1
+        except Exception:
+            self.net_errors += 1
+        if data is None:
+            return stale
+
+        # Диск полон или нет прав — это не ошибка сети: тайл уже скачан,
+        # отдаём его, просто без кэша
+        try:
+            self._store(path, data)
+        except OSError:
+            self.disk_errors += 1
+        return data
+
+    def _store(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            try:
+                old = os.path.getsize(path)
+            except OSError:
+                old = 0
+            os.replace(tmp, path)
+        except OSError:
+            try:
+                os.remove(tmp)                 # недописанный .tmp не оставляем
+            except OSError:
+                pass
+            raise
+        with self.lock:
+            if self.disk_bytes is None:
+                self.disk_bytes = sum(size for _, size, _ in self._scan())
+            else:
+                self.disk_bytes += len(data) - old
+            if self.disk_bytes > self.disk_budget:
+                self._evict_disk()
+
+    def _scan(self):
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                p = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(p)
+                except OSError:
+                    continue
+                yield p, st.st_size, st.st_mtime
+
+    def _evict_disk(self):
+        # Самые старые файлы, пока не уйдём на 90% бюджета
+        files = sorted(self._scan(), key=lambda f: f[2])
+        total = sum(size for _, size, _ in files)
+        for p, size, _ in files:
+            if total <= self.disk_budget * 0.9:
+                break
+            try:
+                os.remove(p)
+                total -= size
+                self.disk_evictions += 1
+            except OSError:
+                pass
+        self.disk_bytes = total
+
+    def clear_memory(self):
+        with self.lock:
+            self.mem.clear()
+            self.mem_bytes = 0
+
+    def stats(self):
+        return {"mem_hits": self.mem_hits, "mem_misses": self.mem_misses,
+                "mem_evictions": self.mem_evictions, "mem_entries": len(self.mem),
+                "mem_mb": self.mem_bytes / 1048576,
+                "disk_hits": self.disk_hits, "disk_stale": self.disk_stale,
+                "disk_evictions": self.disk_evictions, "disk_errors": self.disk_errors,
+                "net_fetches": self.net_fetches, "net_errors": self.net_errors}
+
+
+# ==========================================
+# FETCH POOL
+# ==========================================
+class FetchPool:
+    # Фиксированный пул загрузчиков. Каждый владелец (мозаика) раз в кадр
+    # сообщает sync() полный набор нужных ему задач с приоритетами: новые
+    # добавляются, приоритеты обновляются, а всё, что владельцу больше не
+    # нужно (самолёт улетел), выбрасывается, не дойдя до сети. Поток берёт
+    # задачу с наименьшим приоритетом и вызывает owner.load(item).
+    def __init__(self, workers=FETCH_WORKERS):
+        self.workers = workers
+        self.cond = threading.Condition()
+        self.pending = {}                      # (owner, item) -> priority
+        self.running = set()
+        self.threads = []
+
+        self.submitted = 0
+        self.done = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def _start(self):
+        while len(self.threads) < self.workers:
+            t = threading.Thread(target=self._worker, daemon=True)
+            t.start()
+            self.threads.append(t)
+
+    def sync(self, owner, jobs):
+        with self.cond:
+            stale = [k for k in self.pending if k[0] is owner and k[1] not in jobs]
+            for key in stale:
+                del self.pending[key]
+            self.dropped += len(stale)
+            for item, priority in jobs.items():
+                key = (owner, item)
+                if key in self.running:
+                    continue
+                if key not in self.pending:
+                    self.submitted += 1
+                self.pending[key] = priority
+            if self.pending:
+                self._start()
+                self.cond.notify_all()
+
+    def busy(self, owner=None):
+        with self.cond:
+            keys = list(self.pending) + list(self.running)
+        return any(owner is None or k[0] is owner for k in keys)
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+                key = min(self.pending, key=self.pending.get)
+                del self.pending[key]
+                self.running.add(key)
+            owner, item = key
+            try:
+                owner.load(item)
+            except Exception:
+                self.errors += 1
+            finally:
+                with self.cond:
+                    self.running.discard(key)
+                    self.done += 1
+
+    def stats(self):
+        with self.cond:
+            return {"workers": self.workers, "pending": len(self.pending), "running": len(self.running),
+                    "submitted": self.submitted, "done": self.done, "dropped": self.dropped,
+                    "errors": self.errors}
+
+
+# Общие на процесс (AsyncMap, TerrainMap)
+tile_cache = TileCache()
+fetch_pool = FetchPool()
+
+
+# ==========================================
+# LOCAL TILE SERVER (STAND-IN)
+# ==========================================
+def make_server(port=8765, delay=0.0, verbose=False):
+    # Отдаёт синтетический JPEG на любой /<layer>/<z>/<y>/<x>. HTTP/1.1 с
+    # keep-alive; delay — искусственная задержка ответа (как у удалённого сервера).
+    # server.requests / server.connections — счётчики для проверок
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+    from PIL import Image
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            # Заголовки и тело уходят разными write(): без NODELAY keep-alive
+            # ловит задержку Nagle + delayed ACK (~40 мс на ответ)
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.server.connections += 1
+
+        def do_GET(self):
+            parts = self.path.strip('/').split('/')
+            try:
+                z, y, x = (int(v) for v in parts[-3:])
+            except ValueError:
+                self.send_error(404)
+                return
+            self.server.requests += 1
+            if delay:
+                time.sleep(delay)
+            img = Image.new('RGB', (256, 256), ((x * 37) % 256, (y * 91) % 256, (z * 15) % 256))
+            out = io.BytesIO()
+            img.save(out, 'JPEG')
+            body = out.getvalue()
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/jpeg')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, fmt, *args):
+            if verbose:
+                print(f"[{self.server.requests}] {self.path}")
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    server.requests = 0
+    server.connections = 0
+    return server
+
+
+def serve(port=8765):
+    # HUD: ESP32_TILE_URL=http://127.0.0.1:8765/{layer}/{z}/{y}/{x}
+    server = make_server(port, verbose=True)
+    print(f"TILE SERVER http://127.0.0.1:{port}/{{layer}}/{{z}}/{{y}}/{{x}}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def bench(n=200, workers=FETCH_WORKERS, delay=0.02):
+    # Пропускная способность на локальном сервере (с задержкой delay на ответ):
+    #   legacy — как раньше: requests.get без Session, по одному тайлу за раз
+    #   pool   — FetchPool + Session, ближайшие первыми
+    import tempfile
+    import shutil
+    server = make_server(0, delay)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/{{layer}}/{{z}}/{{y}}/{{x}}"
+    tiles = [(15, 23000 + i % 20, 12000 + i // 20) for i in range(n)]
+    results = {}
+
+    t0 = time.perf_counter()
+    for z, x, y in tiles:
+        requests.get(url.format(layer="imagery", z=z, x=x, y=y), headers={'User-Agent': USER_AGENT})
+    dt = time.perf_counter() - t0
+    results["legacy"] = {"tiles_s": n / dt, "connections": server.connections}
+
+    root = tempfile.mkdtemp(prefix="tile_bench_")
+    try:
+        server.connections = 0
+        cache = TileCache(root=root, url=url)
+        pool = FetchPool(workers)
+
+        class Owner:
+            def load(self, c):
+                cache.fetch("imagery", *c)
+
+        owner = Owner()
+        t0 = time.perf_counter()
+        pool.sync(owner, {c: i for i, c in enumerate(tiles)})
+        while pool.busy(owner):
+            time.sleep(0.001)
+        dt = time.perf_counter() - t0
+        results["pool"] = {"tiles_s": n / dt, "connections": server.connections,
+                           "net_fetches": cache.net_fetches, "errors": cache.net_errors}
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+        server.shutdown()
+
+    for name, r in results.items():
+        print(f"{name:7s} {r['tiles_s']:7.1f} tiles/s  {r['connections']:4d} connections")
+    return results
+
+
+def info(root=CACHE_DIR):
+    files = list(tile_cache._scan()) if os.path.isdir(root) else []
+    total = sum(size for _, size, _ in files)
+    now = time.time()
+    stale = sum(1 for _, _, m in files if now - m >= tile_cache.ttl)
+    print(f"{root}: {len(files)} tiles, {total / 1048576:.1f} MB, {stale} stale")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == 'serve':
+        serve(int(sys.argv[2]) if len(sys.argv) >= 3 else 8765)
+    elif len(sys.argv) >= 2 and sys.argv[1] == 'info':
+        info()
+    elif len(sys.argv) >= 2 and sys.argv[1] == 'bench':
+        bench(*(f(v) for f, v in zip((int, int, float), sys.argv[2:])))
+    else:
+        print("usage: tile_cache.py serve [PORT] | info | bench [N] [WORKERS] [DELAY_S]")
@@ -0,0 +1,209 @@
+import io
+import math
+import time
+import queue
+import pygame
+import numpy as np
+from PIL import Image, ImageColor
+from tile_cache import tile_cache, fetch_pool
+
+# ==========================================
+# TILE MOSAIC (SUB-TILE PANNING + ZOOM)
+# ==========================================
+# Раньше карта была одним тайлом, растянутым на всю панель: картинка
+# прыгала после каждой догрузки, а самолёт всегда стоял в центре тайла.
+#
+# Теперь панель собирается из сетки тайлов 256x256 в родном масштабе
+# вокруг точной пиксельной позиции lat/lon (Web Mercator). Позиция
+# пересчитывается в draw() каждый кадр, так что панорама плавная и без
+# сети: сдвиг — это только другие координаты blit. Недостающие тайлы (и
+# кольцо соседей про запас) качает общий fetch_pool через tile_cache:
+# ближайшие к самолёту первыми, улетевшие назад — отменяются.
+#
+# set_zoom(z): новый уровень грузится в фоне, а на экране остаётся
+# старый, пока все видимые тайлы нового не будут готовы.
+#
+# Декод (JPEG -> цвет -> convert() в формат дисплея) идёт тут же, в потоках
+# пула; готовые Surface приходят в рендер через очередь и забираются в
+# update(). Главный поток только blit'ит.
+
+TILE = 256
+MIN_ZOOM, MAX_ZOOM = 3, 19
+RETRY_S = 5.0                                  # пауза перед повтором неудачного тайла
+
+
+def deg2pixel(lat, lon, z):
+    # Глобальные пиксельные координаты (float) на уровне z
+    n = TILE * 2.0 ** z
+    lat = max(-85.05112878, min(85.05112878, lat))
+    x = (lon + 180.0) / 360.0 * n
+    y = (1.0 - math.log(math.tan(math.radians(lat)) + 1 / math.cos(math.radians(lat))) / math.pi) / 2.0 * n
+    return x, y
+
+
+def display_format(surf):
+    # convert() возможен только после set_mode()
+    return surf.convert() if pygame.display.get_surface() else surf
+
+
+def decode_rgb(data):
+    img = Image.open(io.BytesIO(data)).convert('RGB')
+    return display_format(pygame.image.frombuffer(img.tobytes(), img.size, 'RGB'))
+
+
+def colorize_lut(black, white):
+    # ImageOps.colorize одной таблицей: яркость 0..255 -> упакованный BGRA u32
+    lo = np.array(ImageColor.getrgb(black), dtype=np.float64)
+    hi = np.array(ImageColor.getrgb(white), dtype=np.float64)
+    rgb = np.rint(lo + (hi - lo) * np.arange(256)[:, None] / 255).astype(np.uint32)
+    return 0xFF000000 | (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+
+
+def lut_decoder(black, white):
+    # Монохромный фильтр (ночное видение): JPEG сразу в яркость (draft 'L' —
+    # libjpeg не считает цветность), затем один проход по таблице
+    lut = colorize_lut(black, white)
+
+    def decode(data):
+        img = Image.open(io.BytesIO(data))
+        img.draft('L', img.size)
+        gray = np.asarray(img.convert('L'))
+        px = lut[gray]
+        return display_format(pygame.image.frombuffer(px, (gray.shape[1], gray.shape[0]), 'BGRA'))
+    return decode
+
+
+class TileMosaic:
+    def __init__(self, w, h, layer, zoom, decode=decode_rgb, variant=(), bg=(20, 20, 25), margin=1):
+        self.w, self.h = w, h
+        self.layer = layer
+        self.decode = decode
+        self.variant = ("mosaic",) + tuple(variant)
+        self.bg = bg
+        self.margin = margin
+
+        self.zoom = zoom
+        self.target_zoom = zoom
+        self.center = None                     # (lat, lon) последнего update
+        self.tiles = {}                        # (z, x, y) -> Surface
+        self.wanted = set()
+        self.missing = {}                      # (z, x, y) -> приоритет (нет в памяти)
+        self.failed = 0
+        self.retry_at = {}                     # (z, x, y) -> monotonic, раньше не качать
+        self.arrived = queue.SimpleQueue()     # (cell, Surface | None) из потоков пула
+
+    # ------------------------------------------
+    # GRID
+    # ------------------------------------------
+    def _grid(self, z, lat, lon, margin):
+        # Тайлы, покрывающие панель на уровне z -> квадрат расстояния до самолёта
+        px, py = deg2pixel(lat, lon, z)
+        last = 2 ** z - 1
+        x0 = max(0, int((px - self.w / 2) // TILE) - margin)
+        x1 = min(last, int((px + self.w / 2) // TILE) + margin)
+        y0 = max(0, int((py - self.h / 2) // TILE) - margin)
+        y1 = min(last, int((py + self.h / 2) // TILE) + margin)
+        return {(z, x, y): (x * TILE + TILE / 2 - px) ** 2 + (y * TILE + TILE / 2 - py) ** 2
+                for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)}
+
+    def _key(self, cell):
+        return (self.layer,) + cell + self.variant
+
+    def loading(self):
+        return bool(self.missing)
+
+    def ready(self):
+        # Все видимые тайлы текущего уровня на месте
+        if self.center is None:
+            return False
+        return all(c in self.tiles for c in self._grid(self.zoom, *self.center, 0))
+
+    # ------------------------------------------
+    # UPDATE (каждый кадр, без сети)
+    # ------------------------------------------
+    def set_zoom(self, z):
+        self.target_zoom = max(MIN_ZOOM, min(MAX_ZOOM, z))
+
+    def _collect(self):
+        # Готовые тайлы из пула (только главный поток трогает self.tiles)
+        now = time.monotonic()
+        while True:
+            try:
+                c, surf = self.arrived.get_nowait()
+            except queue.Empty:
+                return
+            self.missing.pop(c, None)
+            if surf is None:
+                self.failed += 1
+                self.retry_at[c] = now + RETRY_S
+            elif c in self.wanted:
+                self.tiles[c] = surf
+
+    def update(self, lat, lon):
+        self._collect()
+        self.center = (lat, lon)
+        # Приоритет: (уровень, расстояние). Видимые тайлы нового зума — первыми
+        cells = {c: (1, d) for c, d in self._grid(self.zoom, lat, lon, self.margin).items()}
+        if self.target_zoom != self.zoom:
+            pending = self._grid(self.target_zoom, lat, lon, 0)
+            if all(c in self.tiles for c in pending):
+                self.zoom = self.target_zoom
+                cells = {c: (1, d) for c, d in self._grid(self.zoom, lat, lon, self.margin).items()}
+            else:
+                cells.update({c: (0, d) for c, d in pending.items()})
+
+        self.wanted = cells
+        # Тайлы, ушедшие за пределы сетки, больше не держим (они есть в LRU)
+        for c in [c for c in self.tiles if c not in cells]:
+            del self.tiles[c]
+        for c in [c for c in self.missing if c not in cells]:
+            del self.missing[c]
+        for c in [c for c in self.retry_at if c not in cells]:
+            del self.retry_at[c]
+        now = time.monotonic()
+        for c, priority in cells.items():
+            if c in self.tiles or self.retry_at.get(c, 0) > now:
+                continue
+            if c not in self.missing:
+                surf = tile_cache.get_surface(self._key(c))
+                if surf is not None:
+                    self.tiles[c] = surf
+                    continue
+            self.missing[c] = priority
+        if self.missing or fetch_pool.busy(self):
+            fetch_pool.sync(self, self.missing)
+
+    def load(self, c):
+        # Поток fetch_pool: диск/сеть -> decode -> память; результат — в очередь
+        try:
+            surf = tile_cache.surface(self.layer, *c, self.decode, self.variant)
+        except Exception:
+            surf = None
+        self.arrived.put((c, surf))
+
+    # ------------------------------------------
+    # DRAW
+    # ------------------------------------------
+    def project(self, lat, lon):
+        # Точка lat/lon в координатах панели (центр панели = self.center)
+        if self.center is None:
+            return self.w / 2, self.h / 2
+        cx, cy = deg2pixel(*self.center, self.zoom)
+        px, py = deg2pixel(lat, lon, self.zoom)
+        return self.w / 2 + px - cx, self.h / 2 + py - cy
+
+    def draw(self, surf, x, y):
+        rect = pygame.Rect(x, y, self.w, self.h)
+        if self.center is None:
+            surf.fill(self.bg, rect)
+            return
+        cx, cy = deg2pixel(*self.center, self.zoom)
+        ox, oy = x + self.w / 2 - cx, y + self.h / 2 - cy
+        visible = [(c, self.tiles.get(c)) for c in self._grid(self.zoom, *self.center, 0)]
+        if any(tile is None for _, tile in visible):
+            surf.fill(self.bg, rect)           # дыры, пока тайлы догружаются
+        clip = surf.get_clip()
+        surf.set_clip(rect.clip(clip))
+        surf.blits([(tile, (round(ox + tx * TILE), round(oy + ty * TILE)))
+                    for (z, tx, ty), tile in visible if tile is not None], False)
+        surf.set_clip(clip)
@@ -0,0 +1,197 @@
+import time
+import threading
+
+# ==========================================
+# UPLINK SCHEDULER (КОМАНДЫ НА ПЛАТУ)
+# ==========================================
+# Раньше hil_sim писал DODGE:0/DODGE:1 каждые 10 мс, даже если ничего не
+# менялось: приёмник UART платы всё время занят, а readStringUntil('\n')
+# в loop() ждёт поток команд.
+#
+# Теперь команды — это состояние по ключам: set("dodge", "DODGE:1").
+# Строка уходит в порт только если изменилась, плюс редкий keepalive
+# (всё состояние одной записью раз в keepalive секунд — плата после
+# перезагрузки догоняет сама). Кроме LATCHED: ARM молча не повторяется.
+# Он уходит один раз и повторяется только по ack/retries; если плата
+# сама ушла из подтверждённого состояния (сброс, просадка питания, disarm
+# на плате), команда снимается — хост плату обратно не взводит, ARM
+# нужно нажать ещё раз.
+#
+#   uplink = UplinkScheduler(ser)
+#   uplink.set("arm", "ARM", ack=lambda d: d.get("arm") == 1)
+#   uplink.set("dodge", "DODGE:1" if space else "DODGE:0")
+#   uplink.poll()                 # каждый кадр: отправка / keepalive / повторы
+#   uplink.observe(d)             # каждый кадр телеметрии: подтверждения
+#
+# Склейка: всё, что накопилось к poll(), уходит одним write(); для ключа
+# берётся последнее значение (DODGE:1, DODGE:0 за один тик -> DODGE:0).
+# Приоритет: команды безопасности (SAFETY) пишутся первыми и сразу, без
+# паузы min_gap и без лимита max_bytes; остальное ждёт своей очереди.
+# Подтверждение: ack(d) — проверка по телеметрии (ARM -> arm == 1).
+# Нет подтверждения за ack_timeout — повтор, не больше retries раз;
+# keepalive в эти попытки не засчитывается. write() вернул 0 (SerialLink
+# без платы) — команды остаются в очереди до подключения.
+
+SAFETY = ("arm", "dodge")
+LATCHED = ("arm",)         # без keepalive; снимается, если плата ушла из состояния
+KEEPALIVE_S = 0.5
+MIN_GAP_S = 0.02
+ACK_TIMEOUT_S = 0.25
+
+
+class Command:
+    __slots__ = ("key", "line", "priority", "ack", "sent_at", "tries", "acked", "gave_up", "confirmed")
+
+    def __init__(self, key, line, priority, ack):
+        self.key = key
+        self.line = line
+        self.priority = priority
+        self.ack = ack
+        self.sent_at = None      # monotonic последней отправки
+        self.tries = 0
+        self.acked = ack is None  # или сдались после retries повторов
+        self.gave_up = False
+        self.confirmed = False    # ack(d) был истинным хотя бы раз
+
+
+class UplinkScheduler:
+    def __init__(self, ser, keepalive=KEEPALIVE_S, min_gap=MIN_GAP_S,
+                 ack_timeout=ACK_TIMEOUT_S, retries=3, max_bytes=64):
+        self.ser = ser
+        self.keepalive = keepalive
+        self.min_gap = min_gap
+        self.ack_timeout = ack_timeout
+        self.retries = retries
+        self.max_bytes = max_bytes
+        self.state = {}                # key -> Command (последнее значение)
+        self.dirty = set()             # ключи, которые надо отправить
+        self.lock = threading.Lock()   # observe() зовётся из потока приёма
+        self.last_write = 0.0
+        self.last_keepalive = 0.0
+
+        self.writes = 0
+        self.bytes = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.retransmits = 0
+        self.keepalives = 0
+        self.acked = 0
+        self.failed = 0
+        self.unsent = 0                # write() вернул 0: линк не подключён
+        self.revoked = 0               # LATCHED сняты: плата ушла из состояния сама
+        self.ack_ms = 0.0              # последняя задержка подтверждения
+
+    # ------------------------------------------
+    # INPUT
+    # ------------------------------------------
+    def set(self, key, line, ack=None, priority=None):
+        # Желаемое состояние ключа; отправится в poll(), если изменилось
+        with self.lock:
+            cur = self.state.get(key)
+            if cur is not None and cur.line == line and not cur.gave_up:
+                return False
+            if key in self.dirty:
+                self.coalesced += 1    # предыдущее значение так и не ушло
+            if priority is None:
+                priority = 0 if key in SAFETY else 1
+            self.state[key] = Command(key, line, priority, ack)
+            self.dirty.add(key)
+            return True
+
+    def observe(self, d, now=None):
+        # Кадр телеметрии: закрываем команды, которые он подтверждает
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            for c in list(self.state.values()):
+                if c.ack is None or c.sent_at is None:
+                    continue
+                try:
+                    ok = c.ack(d)
+                except Exception:
+                    ok = False
+                if ok and not c.acked:
+                    c.acked = c.confirmed = True
+                    self.acked += 1
+                    self.ack_ms = (now - c.sent_at) * 1000
+                elif not ok and c.confirmed and c.key in LATCHED:
+                    # Плата сама вышла из состояния (DISARM не от нас): снимаем
+                    del self.state[c.key]
+                    self.dirty.discard(c.key)
+                    self.revoked += 1
+
+    def pending(self):
+        with self.lock:
+            return [c.line for c in self.state.values() if not c.acked]
+
+    # ------------------------------------------
+    # OUTPUT
+    # ------------------------------------------
+    def poll(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            for c in self.state.values():
+                if c.acked or c.sent_at is None or c.key in self.dirty:
+                    continue
+                if now - c.sent_at >= self.ack_timeout:
+                    if c.tries > self.retries:
+                        c.acked = c.gave_up = True   # сдаёмся до следующего set() / keepalive
+                        self.failed += 1
+                    else:
+                        self.dirty.add(c.key)
+                        self.retransmits += 1
+
+            keepalive = self.state and now - self.last_keepalive >= self.keepalive
+            if keepalive:
+                batch = [c for c in self.state.values() if c.key not in LATCHED or c.key in self.dirty]
+                if not batch:
+                    self.last_keepalive = now
+                    return 0
+            else:
+                batch = [self.state[k] for k in self.dirty]
+                if not batch:
+                    return 0
+                if now - self.last_write < self.min_gap and all(c.priority for c in batch):
+                    return 0                    # не безопасность: ждём паузу, копим
+            batch.sort(key=lambda c: c.priority)
+
+            out, size, sent = [], 0, []
+            for c in batch:
+                line = c.line.encode() + b'\n'
+                if c.priority and size + len(line) > self.max_bytes and out:
+                    continue                    # останется dirty до следующего poll()
+                out.append(line)
+                size += len(line)
+                if c.key in self.dirty:
+                    # Новое значение или повтор: отсюда считаются таймаут и попытки.
+                    # Keepalive-копия неподтверждённой команды бюджет повторов не тратит
+                    sent.append((c, c.sent_at, c.tries))
+                    c.sent_at = now
+                    c.tries += 1
+                    self.dirty.discard(c.key)
+            if keepalive:
+                self.last_keepalive = now
+                self.keepalives += 1
+            self.last_write = now
+
+        data = b''.join(out)
+        if self.ser.write(data) == 0 and data:
+            # Линк сейчас не подключён (SerialLink.write -> 0): ничего не ушло,
+            # команды снова ждут отправки и не тратят попытки
+            with self.lock:
+                for c, sent_at, tries in sent:
+                    if self.state.get(c.key) is c:
+                        c.sent_at, c.tries = sent_at, tries
+                        self.dirty.add(c.key)
+                self.unsent += 1
+            return 0
+        self.writes += 1
+        self.bytes += len(data)
+        self.sent += len(out)
+        return len(data)
+
+    def stats(self):
+        return {"writes": self.writes, "bytes": self.bytes, "commands": self.sent,
+                "coalesced": self.coalesced, "keepalives": self.keepalives,
+                "retransmits": self.retransmits, "acked": self.acked,
+                "failed": self.failed, "unsent": self.unsent, "revoked": self.revoked, "ack_ms": self.ack_ms,
+                "pending": self.pending()}